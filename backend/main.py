@@ -1,8 +1,29 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from .routes import router as api_router
+from .utils.jobs import get_job_manager
+from .utils.log_sink import emit as _status
+from .utils.rfc.c_inference import get_worker_pool
+from .utils.rfc.model_registry import get_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm up the RFC models before serving requests."""
+    try:
+        get_registry().load()
+    except Exception as exc:
+        # Models may not be trained yet; readiness reports the failure.
+        _status(f"RFC models not loaded at startup: {exc}", level=logging.WARNING)
+    yield
+    get_job_manager().shutdown()
+    get_worker_pool().shutdown()
+
 
-app = FastAPI(title="Cloud Services API Security Backend")
+app = FastAPI(title="Cloud Services API Security Backend", lifespan=lifespan)
 
 app.include_router(api_router)
 
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
 from ..utils.csv_utils import convert_all_raw_json_to_csv
+from ..utils.jobs import run_job
 
 router = APIRouter()
 
 
-@router.post("/json-to-csv", summary="Convert all raw JSON logs to CSV")
-async def json_to_csv() -> dict[str, str | list[str]]:
+def _json_to_csv_task() -> dict[str, str | list[str]]:
     try:
         created = convert_all_raw_json_to_csv()
         return {
@@ -22,3 +22,10 @@ async def json_to_csv() -> dict[str, str | list[str]]:
             "message": "CSV conversion failed",
             "error": str(exc),
         }
+
+
+@router.post("/json-to-csv", summary="Convert all raw JSON logs to CSV")
+async def json_to_csv(
+    background: bool = Query(False, description="Return a job id at once instead of waiting for the result"),
+) -> dict[str, object]:
+    return await run_job("convert", _json_to_csv_task, background=background, name="json-to-csv")
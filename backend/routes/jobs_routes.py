@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..utils.jobs import get_job_manager
+
+router = APIRouter()
+
+
+def _get_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+
+@router.get("", summary="List background jobs")
+async def list_jobs(
+    type: str | None = Query(None, description="Only jobs of this type"),
+    status: str | None = Query(None, description="Only jobs in this state: queued, running, succeeded, failed or cancelled"),
+) -> dict[str, object]:
+    manager = get_job_manager()
+    return {
+        "limits": manager.limits,
+        "jobs": [job.to_dict() for job in manager.list(type, status)],
+    }
+
+
+@router.get("/{job_id}", summary="Status, progress and result of a job")
+async def get_job(job_id: str) -> dict[str, object]:
+    return _get_job(job_id).to_dict(include_logs=True)
+
+
+@router.post("/{job_id}/cancel", summary="Cancel a queued or running job")
+async def cancel_job(job_id: str) -> dict[str, object]:
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.to_dict()
+
+
+@router.get("/{job_id}/logs", summary="Server-sent events with the job log and progress")
+async def job_logs(
+    job_id: str,
+    since: int = Query(0, ge=0, description="Index of the first log line to send"),
+) -> StreamingResponse:
+    """Stream ``log`` events (one per line), ``progress`` events and a final ``status`` event."""
+    job = _get_job(job_id)
+
+    async def events():
+        index = since
+        progress = None
+        while True:
+            finished = job.finished
+            lines, index = job.logs_since(index)
+            for line in lines:
+                yield f"event: log\ndata: {json.dumps(line)}\n\n"
+            if job.progress is not None and (job.progress, job.progress_message) != progress:
+                progress = (job.progress, job.progress_message)
+                yield f"event: progress\ndata: {json.dumps({'progress': job.progress, 'message': job.progress_message})}\n\n"
+            if finished:
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
+from ..utils.jobs import run_job
 from ..utils.labelling_utils import run_full_labelling
 from ..types.labelling import LabellingRequest
 
 router = APIRouter()
 
-@router.post("/label", summary="Run full labelling workflow")
-async def label(request: LabellingRequest) -> dict[str, str | list[str]]:
-    """Trigger the complete labelling process (conversion ➜ split ➜ classification)."""
+def _label_task(api_key: str) -> dict[str, str | list[str]]:
     try:
-        return run_full_labelling(api_key=request.api_key)
+        return run_full_labelling(api_key=api_key)
     except Exception as exc:
         return {"success": False, "message": "Labelling failed", "error": str(exc)}
 
 
+@router.post("/label", summary="Run full labelling workflow")
+async def label(
+    request: LabellingRequest,
+    background: bool = Query(False, description="Return a job id at once instead of waiting for the result"),
+) -> dict[str, object]:
+    """Trigger the complete labelling process (conversion ➜ split ➜ classification).
+
+    Progress is saved every 20 rows, so a cancelled job resumes where it stopped.
+    """
+    return await run_job("label", _label_task, request.api_key, background=background, name="label")
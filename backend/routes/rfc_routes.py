@@ -1,94 +1,289 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from pathlib import Path
-import pandas as pd
-from ..utils.path_config import PATHS
-
-from ..types.rfc import RfcTrainRequest, RfcInferenceRequest
+from ..types.rfc import RfcTrainRequest, RfcInferenceRequest, RfcBuildRequest, RfcCodegenRequest, RfcBenchmarkRequest, RfcSweepRequest
 from ..utils.rfc.python_train import train_rfc_python
 from ..utils.rfc.codegen_manual import train_rfc_c_manual
 from ..utils.rfc.codegen_emlearn import train_rfc_c_emlearn
+from ..utils.rfc.c_build import build_c_classifier
+from ..utils.rfc.constants import DEFAULT_TOP_K
 from ..utils.rfc.python_inference import predict_rfc_python
-from ..utils.rfc.python_inference import batch_predict_rfc_python_file
-from ..utils.rfc.c_inference import predict_rfc_c, batch_predict_rfc_c_file
+from ..utils.rfc.python_inference import batch_predict_rfc_python_file, stream_predict_rfc_python_file
+from ..utils.rfc.c_inference import predict_rfc_c, batch_predict_rfc_c_file, get_worker_pool, stream_predict_rfc_c_file
+from ..utils.rfc.streaming import DEFAULT_CHUNK_SIZE, STREAM_FORMATS
+from ..utils.rfc.model_registry import get_registry
+from ..utils.rfc.prediction_cache import cache_stats, get_prediction_cache
+from ..utils.jobs import run_job
+from ..utils.log_sink import LogSink
 
 router = APIRouter()
 
 
-@router.post("/train/python", summary="Train RFC models using Python")
-async def train_python(request: RfcTrainRequest) -> dict[str, object]:
-    logs: list[str] = []
+@router.get("/models/ready", summary="Readiness of the in-memory RFC Python models")
+async def models_ready() -> JSONResponse:
+    status = get_registry().status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@router.post("/models/reload", summary="Reload RFC Python models from disk")
+async def models_reload() -> dict[str, object]:
+    logs = LogSink()
     try:
-        metrics = train_rfc_python(request.input_file, logs)
-        return {"success": True, "output": logs, "metrics": metrics}
+        get_registry().reload(logs)
+        return {"success": True, **logs.payload(), **get_registry().status()}
     except Exception as exc:
-        return {"success": False, "error": str(exc), "output": logs}
+        return {"success": False, "error": str(exc), **logs.payload()}
 
 
-@router.post("/train/c/manual", summary="Generate C code manually from RFC models")
-async def train_c_manual() -> dict[str, object]:
-    logs: list[str] = []
+BACKGROUND_QUERY = Query(False, description="Return a job id at once instead of waiting for the result")
+
+
+# Job bodies run in a separate process (see utils/jobs.py) and return the
+# route response.
+def _train_python_task(request: RfcTrainRequest) -> dict[str, object]:
+    logs = LogSink()
     try:
-        result = train_rfc_c_manual(logs=logs)
-        return {"success": True, "output": logs, **result}
+        metrics = train_rfc_python(
+            request.input_file,
+            logs,
+            joint=request.joint,
+            n_jobs=request.n_jobs,
+            concurrent_heads=request.concurrent_heads,
+            incremental=request.incremental,
+            max_vocabulary_drift=request.max_vocabulary_drift,
+            max_label_drift=request.max_label_drift,
+        )
+        return {"success": True, **logs.payload(), "metrics": metrics}
     except Exception as exc:
-        return {"success": False, "error": str(exc), "output": logs}
+        return {"success": False, "error": str(exc), **logs.payload()}
 
 
-@router.post("/train/c/emlearn", summary="Generate C code using emlearn")
-async def train_c_emlearn() -> dict[str, object]:
-    logs: list[str] = []
+def _train_c_manual_task(request: RfcCodegenRequest) -> dict[str, object]:
+    logs = LogSink()
+    try:
+        result = train_rfc_c_manual(
+            logs=logs,
+            forest_layout=request.forest_layout,
+            benchmark_layouts=request.benchmark_layouts,
+            vocab_lookup=request.vocab_lookup,
+            benchmark_lookups=request.benchmark_lookups,
+            joint=request.joint,
+            benchmark_joint=request.benchmark_joint,
+            budget_ns=request.budget_ns,
+            budget_bytes=request.budget_bytes,
+            prune_pool=request.prune_pool,
+            n_jobs=request.n_jobs,
+            concurrent_heads=request.concurrent_heads,
+        )
+    except Exception as exc:
+        return {"success": False, "error": str(exc), **logs.payload()}
+    if request.compile:
+        try:
+            result["build"] = build_c_classifier(
+                profile=request.profile, lto=request.lto, pgo=request.pgo, logs=logs
+            )
+        except Exception as exc:
+            # Code generation succeeded; report the build failure alongside it
+            logs.error(f"Build failed: {exc}")
+            result["build"] = {"success": False, "error": str(exc)}
+    return {"success": True, **logs.payload(), **result}
+
+
+def _build_c_task(request: RfcBuildRequest) -> dict[str, object]:
+    logs = LogSink()
+    try:
+        result = build_c_classifier(profile=request.profile, lto=request.lto, pgo=request.pgo, logs=logs)
+        return {"success": True, **logs.payload(), **result}
+    except Exception as exc:
+        return {"success": False, "error": str(exc), **logs.payload()}
+
+
+def _train_c_emlearn_task() -> dict[str, object]:
+    logs = LogSink()
     try:
         result = train_rfc_c_emlearn(logs=logs)
-        return {"success": True, "output": logs, **result}
+        return {"success": True, **logs.payload(), **result}
     except Exception as exc:
-        return {"success": False, "error": str(exc), "output": logs}
+        return {"success": False, "error": str(exc), **logs.payload()}
+
+
+@router.post("/train/python", summary="Train RFC models using Python")
+async def train_python(request: RfcTrainRequest, background: bool = BACKGROUND_QUERY) -> dict[str, object]:
+    return await run_job("train", _train_python_task, request, background=background, name="train/python")
+
+
+@router.post("/train/c/manual", summary="Generate C code manually from RFC models")
+async def train_c_manual(
+    request: RfcCodegenRequest | None = None, background: bool = BACKGROUND_QUERY
+) -> dict[str, object]:
+    request = request or RfcCodegenRequest()
+    return await run_job("codegen", _train_c_manual_task, request, background=background, name="train/c/manual")
+
+
+@router.post("/build/c", summary="Compile the generated C classifier")
+async def build_c(request: RfcBuildRequest | None = None, background: bool = BACKGROUND_QUERY) -> dict[str, object]:
+    request = request or RfcBuildRequest()
+    return await run_job("codegen", _build_c_task, request, background=background, name="build/c")
+
+
+@router.post("/train/c/emlearn", summary="Generate C code using emlearn")
+async def train_c_emlearn(background: bool = BACKGROUND_QUERY) -> dict[str, object]:
+    return await run_job("codegen", _train_c_emlearn_task, background=background, name="train/c/emlearn")
 
 
+@router.get("/inference/c/workers", summary="Health of the persistent C classifier workers")
+async def inference_c_workers() -> dict[str, object]:
+    return get_worker_pool().health()
+
+
+@router.get("/inference/cache", summary="Hit ratio, size and eviction counters of the prediction caches")
+async def inference_cache() -> dict[str, object]:
+    return cache_stats()
+
+
+@router.post("/inference/cache/clear", summary="Empty the prediction caches")
+async def inference_cache_clear() -> dict[str, object]:
+    for engine in ("python", "c"):
+        get_prediction_cache(engine).clear()
+    return {"success": True, **cache_stats()}
+
 
 @router.post("/inference/c", summary="Run inference using compiled RFC C classifier")
 async def inference_c(
     request: RfcInferenceRequest | None = None,
     file: str | None = Query(None, description="Relative filename under data/output/rfc/test directory"),
-) -> dict[str, object]:
-    logs: list[str] = []
+    top_k: int = Query(DEFAULT_TOP_K, ge=0, description="Classes with the most votes returned per head for a single request"),
+    probabilities: bool = Query(False, description="Also return the vote fraction of every class for a single request"),
+    stream: bool = Query(False, description="Stream file results chunk by chunk instead of one JSON document"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Streaming output format: ndjson or csv"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, description="Rows read and classified per chunk when streaming"),
+):
+    logs = LogSink()
     try:
+        if file and stream:
+            try:
+                results, version = stream_predict_rfc_c_file(file, fmt=format, chunk_size=chunk_size)
+            except FileNotFoundError:
+                return {"success": False, "error": "File not found", **logs.payload()}
+            return StreamingResponse(
+                results, media_type=STREAM_FORMATS[format], headers={"X-Model-Version": version}
+            )
         if file:
             try:
                 results, time = batch_predict_rfc_c_file(file, logs)
             except FileNotFoundError:
-                return {"success": False, "error": "File not found", "output": logs}
-            return {"success": True, "output": logs, "results": results, "time": time}
+                return {"success": False, "error": "File not found", **logs.payload()}
+            return {"success": True, **logs.payload(), "results": results, "time": time}
         else:
             if request is None:
-                return {"success": False, "error": "Request body missing", "output": logs}
-            result = predict_rfc_c(request.dict(), logs)
-            return {"success": True, "output": logs, **result}
+                return {"success": False, "error": "Request body missing", **logs.payload()}
+            result = predict_rfc_c(request.dict(), logs, top_k=top_k, probabilities=probabilities)
+            return {"success": True, **logs.payload(), **result}
     except Exception as exc:
-        return {"success": False, "error": str(exc), "output": logs}
+        return {"success": False, "error": str(exc), **logs.payload()}
 
 
 @router.post("/inference/python", summary="Run inference using trained RFC Python models")
 async def inference_python(
     request: RfcInferenceRequest | None = None,
     file: str | None = Query(None, description="Relative filename under data/output/rfc/test directory"),
-) -> dict[str, object]:
-    logs: list[str] = []
+    timing_sample: int = Query(0, ge=0, description="Number of rows to time individually in batch mode"),
+    top_k: int = Query(DEFAULT_TOP_K, ge=0, description="Most probable classes returned per head for a single request"),
+    probabilities: bool = Query(False, description="Also return the full class distributions for a single request"),
+    stream: bool = Query(False, description="Stream file results chunk by chunk instead of one JSON document"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Streaming output format: ndjson or csv"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, description="Rows read and classified per chunk when streaming"),
+):
+    logs = LogSink()
     try:
+        if file and stream:
+            try:
+                results, version = stream_predict_rfc_python_file(file, fmt=format, chunk_size=chunk_size)
+            except FileNotFoundError:
+                return {"success": False, "error": "File not found", **logs.payload()}
+            return StreamingResponse(
+                results, media_type=STREAM_FORMATS[format], headers={"X-Model-Version": version}
+            )
         if file:
-           
             try:
-                results, time = batch_predict_rfc_python_file(file, logs)
+                results, time = batch_predict_rfc_python_file(file, logs, timing_sample=timing_sample)
             except FileNotFoundError:
-                return {"success": False, "error": "File not found", "output": logs}
-            return {"success": True, "output": logs, "results": results, "time": time}
+                return {"success": False, "error": "File not found", **logs.payload()}
+            return {"success": True, **logs.payload(), "results": results, "time": time}
         else:
             if request is None:
-                return {"success": False, "error": "Request body missing", "output": logs}
-            result = predict_rfc_python(request.dict(), logs)
-            return {"success": True, "output": logs, **result}
+                return {"success": False, "error": "Request body missing", **logs.payload()}
+            result = predict_rfc_python(request.dict(), logs, top_k=top_k, probabilities=probabilities)
+            return {"success": True, **logs.payload(), **result}
     except Exception as exc:
-        return {"success": False, "error": str(exc), "output": logs}
+        return {"success": False, "error": str(exc), **logs.payload()}
+
+
+
+def _benchmark_task(request: RfcBenchmarkRequest) -> dict[str, object]:
+    # Imported here: importing the backend package loads these routes, and
+    # ``python -m backend.utils.rfc.benchmark`` must not import itself first
+    from ..utils.rfc.benchmark import run_benchmark
 
+    logs = LogSink()
+    try:
+        report = run_benchmark(
+            test_file=request.test_file,
+            engines=request.engines,
+            limit=request.limit,
+            latency_samples=request.latency_samples,
+            logs=logs,
+        )
+    except FileNotFoundError as exc:
+        return {"success": False, "error": f"File not found: {exc}", **logs.payload()}
+    except Exception as exc:
+        return {"success": False, "error": str(exc), **logs.payload()}
+    return {"success": True, **logs.payload(), "report": report}
+
+
+@router.post("/benchmark", summary="Compare Python, C and emlearn inference on a test set")
+async def benchmark(
+    request: RfcBenchmarkRequest | None = None, background: bool = BACKGROUND_QUERY
+) -> dict[str, object]:
+    request = request or RfcBenchmarkRequest()
+    return await run_job("benchmark", _benchmark_task, request, background=background, name="benchmark")
+
+
+def _sweep_task(request: RfcSweepRequest) -> dict[str, object]:
+    # Imported here for the same reason as the benchmark
+    from ..utils.rfc.hyperparameter_sweep import run_sweep
+
+    logs = LogSink()
+    try:
+        report = run_sweep(
+            grid={
+                "n_estimators": request.n_estimators,
+                "max_depth": request.max_depth,
+                "max_features": request.max_features,
+                "vectorizer": request.vectorizers,
+            },
+            engines=request.engines,
+            n_jobs=request.n_jobs,
+            latency_samples=request.latency_samples,
+            budget_us=request.budget_us,
+            budget_ns=request.budget_ns,
+            accuracy_tolerance=request.accuracy_tolerance,
+            max_c_builds=request.max_c_builds,
+            save_defaults=request.save_defaults,
+            logs=logs,
+        )
+    except FileNotFoundError as exc:
+        return {"success": False, "error": f"File not found: {exc}", **logs.payload()}
+    except Exception as exc:
+        return {"success": False, "error": str(exc), **logs.payload()}
+    return {"success": True, **logs.payload(), "report": report}
+
+
+@router.post("/sweep", summary="Sweep RFC hyperparameters for accuracy and latency and save the chosen defaults")
+async def sweep(
+    request: RfcSweepRequest | None = None, background: bool = BACKGROUND_QUERY
+) -> dict[str, object]:
+    request = request or RfcSweepRequest()
+    return await run_job("sweep", _sweep_task, request, background=background, name="sweep")
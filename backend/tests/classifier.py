@@ -0,0 +1,78 @@
+"""Small RFC models and generated C classifiers trained on synthetic traffic."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import LabelEncoder
+
+from backend.utils.rfc import c_build
+from backend.utils.rfc.codegen_manual import tree_to_c_code
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.model_registry import MODEL_ARTIFACT, MODEL_ARTIFACT_FORMAT
+
+from .traffic import make_requests
+
+
+def train_models(n_estimators: int = 4, joint: bool = False) -> Dict[str, Any]:
+    """Vectorizer, encoders and forests in the layout of the model artifact."""
+    frame = make_requests(200)
+    # Overlapping hosts so that some predictions are not unanimous
+    frame.loc[::4, "headers_Host"] = "www.google.com"
+    texts = combined_text(frame)
+    vectorizer = CountVectorizer(binary=True).fit(texts)
+    X = vectorizer.transform(texts)
+    models: Dict[str, Any] = {"vectorizer": vectorizer}
+    labels = []
+    for head, column in (("service", "service"), ("activity", "activityType")):
+        models[f"{head}_encoder"] = LabelEncoder().fit(frame[column])
+        labels.append(models[f"{head}_encoder"].transform(frame[column]))
+    if joint:
+        models["joint_model"] = RandomForestClassifier(n_estimators=n_estimators, random_state=0).fit(
+            X, np.column_stack(labels)
+        )
+    else:
+        for head, y in zip(("service", "activity"), labels):
+            models[f"{head}_model"] = RandomForestClassifier(n_estimators=n_estimators, random_state=0).fit(X, y)
+    return models
+
+
+def write_artifact(models_dir: Path, models: Dict[str, Any], fmt: int = MODEL_ARTIFACT_FORMAT) -> Path:
+    """Save ``models`` (see ``train_models``) as the model artifact in ``models_dir``."""
+    path = models_dir / MODEL_ARTIFACT
+    joblib.dump({"format": fmt, **models}, path)
+    return path
+
+
+def generate_source(path: Path, reverse_services: bool = False) -> Path:
+    """Write the C source of a 5-tree service/activity model to ``path``.
+
+    ``reverse_services`` trains on reversed service ids, giving a model that
+    predicts differently from the same traffic.
+    """
+    frame = make_requests(400)
+    texts = combined_text(frame)
+    vectorizer = CountVectorizer(max_features=200, binary=True).fit(texts)
+    X = vectorizer.transform(texts)
+    encoders = {"service": LabelEncoder().fit(frame["service"]), "activity": LabelEncoder().fit(frame["activityType"])}
+    labels = {head: encoders[head].transform(frame[column])
+              for head, column in (("service", "service"), ("activity", "activityType"))}
+    if reverse_services:
+        labels["service"] = len(encoders["service"].classes_) - 1 - labels["service"]
+    forests = {head: RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y) for head, y in labels.items()}
+    with open(path, "w") as f:
+        tree_to_c_code(forests, vectorizer.get_feature_names_out(), encoders, vectorizer, None, file=f)
+    return path
+
+
+def compile_classifier(compiler: str, work_dir: Path) -> Path:
+    """Generate and compile a classifier in ``work_dir``; returns the output folder."""
+    out = work_dir / "out"
+    out.mkdir()
+    source = generate_source(work_dir / "api_classifier.c")
+    c_build._compile(compiler, source, ["-O1"], out, work_dir, None)
+    return out
@@ -0,0 +1,27 @@
+"""Shared fixtures of the backend tests.
+
+The tests run on synthetic proxy traffic so they do not depend on the
+(untracked) CodeBERT predictions or trained models.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from backend.utils.rfc.c_build import _find_compiler
+
+from .traffic import make_requests
+
+
+@pytest.fixture
+def requests_frame() -> pd.DataFrame:
+    return make_requests(300)
+
+
+@pytest.fixture(scope="session")
+def c_compiler() -> str:
+    """Path of the C compiler ``c_build`` would use; skips the test without one."""
+    try:
+        return _find_compiler()
+    except RuntimeError as exc:
+        pytest.skip(str(exc))
@@ -0,0 +1,97 @@
+"""Engine benchmark: test-set loading, agreement and comparison with earlier reports."""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils.path_config import PATHS
+from backend.utils.rfc.benchmark import (
+    _agreement,
+    _compare_previous,
+    _load_records,
+    _resolve_test_file,
+    run_benchmark,
+)
+from backend.utils.rfc.codegen_emlearn import convert
+from backend.utils.rfc.python_inference import FEATURE_COLUMNS
+
+from .traffic import make_requests
+
+
+@pytest.fixture
+def test_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setitem(PATHS, "rfc_python_train_test", tmp_path)
+    return tmp_path
+
+
+def test_newest_test_set_is_the_default(test_dir: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="test_set_"):
+        _resolve_test_file(None)
+    for name in ("test_set_20250101.csv", "test_set_20250724.csv", "other.csv"):
+        (test_dir / name).write_text("url\n", encoding="utf-8")
+
+    assert _resolve_test_file(None).name == "test_set_20250724.csv"
+    assert _resolve_test_file("other.csv") == (test_dir / "other.csv").resolve()
+    with pytest.raises(FileNotFoundError):
+        _resolve_test_file("missing.csv")
+
+
+def test_records_have_every_feature_and_no_nan(tmp_path: Path) -> None:
+    frame = make_requests(30).drop(columns=["requestHeaders_Origin"])
+    frame.loc[::2, "url"] = np.nan
+    frame.to_csv(tmp_path / "t.csv", index=False)
+
+    records, labels = _load_records(tmp_path / "t.csv", limit=20)
+    assert len(records) == 20
+    assert all(list(record) == FEATURE_COLUMNS for record in records)
+    assert records[0]["url"] is None and records[0]["requestHeaders_Origin"] is None
+    assert labels == {
+        "service": frame["service"][:20].tolist(),
+        "activity": frame["activityType"][:20].tolist(),
+    }
+
+    pd.DataFrame({"url": ["https://example.com/"]}).to_csv(tmp_path / "unlabelled.csv", index=False)
+    assert _load_records(tmp_path / "unlabelled.csv", None)[1] == {}
+
+
+def test_agreement_covers_shared_heads_of_available_engines() -> None:
+    reports = {
+        "python": {"available": True, "predictions": {"service": ["a", "b", "c", "d"], "activity": ["x"] * 4}},
+        "c": {"available": True, "predictions": {"service": ["a", "b", "c", "a"], "activity": ["x", "y", "x", "x"]}},
+        "emlearn": {"available": True, "predictions": {"service": ["a", "a", "a", "a"]}},
+        "broken": {"available": False, "error": "no compiler"},
+    }
+    assert _agreement(reports) == {
+        "python_vs_c": {"service": 0.75, "activity": 0.75},
+        "python_vs_emlearn": {"service": 0.25},
+        "c_vs_emlearn": {"service": 0.5},
+    }
+
+
+def test_compare_previous_skips_unavailable_engines() -> None:
+    def engine(rps: float, p50: float, version: str = "v") -> dict:
+        return {"available": True, "version": version, "records_per_second": rps, "latency_ms": {"p50": p50}}
+
+    previous = {"engines": {"python": engine(100.0, 2.0, "old"), "c": {"available": False}}}
+    report = {"engines": {"python": engine(150.0, 1.0), "c": engine(1e5, 0.01), "emlearn": {"available": False}}}
+    assert _compare_previous(report, previous) == {
+        "python": {"previous_version": "old", "throughput_ratio": 1.5, "p50_ratio": 0.5},
+    }
+
+
+@pytest.mark.skipif(convert is not None, reason="emlearn is installed")
+def test_engine_that_cannot_run_is_reported_unavailable(tmp_path: Path) -> None:
+    make_requests(10).to_csv(tmp_path / "t.csv", index=False)
+    with pytest.raises(ValueError, match="Unknown engines"):
+        run_benchmark(str(tmp_path / "t.csv"), engines=["rust"], save=False)
+
+    report = run_benchmark(str(tmp_path / "t.csv"), engines=["emlearn"], save=False)
+    assert report["records"] == 10 and report["labelled"]
+    assert report["engines"]["emlearn"]["available"] is False
+    assert report["engines"]["emlearn"]["error"] == "emlearn package not installed"
+    assert report["agreement"] == {}
+    assert not any(name.startswith("benchmark_") for name in os.listdir(tmp_path))
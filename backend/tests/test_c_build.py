@@ -0,0 +1,113 @@
+"""Compile stage of the generated classifier: build cache, PGO and streaming."""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from backend.utils.rfc import c_build, c_inference
+from backend.utils.rfc.c_inference import CWorkerPool, NativeClassifier
+from backend.utils.rfc.canonical import FEATURE_FIELDS
+
+from .classifier import generate_source
+from .traffic import make_requests
+
+# More records than fit into the stdin and stdout pipe buffers together
+MANY_RECORDS = 1500
+TIMEOUT_SECONDS = 60
+
+
+def _within(seconds: float, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """``func(*args, **kwargs)``, failing instead of hanging if it does not return in time."""
+    outcome: Dict[str, Any] = {}
+
+    def target() -> None:
+        try:
+            outcome["value"] = func(*args, **kwargs)
+        except BaseException as exc:  # re-raised in the test thread
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), f"{func.__name__} did not finish within {seconds} s"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+@pytest.fixture(scope="module")
+def records() -> List[Dict[str, Any]]:
+    return make_requests(MANY_RECORDS, seed=1)[list(FEATURE_FIELDS)].to_dict(orient="records")
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory: pytest.TempPathFactory, c_compiler: str) -> Path:
+    return generate_source(tmp_path_factory.mktemp("codegen") / "api_classifier.c")
+
+
+@pytest.fixture
+def output_dir(tmp_path: Path, source: Path, records: List[Dict[str, Any]], monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Point the build stage at a scratch output folder and the synthetic records."""
+    monkeypatch.setattr(c_build, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(c_build, "CACHE_DIR", tmp_path / "build-cache")
+    monkeypatch.setattr(c_build, "LIBRARY_FILE", tmp_path / c_build.LIBRARY_FILE.name)
+    monkeypatch.setattr(c_build, "_sample_records", lambda limit=2000: records[:limit])
+    return tmp_path
+
+
+def test_build_is_cached_per_source_and_flags(output_dir: Path, source: Path) -> None:
+    first = c_build.build_c_classifier("O2", source=source, smoke_test=False)
+    again = c_build.build_c_classifier("O2", source=source, smoke_test=False)
+    other = c_build.build_c_classifier("O3", source=source, smoke_test=False)
+
+    assert not first["cached"] and again["cached"]
+    assert again["cache_key"] == first["cache_key"] != other["cache_key"]
+    assert not other["cached"]
+    assert (output_dir / c_build._exe_name()).exists() and (output_dir / c_build.LIBRARY_FILE.name).exists()
+
+
+def test_pgo_build_and_smoke_test_stream_many_records(output_dir: Path, source: Path) -> None:
+    if "clang" in c_build._compiler_id(c_build._find_compiler()).lower():
+        pytest.skip("clang profiles need llvm-profdata")
+    result = _within(TIMEOUT_SECONDS, c_build.build_c_classifier, "O2", pgo=True, source=source)
+
+    assert result["pgo"]
+    assert result["smoke_test"]["records"] == MANY_RECORDS
+
+
+def test_worker_pool_matches_library(output_dir: Path, source: Path, records: List[Dict[str, Any]]) -> None:
+    c_build.build_c_classifier("O2", source=source, smoke_test=False)
+    pool = CWorkerPool(size=1)
+    try:
+        streamed = _within(TIMEOUT_SECONDS, pool.run, output_dir / c_build._exe_name(), records, top_k=0)
+    finally:
+        pool.shutdown()
+    native = NativeClassifier(c_build.LIBRARY_FILE).classify_ranked(records, top_k=0)
+
+    assert len(streamed) == MANY_RECORDS
+    assert [(r["service_id"], r["activity_id"]) for r in streamed] == [
+        (r["service_id"], r["activity_id"]) for r in native
+    ]
+
+
+def test_rebuilt_library_is_loaded(
+    output_dir: Path, source: Path, records: List[Dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(c_inference, "LIBRARY_FILE", c_build.LIBRARY_FILE)
+    monkeypatch.setattr(c_inference, "_native", None)
+    c_build.build_c_classifier("O2", source=source, smoke_test=False)
+    before = c_inference.get_native_classifier()
+    old_ids = [r["service_id"] for r in before.classify(records[:50])]
+
+    other = generate_source(output_dir / "other.c", reverse_services=True)
+    c_build.build_c_classifier("O2", source=other, smoke_test=False)
+    after = c_inference.get_native_classifier()
+    new_ids = [r["service_id"] for r in after.classify(records[:50])]
+
+    assert after is not before and after.loaded_path != before.loaded_path
+    assert new_ids != old_ids
+    # The previous build keeps working for requests that still hold it
+    assert [r["service_id"] for r in before.classify(records[:50])] == old_ids
@@ -0,0 +1,209 @@
+"""C inference: stream worker pool recovery and fallbacks, ranking and decoded output."""
+from __future__ import annotations
+
+import stat
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import pytest
+
+from backend.utils.rfc import c_inference, python_inference
+from backend.utils.rfc.c_build import _exe_name
+from backend.utils.rfc.c_inference import (
+    ALL_CLASSES,
+    LIBRARY_FILE,
+    CWorkerPool,
+    NativeClassifier,
+    _rank_votes,
+    _run_classifier,
+)
+from backend.utils.rfc.canonical import FEATURE_FIELDS
+from backend.utils.rfc.model_registry import ModelRegistry
+from backend.utils.rfc.prediction_cache import PredictionCache
+from backend.utils.rfc.python_inference import predict_rfc_python, top_k_classes
+
+from .classifier import compile_classifier, train_models, write_artifact
+from .traffic import make_requests
+
+# Answers PING, then never answers a record
+HANGING_WORKER = """\
+import sys, time
+for line in sys.stdin:
+    if line.strip() == "PING":
+        print('{"pong": true}', flush=True)
+    else:
+        time.sleep(3600)
+"""
+
+
+@pytest.fixture(scope="module")
+def executable(tmp_path_factory: pytest.TempPathFactory, c_compiler: str) -> Path:
+    return compile_classifier(c_compiler, tmp_path_factory.mktemp("classifier")) / _exe_name()
+
+
+@pytest.fixture(scope="module")
+def records() -> List[Dict[str, Any]]:
+    return make_requests(40, seed=2)[list(FEATURE_FIELDS)].to_dict(orient="records")
+
+
+@pytest.fixture
+def pool() -> Iterator[CWorkerPool]:
+    pool = CWorkerPool(size=1)
+    yield pool
+    pool.shutdown()
+
+
+def _ids(outputs: List[Dict[str, Any]]) -> List[tuple]:
+    return [(out["service_id"], out["activity_id"]) for out in outputs]
+
+
+def test_crashed_worker_is_replaced(pool: CWorkerPool, executable: Path, records: List[Dict[str, Any]]) -> None:
+    expected = _ids(pool.run(executable, records, top_k=0))
+    worker = pool.acquire(executable)
+    pool.release(worker)
+    worker.proc.kill()
+    worker.proc.wait()
+
+    assert _ids(pool.run(executable, records, top_k=0)) == expected
+    assert pool.health()["restarts"] == 1
+
+
+def test_failed_respawn_frees_the_slot(
+    pool: CWorkerPool, executable: Path, records: List[Dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pool.run(executable, records[:1], top_k=0)
+    worker = pool.acquire(executable)
+    pool.release(worker)
+    worker.proc.kill()
+    worker.proc.wait()
+
+    def cannot_start(*args: Any, **kwargs: Any) -> None:
+        raise OSError("Resource temporarily unavailable")
+
+    monkeypatch.setattr(c_inference, "_StreamWorker", cannot_start)
+    with pytest.raises(RuntimeError, match="Could not start"):
+        pool.run(executable, records, top_k=0)
+    assert pool.health()["started"] == 0
+
+    monkeypatch.undo()
+    assert len(pool.run(executable, records, top_k=0)) == len(records)
+
+
+def test_hung_worker_is_killed_and_the_request_falls_back(
+    tmp_path: Path, records: List[Dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    if sys.platform.startswith("win"):
+        pytest.skip("needs an executable script")
+    script = tmp_path / "hanging_worker"
+    script.write_text(f"#!{sys.executable}\n{HANGING_WORKER}", encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setattr(c_inference, "WORKER_TIMEOUT", 1.0)
+    pool = CWorkerPool(size=1)
+    monkeypatch.setattr(c_inference, "get_worker_pool", lambda: pool)
+
+    start = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match="did not answer in time"):
+            pool.run(script, records[:3], top_k=0)
+        assert time.monotonic() - start < 10
+        assert pool.health()["started"] == 0
+
+        # Then the request is classified by one process per record
+        monkeypatch.setattr(c_inference, "_predict_cli", lambda exe, request, logs=None: {"service_id": 0})
+        assert _run_classifier(None, script, records[:3], 0) == [{"service_id": 0}] * 3
+    finally:
+        pool.shutdown()
+
+
+def test_garbled_answer_is_a_runtime_error(tmp_path: Path, pool: CWorkerPool, records: List[Dict[str, Any]]) -> None:
+    if sys.platform.startswith("win"):
+        pytest.skip("needs an executable script")
+    script = tmp_path / "garbled_worker"
+    script.write_text(
+        f"#!{sys.executable}\nimport sys\n"
+        "for line in sys.stdin:\n"
+        "    print('{\"pong\": true}' if line.strip() == 'PING' else 'not json', flush=True)\n",
+        encoding="utf-8",
+    )
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    with pytest.raises(RuntimeError, match="worker failed"):
+        pool.run(script, records[:2], top_k=0)
+
+
+def test_rank_votes_breaks_ties_by_class_id() -> None:
+    votes = np.array([[1, 3, 3, 0], [0, 0, 5, 0]])
+    first, second = _rank_votes("service", votes, n_trees=7, top_k=3)
+
+    assert first == {
+        "service_id": 1,
+        "service_confidence": round(3 / 7, 4),
+        "service_margin": 0.0,
+        "service_top_k": [[1, round(3 / 7, 4)], [2, round(3 / 7, 4)], [0, round(1 / 7, 4)]],
+    }
+    assert second["service_margin"] == round(5 / 7, 4)
+    assert [c for c, _ in second["service_top_k"]] == [2, 0, 1]
+    assert "service_top_k" not in _rank_votes("service", votes, 7, top_k=0)[0]
+    # A single class has no runner-up
+    assert _rank_votes("activity", np.array([[4]]), 4, top_k=5)[0]["activity_margin"] == 1.0
+
+
+def test_python_and_c_rank_ties_alike() -> None:
+    rng = np.random.default_rng(0)
+    labels = np.array([f"class{i}" for i in range(6)])
+    votes = rng.integers(0, 3, size=(200, 6))
+    for row, ranked in zip(votes, _rank_votes("service", votes, n_trees=10, top_k=6)):
+        python = [entry["label"] for entry in top_k_classes(row / 10, labels, 6)]
+        assert python == [labels[c] for c, _ in ranked["service_top_k"]]
+
+
+def test_generated_ranking_matches_rank_votes(
+    pool: CWorkerPool, executable: Path, records: List[Dict[str, Any]]
+) -> None:
+    native = NativeClassifier(executable.parent / LIBRARY_FILE.name)
+    # Every class listed, so zero-vote classes are ranked too
+    streamed = pool.run(executable, records, top_k=ALL_CLASSES)
+    for c_out, python_out in zip(streamed, native.classify_ranked(records, top_k=ALL_CLASSES)):
+        for head in ("service", "activity"):
+            assert c_out[f"{head}_id"] == python_out[f"{head}_id"]
+            assert c_out[f"{head}_margin"] == pytest.approx(python_out[f"{head}_margin"], abs=1e-4)
+            assert [c for c, _ in c_out[f"{head}_top_k"]] == [c for c, _ in python_out[f"{head}_top_k"]]
+            assert [p for _, p in c_out[f"{head}_top_k"]] == pytest.approx(
+                [p for _, p in python_out[f"{head}_top_k"]], abs=1e-4
+            )
+
+
+def test_decoded_output_has_the_python_schema(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    write_artifact(tmp_path, train_models())
+    registry = ModelRegistry(tmp_path)
+    monkeypatch.setattr(python_inference, "get_registry", lambda: registry)
+    monkeypatch.setattr(python_inference, "get_prediction_cache", lambda engine: PredictionCache(max_entries=0))
+    request = make_requests(1, seed=5)[list(FEATURE_FIELDS)].to_dict(orient="records")[0]
+    python = predict_rfc_python(request, top_k=2, probabilities=True)
+
+    monkeypatch.setattr(c_inference, "_service_map", {0: "Dropbox", 1: "Gmail", 2: "Google Drive"})
+    monkeypatch.setattr(c_inference, "_activity_map", {0: "Upload", 1: "Send"})
+    out = {
+        **_rank_votes("service", np.array([[1, 4, 0]]), 5, ALL_CLASSES)[0],
+        **_rank_votes("activity", np.array([[2, 3]]), 5, ALL_CLASSES)[0],
+    }
+    decoded = c_inference._decode(out, top_k=2, probabilities=True)
+
+    assert set(python) - {"combined_features", "feature_count"} <= set(decoded)
+    assert decoded["service_prediction"] == decoded["service"] == "Gmail"
+    assert decoded["service_confidence"] == 0.8 and decoded["service_margin"] == 0.6
+    assert decoded["service_top_k"] == [{"label": "Gmail", "probability": 0.8}, {"label": "Dropbox", "probability": 0.2}]
+    assert decoded["service_probabilities"] == {"Gmail": 0.8, "Dropbox": 0.2, "Google Drive": 0.0}
+    assert decoded["activity_probabilities"] == {"Send": 0.6, "Upload": 0.4}
+    for head in ("service", "activity"):
+        assert [set(entry) for entry in decoded[f"{head}_top_k"]] == [set(entry) for entry in python[f"{head}_top_k"]]
+
+    # Without top_k and probabilities, as for batches
+    plain = c_inference._decode(out)
+    assert "service_top_k" not in plain and "service_probabilities" not in plain
+    # Executables generated before confidence output print the ids only
+    assert set(c_inference._decode({"service_id": 1, "activity_id": 0})) == {
+        "service_id", "activity_id", "service", "activity"
+    }
@@ -0,0 +1,146 @@
+"""Canonical form of the request fields, in Python and in the generated C."""
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils.path_config import PATHS
+from backend.utils.rfc.canonical import (
+    B64_MIN_LENGTH,
+    C_SOURCE,
+    FEATURE_FIELDS,
+    HEX_MIN_DIGITS,
+    MAX_FIELD_BYTES,
+    URL_FIELDS,
+    canonicalize_field,
+    canonicalize_frame,
+)
+
+from .traffic import make_requests
+
+# Reads "<is_url>\t<value>" lines and prints the canonical value of each
+HARNESS = """\
+#include <ctype.h>
+#include <stdio.h>
+#include <string.h>
+
+{canonical}
+int main(void) {{
+    static char line[1 << 16];
+    static char out[CANON_MAX_FIELD + 1];
+    while (fgets(line, sizeof line, stdin)) {{
+        size_t n = strlen(line);
+        if (n && line[n - 1] == '\\n') line[--n] = '\\0';
+        canonicalize_field(line + 2, line[0] == '1', out);
+        puts(out);
+    }}
+    return 0;
+}}
+"""
+
+EDGE_CASES = [
+    "",
+    "none",
+    "a" * (MAX_FIELD_BYTES + 100),
+    "x/" * MAX_FIELD_BYTES,
+    "1" * (HEX_MIN_DIGITS - 1),
+    "1" * HEX_MIN_DIGITS,
+    "deadbeef-" * 3 + "1",
+    "-" * 40,
+    "550e8400-e29b-41d4-a716-446655440000",
+    "abcdefabcdefabcdefabcdef",
+    "aB3" * (B64_MIN_LENGTH // 3 - 1) + "aB",
+    "aB3" * (B64_MIN_LENGTH // 3),
+    "ABCDEFGHIJKLMNOPQRSTUVWX1234",
+    "token_" + "Zx9" * 10 + "_end",
+    "https://host/p?a=1&b=2&c#frag",
+    "https://host/p?a=1=2&&b&=3",
+    "https://host/p#?a=1",
+    "https://host/0123456789abcdef0123/x?q=0123456789abcdef0123",
+    "?=&=?",
+    "/path/" + "q" * (MAX_FIELD_BYTES - 10) + "?key=" + "v" * 50 + "&last=1",
+    "café/über/0123456789abcdef0123",
+]
+
+
+def _random_values(n: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    alphabet = list("0123456789abcdefABCDEFxyzXYZ-_./?&=#%+:")
+    return ["".join(rng.choice(alphabet, size=rng.integers(0, 80))) for _ in range(n)]
+
+
+def _cases() -> List[Tuple[str, str]]:
+    """(field, value) pairs: edge cases, synthetic traffic and the committed test set."""
+    frames = [make_requests(200)]
+    test_set = Path(PATHS["rfc_python_train_test"]) / "test_set_20250724.csv"
+    if test_set.exists():
+        frames.append(pd.read_csv(test_set))
+    cases = [(field, value) for field in ("url", "headers_Host") for value in EDGE_CASES + _random_values(500)]
+    for frame in frames:
+        for field in FEATURE_FIELDS:
+            cases += [(field, str(value)) for value in frame[field].dropna().unique()]
+    return cases
+
+
+@pytest.fixture(scope="module")
+def c_canonicalize(tmp_path_factory: pytest.TempPathFactory, c_compiler: str):
+    work = tmp_path_factory.mktemp("canonical")
+    (work / "harness.c").write_text(HARNESS.format(canonical=C_SOURCE), encoding="utf-8")
+    subprocess.run([c_compiler, "-O1", "harness.c", "-o", "harness"], cwd=work, check=True, capture_output=True)
+
+    def run(cases: List[Tuple[str, str]]) -> List[str]:
+        payload = "".join(f"{int(field in URL_FIELDS)}\t{value}\n" for field, value in cases)
+        proc = subprocess.run(
+            [str(work / "harness")], input=payload.encode("utf-8"), capture_output=True, check=True
+        )
+        return proc.stdout.decode("utf-8").split("\n")[: len(cases)]
+
+    return run
+
+
+def test_c_matches_python(c_canonicalize) -> None:
+    cases = _cases()
+    expected = [canonicalize_field(value, field) for field, value in cases]
+    mismatches = [
+        (field, value, want, got)
+        for (field, value), want, got in zip(cases, expected, c_canonicalize(cases))
+        if want != got
+    ]
+    assert not mismatches, mismatches[:5]
+
+
+@pytest.mark.parametrize(
+    ("value", "field", "expected"),
+    [
+        ("https://h/log?format=json&authuser=0#x", "url", "https://h/log?format=&authuser="),
+        ("https://h/log?format=json", "headers_Host", "https://h/log?format=json"),
+        ("/f/" + "0123456789abcdef" + "/x", "url", "/f/hex/x"),
+        ("/f/" + "0123456789abcde" + "/x", "url", "/f/0123456789abcde/x"),
+        ("abcdefabcdefabcdef", "url", "abcdefabcdefabcdef"),
+        ("id=" + "xY7" * 8, "headers_Host", "id=b64"),
+        ("id=" + "xy7" * 8, "headers_Host", "id=" + "xy7" * 8),
+    ],
+)
+def test_canonical_form(value: str, field: str, expected: str) -> None:
+    assert canonicalize_field(value, field) == expected
+
+
+def test_idempotent_and_capped() -> None:
+    for field, value in _cases():
+        once = canonicalize_field(value, field)
+        assert canonicalize_field(once, field) == once
+        assert len(once.encode("utf-8")) <= MAX_FIELD_BYTES
+
+
+def test_frame_matches_field() -> None:
+    frame = make_requests(100)
+    frame.loc[::7, "url"] = np.nan
+    canonical = canonicalize_frame(frame, FEATURE_FIELDS)
+    for field in FEATURE_FIELDS:
+        expected = [canonicalize_field("" if pd.isna(v) else str(v), field) for v in frame[field]]
+        assert canonical[field].tolist() == expected
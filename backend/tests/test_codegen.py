@@ -0,0 +1,120 @@
+"""Generated C classifier against the scikit-learn forests it was generated from."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import LabelEncoder
+
+from backend.utils.rfc import c_build
+from backend.utils.rfc.c_inference import NativeClassifier
+from backend.utils.rfc.canonical import FEATURE_FIELDS
+from backend.utils.rfc.codegen_manual import FOREST_LAYOUTS, VOCAB_LOOKUPS, tree_to_c_code
+from backend.utils.rfc.feature_text import combined_text
+
+from .traffic import make_requests
+
+
+def _tree_votes(forest: RandomForestClassifier, X: Any, output: int, n_classes: int) -> np.ndarray:
+    """Per-class count of trees voting for it; every tree votes for its leaf's majority class."""
+    classes = forest.classes_[output] if forest.n_outputs_ > 1 else forest.classes_
+    votes = np.zeros((X.shape[0], n_classes), dtype=np.int64)
+    rows = np.arange(X.shape[0])
+    for tree in forest.estimators_:
+        proba = tree.predict_proba(X.astype(np.float32))
+        proba = proba[output] if forest.n_outputs_ > 1 else proba
+        votes[rows, classes[proba.argmax(axis=1)].astype(int)] += 1
+    return votes
+
+
+@pytest.fixture(scope="module")
+def model() -> Dict[str, Any]:
+    frame = make_requests(420)
+    # Overlapping hosts and paths so the trees disagree on some rows
+    frame.loc[::5, "url"] = frame["url"].shift(1)
+    frame.loc[::4, "headers_Host"] = "www.google.com"
+    frame = frame.dropna(subset=["url"])
+    texts = combined_text(frame)
+    vectorizer = CountVectorizer(max_features=300, binary=True).fit(texts)
+    encoders = {"service": LabelEncoder().fit(frame["service"]), "activity": LabelEncoder().fit(frame["activityType"])}
+    y = np.column_stack([encoders["service"].transform(frame["service"]),
+                         encoders["activity"].transform(frame["activityType"])])
+    test = make_requests(300, seed=3)
+    return {
+        "vectorizer": vectorizer,
+        "encoders": encoders,
+        "X": vectorizer.transform(texts),
+        "y": y,
+        "records": test[list(FEATURE_FIELDS)].to_dict(orient="records"),
+        "X_test": vectorizer.transform(combined_text(test)),
+    }
+
+
+def _forests(model: Dict[str, Any], joint: bool) -> Dict[str, RandomForestClassifier]:
+    X, y = model["X"], model["y"]
+    if joint:
+        return {"joint": RandomForestClassifier(n_estimators=7, max_depth=6, random_state=0).fit(X, y)}
+    return {
+        head: RandomForestClassifier(n_estimators=7, max_depth=6, random_state=0).fit(X, y[:, i])
+        for i, head in enumerate(("service", "activity"))
+    }
+
+
+def _library(
+    tmp_path: Path, compiler: str, model: Dict[str, Any], forests: Dict[str, Any], layout: str, lookup: str
+) -> Path:
+    source = tmp_path / "api_classifier.c"
+    with open(source, "w") as f:
+        tree_to_c_code(
+            forests, model["vectorizer"].get_feature_names_out(), model["encoders"], model["vectorizer"], None,
+            file=f, forest_layout=layout, vocab_lookup=lookup,
+        )
+    out = tmp_path / "out"
+    out.mkdir()
+    c_build._compile(compiler, source, ["-O1"], out, tmp_path, None)
+    return out / c_build.LIBRARY_FILE.name
+
+
+def _expected_votes(model: Dict[str, Any], forests: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    X = model["X_test"]
+    n_service = len(model["encoders"]["service"].classes_)
+    n_activity = len(model["encoders"]["activity"].classes_)
+    if "joint" in forests:
+        return _tree_votes(forests["joint"], X, 0, n_service), _tree_votes(forests["joint"], X, 1, n_activity)
+    return _tree_votes(forests["service"], X, 0, n_service), _tree_votes(forests["activity"], X, 0, n_activity)
+
+
+@pytest.mark.parametrize("joint", [False, True], ids=["separate", "joint"])
+@pytest.mark.parametrize("layout", FOREST_LAYOUTS)
+def test_c_votes_match_forests(tmp_path: Path, c_compiler: str, model: Dict[str, Any], layout: str, joint: bool) -> None:
+    forests = _forests(model, joint)
+    native = NativeClassifier(_library(tmp_path, c_compiler, model, forests, layout, "perfect"))
+    service_votes, activity_votes = native.votes(model["records"])
+    expected_service, expected_activity = _expected_votes(model, forests)
+
+    np.testing.assert_array_equal(service_votes, expected_service)
+    np.testing.assert_array_equal(activity_votes, expected_activity)
+
+
+@pytest.mark.parametrize("lookup", VOCAB_LOOKUPS)
+def test_vocabulary_lookups_agree(tmp_path: Path, c_compiler: str, model: Dict[str, Any], lookup: str) -> None:
+    forests = _forests(model, joint=True)
+    native = NativeClassifier(_library(tmp_path, c_compiler, model, forests, "nested", lookup))
+    service_votes, _ = native.votes(model["records"])
+    np.testing.assert_array_equal(service_votes, _expected_votes(model, forests)[0])
+
+
+def test_compact_leaves_reject_too_many_classes(tmp_path: Path, model: Dict[str, Any]) -> None:
+    # Joint compact leaves hold 8 bits per class id
+    labels = [f"service{i % 300:03d}" for i in range(model["X"].shape[0])]
+    encoders = {"service": LabelEncoder().fit(labels), "activity": model["encoders"]["activity"]}
+    y = np.column_stack([encoders["service"].transform(labels), model["y"][:, 1]])
+    forests = {"joint": RandomForestClassifier(n_estimators=2, random_state=0).fit(model["X"], y)}
+    with pytest.raises(ValueError, match="compact leaf"):
+        with open(tmp_path / "api_classifier.c", "w") as f:
+            tree_to_c_code(forests, model["vectorizer"].get_feature_names_out(), encoders, model["vectorizer"], None,
+                           file=f, forest_layout="compact")
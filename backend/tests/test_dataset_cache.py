@@ -0,0 +1,80 @@
+"""Cached training data with the combined text and label codes."""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from backend.utils.rfc.dataset_cache import COMBINED, encode_labels, load_dataset, load_frame
+from backend.utils.rfc.feature_text import combined_text
+
+from .traffic import make_requests
+
+
+def _building(log: list[str]) -> bool:
+    return any(line.startswith("Building dataset cache") for line in log)
+
+
+def test_frame_is_built_once_and_reused(tmp_path: Path, requests_frame: pd.DataFrame) -> None:
+    source = tmp_path / "a.csv"
+    requests_frame.to_csv(source, index=False)
+    cache = tmp_path / "cache"
+
+    log: list[str] = []
+    built = load_frame(source, log, cache)
+    assert _building(log)
+    assert built[COMBINED].tolist() == combined_text(pd.read_csv(source)).tolist()
+    assert list(built["service"].cat.categories) == sorted(requests_frame["service"].unique())
+
+    log = []
+    cached = load_frame(source, log, cache)
+    assert not _building(log)
+    pd.testing.assert_frame_equal(cached, built)
+
+
+def test_touched_file_is_rehashed_and_changed_file_rebuilt(tmp_path: Path, requests_frame: pd.DataFrame) -> None:
+    source = tmp_path / "a.csv"
+    requests_frame.to_csv(source, index=False)
+    cache = tmp_path / "cache"
+    load_frame(source, None, cache)
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    log: list[str] = []
+    load_frame(source, log, cache)
+    assert not _building(log)
+
+    # Same size, so only the hash tells the difference
+    changed = requests_frame.copy()
+    assert changed.loc[0, "method"] == "POST"
+    changed.loc[0, "method"] = "PUSH"
+    changed.to_csv(source, index=False)
+    assert source.stat().st_size == stat.st_size
+    log = []
+    rebuilt = load_frame(source, log, cache)
+    assert _building(log)
+    assert rebuilt.loc[0, "method"] == "PUSH"
+
+
+def test_dataset_labels_share_sorted_categories(tmp_path: Path) -> None:
+    first = make_requests(50, seed=1)
+    second = make_requests(50, seed=2)
+    second.loc[:, "service"] = "Teams"
+    for name, frame in (("a.csv", first), ("b.csv", second)):
+        frame.to_csv(tmp_path / name, index=False)
+
+    df = load_dataset([tmp_path / "a.csv", tmp_path / "b.csv"], None, tmp_path / "cache")
+    assert len(df) == 100
+    encoder, codes = encode_labels(df["service"])
+    expected = LabelEncoder().fit(df["service"].astype(str))
+    np.testing.assert_array_equal(encoder.classes_, expected.classes_)
+    np.testing.assert_array_equal(codes, expected.transform(df["service"].astype(str)))
+
+
+def test_encode_labels_of_plain_strings() -> None:
+    encoder, codes = encode_labels(pd.Series(["b", "a", "c", "a"]))
+    assert list(encoder.classes_) == ["a", "b", "c"]
+    assert codes.tolist() == [1, 0, 2, 0]
@@ -0,0 +1,51 @@
+"""Column-wise combined feature text."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from backend.utils.rfc.canonical import FEATURE_FIELDS, canonicalize_frame
+from backend.utils.rfc.feature_text import combined_record, combined_text, distinct_combined_text
+
+from .traffic import make_requests
+
+
+def _row_wise(frame: pd.DataFrame) -> list[str]:
+    # The row-wise builder the trainers used before
+    return canonicalize_frame(frame, FEATURE_FIELDS).agg(" ".join, axis=1).tolist()
+
+
+def test_matches_row_wise_builder(requests_frame: pd.DataFrame) -> None:
+    frame = requests_frame.copy()
+    frame.loc[::4, "requestHeaders_Referer"] = np.nan
+    frame.loc[::6, "method"] = np.nan
+    assert combined_text(frame).tolist() == _row_wise(frame)
+
+
+def test_missing_columns_are_empty(requests_frame: pd.DataFrame) -> None:
+    frame = requests_frame.drop(columns=["requestHeaders_Accept", "requestHeaders_Origin"])
+    assert combined_text(frame).tolist() == _row_wise(frame)
+
+
+def test_index_is_kept(requests_frame: pd.DataFrame) -> None:
+    frame = requests_frame.iloc[::3]
+    assert combined_text(frame).index.equals(frame.index)
+
+
+def test_distinct_rows() -> None:
+    frame = pd.concat([make_requests(20, seed=1)] * 3, ignore_index=True)
+    codes, texts = distinct_combined_text(frame)
+    assert len(texts) == len(set(texts)) <= 20
+    assert texts[codes].tolist() == combined_text(frame).tolist()
+
+
+def test_single_record_matches_batch() -> None:
+    frame = make_requests(40, seed=5).astype(object)
+    frame.loc[::3, "url"] = np.nan
+    frame.loc[1::3, "requestHeaders_Accept"] = None
+    frame.loc[2::3, "method"] = ""
+    frame.loc[::5, "requestHeaders_Origin"] = 0
+    batch = combined_text(frame).tolist()
+    single = [combined_record(record) for record in frame.to_dict(orient="records")]
+    assert single == batch
+    assert all("nan" not in text.split() for text in single)
@@ -0,0 +1,135 @@
+"""Sub-forest selection for the generated C classifier."""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import LabelEncoder
+
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.forest_pruning import (
+    CostModel,
+    ForestPruner,
+    _greedy_order,
+    _Head,
+    hard_vote,
+    pareto_front,
+    select,
+    tree_class_ids,
+    truncate_tree,
+)
+
+from .traffic import make_requests
+
+
+def _head(preds: list[list[int]], reference: list[int], n_classes: int = 3) -> _Head:
+    return _Head(np.asarray(preds), np.asarray(reference), n_classes)
+
+
+def test_greedy_order_picks_the_most_agreeing_tree_first() -> None:
+    reference = [0, 1, 2, 0]
+    heads = [_head([[2, 2, 2, 2], [0, 1, 2, 0], [0, 1, 1, 1]], reference)]
+    order, agreement = _greedy_order(heads)
+
+    assert order[0] == 1 and agreement[0] == 1.0
+    assert sorted(order) == [0, 1, 2]
+
+
+def test_greedy_order_scores_all_heads() -> None:
+    # Tree 0 is perfect on the first head only, tree 1 on both
+    service = _head([[0, 1, 2], [0, 1, 2], [1, 1, 1]], [0, 1, 2])
+    activity = _head([[1, 1, 1], [0, 0, 1], [0, 0, 1]], [0, 0, 1], n_classes=2)
+    order, agreement = _greedy_order([service, activity])
+
+    assert order[0] == 1 and agreement[0] == 1.0
+
+
+@pytest.fixture(scope="module")
+def pool() -> Dict[str, Any]:
+    frame = make_requests(400)
+    frame.loc[::3, "headers_Host"] = "www.google.com"
+    frame.loc[::5, "url"] = "https://www.google.com/"
+    texts = combined_text(frame)
+    vectorizer = CountVectorizer(binary=True).fit(texts)
+    X = vectorizer.transform(texts)
+    encoders = {"service": LabelEncoder().fit(frame["service"]), "activity": LabelEncoder().fit(frame["activityType"])}
+    y = [encoders["service"].transform(frame["service"]), encoders["activity"].transform(frame["activityType"])]
+    forests = {
+        head: RandomForestClassifier(n_estimators=6, random_state=0).fit(X[:300], labels[:300])
+        for head, labels in zip(("service", "activity"), y)
+    }
+    counts = (len(encoders["service"].classes_), len(encoders["activity"].classes_))
+    pruner = ForestPruner(forests, counts, X[300:350], X[350:], (y[0][350:], y[1][350:]), depths=(4, 2))
+    return {"pruner": pruner, "rows": pruner.candidates(), "X": X, "forests": forests, "counts": counts}
+
+
+def test_candidates_grow_one_tree_at_a_time(pool: Dict[str, Any]) -> None:
+    rows = pool["rows"]
+    assert {r["max_depth"] for r in rows} == {None, 4, 2}
+    for depth in (None, 4, 2):
+        by_k = sorted((r for r in rows if r["max_depth"] == depth), key=lambda r: r["trees"])
+        assert [r["trees"] for r in by_k] == list(range(1, 7))
+        for smaller, larger in zip(by_k, by_k[1:]):
+            # Greedy order: each candidate extends the previous one by a single tree
+            assert larger["tree_indices"][:-1] == smaller["tree_indices"]
+            assert larger["nodes"] > smaller["nodes"]
+            assert larger["nodes_visited"] > smaller["nodes_visited"]
+    full = next(r for r in rows if r["max_depth"] is None and r["trees"] == 6)
+    assert full["agreement"] == 1.0
+
+
+def test_sub_forest_predicts_like_its_trees(pool: Dict[str, Any]) -> None:
+    row = next(r for r in pool["rows"] if r["max_depth"] == 4 and r["trees"] == 3)
+    subs = pool["pruner"].sub_forests(row)
+    X = pool["X"][350:]
+    for head, n_classes in zip(("service", "activity"), pool["counts"]):
+        forest = pool["forests"][head]
+        expected = hard_vote(
+            [tree_class_ids(truncate_tree(forest.estimators_[t].tree_, 4), forest.classes_, X)[0][0]
+             for t in row["tree_indices"]],
+            n_classes,
+        )
+        np.testing.assert_array_equal(subs[head].predict(X), expected)
+
+
+def test_truncate_tree_limits_depth(pool: Dict[str, Any]) -> None:
+    tree = pool["forests"]["service"].estimators_[0].tree_
+    unlimited = truncate_tree(tree, None)
+    assert unlimited.node_count == tree.node_count
+    previous = unlimited.node_count
+    for depth in (6, 3, 1):
+        view = truncate_tree(tree, depth)
+        _, visits = tree_class_ids(view, pool["forests"]["service"].classes_, pool["X"])
+        assert visits.max() <= depth + 1
+        assert view.node_count <= previous
+        previous = view.node_count
+
+
+def test_cost_model_is_linear_in_nodes() -> None:
+    model = CostModel.fit([(10.0, 150.0, 100, 20_000), (30.0, 250.0, 300, 60_000)])
+    row = model.annotate({"nodes_visited": 20.0, "nodes": 200})
+
+    assert (model.ns_per_node, model.bytes_per_node) == (5.0, 200.0)
+    assert row["est_ns_per_record"] == 200.0 and row["est_binary_bytes"] == 40_000
+
+
+def _row(ns: float, agreement: float, nodes: int = 100) -> Dict[str, Any]:
+    return {"est_ns_per_record": ns, "agreement": agreement, "est_binary_bytes": nodes * 10, "nodes": nodes}
+
+
+def test_pareto_front_drops_dominated_rows() -> None:
+    rows = [_row(100, 0.90), _row(200, 0.95), _row(150, 0.89), _row(300, 0.95), _row(250, 0.99)]
+    front = pareto_front(rows)
+    assert [(r["est_ns_per_record"], r["agreement"]) for r in front] == [(100, 0.90), (200, 0.95), (250, 0.99)]
+
+
+def test_select_prefers_agreement_within_budget() -> None:
+    rows = [_row(100, 0.90, 50), _row(200, 0.95, 80), _row(250, 0.99, 120)]
+
+    assert select(rows, budget_ns=220) == (rows[1], True)
+    assert select(rows, budget_bytes=1000) == (rows[1], True)
+    assert select(rows) == (rows[2], True)
+    assert select(rows, budget_ns=50) == (rows[0], False)
@@ -0,0 +1,104 @@
+"""Hyperparameter sweep: tree prefixes, Pareto selection and saved training defaults."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+
+from backend.utils.path_config import PATHS
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.forest_pruning import pareto_front
+from backend.utils.rfc.hyperparameter_sweep import _c_candidates, _prefix, _prefix_accuracy, _select, run_sweep
+from backend.utils.rfc.training_defaults import BUILTIN_DEFAULTS, load_training_defaults, save_training_defaults
+
+from .traffic import make_requests
+
+
+def _point(latency: float, accuracy: float, **extra: Any) -> Dict[str, Any]:
+    return {"python_p50_us": latency, "accuracy": accuracy, **extra}
+
+
+def test_tree_prefix_equals_smaller_forest() -> None:
+    frame = make_requests(200)
+    # The sweep scores float32 CSR rows, as the forests predict on
+    X = CountVectorizer(binary=True).fit_transform(combined_text(frame)).astype(np.float32).tocsr()
+    y = frame["service"].to_numpy()
+    large = RandomForestClassifier(n_estimators=12, random_state=42).fit(X, y)
+    small = RandomForestClassifier(n_estimators=5, random_state=42).fit(X, y)
+
+    np.testing.assert_array_equal(_prefix(large, 5).predict_proba(X), small.predict_proba(X))
+    accuracy = _prefix_accuracy(large, X, y, [5, 12])
+    assert accuracy[5] == pytest.approx(np.mean(small.predict(X) == y))
+    assert accuracy[12] == pytest.approx(np.mean(large.predict(X) == y))
+
+
+def test_select_within_budget_or_tolerance() -> None:
+    front = pareto_front(
+        [_point(10, 0.90), _point(20, 0.97), _point(25, 0.96), _point(40, 0.975), _point(80, 0.99)],
+        cost="python_p50_us", score="accuracy",
+    )
+    assert [p["python_p50_us"] for p in front] == [10, 20, 40, 80]
+
+    assert _select(front, "python_p50_us", 50, 0.005)[0]["python_p50_us"] == 40
+    assert _select(front, "python_p50_us", 5, 0.005) == (front[0], False)
+    # Without a budget: the fastest point within the tolerance of the best
+    assert _select(front, "python_p50_us", None, 0.005)[0]["python_p50_us"] == 80
+    assert _select(front, "python_p50_us", None, 0.015)[0]["python_p50_us"] == 40
+    assert _select(front, "python_p50_us", None, 0.1)[0]["python_p50_us"] == 10
+
+
+def test_c_candidates_are_binary_front_points() -> None:
+    points = [
+        {"vectorizer": "binary", "max_features": 100, "nodes_visited": 10, "accuracy": 0.9},
+        {"vectorizer": "binary", "max_features": 100, "nodes_visited": 20, "accuracy": 0.8},
+        {"vectorizer": "binary", "max_features": 500, "nodes_visited": 30, "accuracy": 0.95},
+        {"vectorizer": "tfidf", "max_features": 100, "nodes_visited": 5, "accuracy": 0.99},
+    ]
+    assert _c_candidates(points, 10) == [points[0], points[2]]
+    assert len(_c_candidates(points, 1)) == 1
+
+
+@pytest.fixture
+def sweep_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    input_dir = tmp_path / "predictions"
+    input_dir.mkdir()
+    make_requests(300, seed=1).to_csv(input_dir / "a_predictions.csv", index=False)
+    monkeypatch.setitem(PATHS, "rfc_python_train_input", input_dir)
+    monkeypatch.setitem(PATHS, "rfc_dataset_cache", tmp_path / "dataset-cache")
+    monkeypatch.setitem(PATHS, "rfc_benchmarks_folder", tmp_path / "benchmarks")
+    monkeypatch.setitem(PATHS, "rfc_training_defaults_file", tmp_path / "training_defaults.json")
+    return tmp_path
+
+
+def test_sweep_saves_the_selection_as_defaults(sweep_dir: Path) -> None:
+    assert load_training_defaults("python") == BUILTIN_DEFAULTS["python"]
+    report = run_sweep(
+        grid={"vectorizer": ["binary", "tfidf"], "max_features": [50], "max_depth": [None, 4], "n_estimators": [2, 6]},
+        engines=["python"], latency_samples=5, budget_us=1e9,
+    )
+
+    assert len(report["points"]) == 8
+    selected = report["selected"]["python"]
+    assert selected["within_budget"]
+    assert selected["accuracy"] == max(p["accuracy"] for p in report["points"])
+    assert Path(report["report_file"]).exists()
+    defaults = load_training_defaults("python")
+    assert {key: defaults[key] for key in ("n_estimators", "max_depth", "max_features", "vectorizer")} == {
+        key: selected[key] for key in ("n_estimators", "max_depth", "max_features", "vectorizer")
+    }
+
+
+def test_c_defaults_always_use_the_binary_vectorizer(sweep_dir: Path) -> None:
+    save_training_defaults({"c": {"n_estimators": 7, "max_depth": 5, "max_features": 127, "vectorizer": "tfidf"}})
+    assert load_training_defaults("c") == {"n_estimators": 7, "max_depth": 5, "max_features": 127, "vectorizer": "binary"}
+
+
+def test_sweep_rejects_unknown_settings(sweep_dir: Path) -> None:
+    with pytest.raises(ValueError, match="hyperparameters"):
+        run_sweep(grid={"min_samples_leaf": [1]}, engines=["python"])
+    with pytest.raises(ValueError, match="engines"):
+        run_sweep(engines=["rust"])
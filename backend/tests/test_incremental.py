@@ -0,0 +1,150 @@
+"""Incremental warm-start retraining: consumed-file manifest and drift handling."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+from backend.utils.path_config import PATHS
+from backend.utils.rfc.incremental import (
+    HISTORY_LENGTH,
+    MANIFEST_FILE,
+    MIN_NEW_TREES,
+    known_label_mask,
+    load_manifest,
+    new_tree_count,
+    save_manifest,
+    vocabulary_drift,
+)
+from backend.utils.rfc.model_registry import MODEL_ARTIFACT
+from backend.utils.rfc.python_train import train_rfc_python
+from backend.utils.rfc.training_defaults import save_training_defaults
+
+from .traffic import make_requests
+
+BASE_TREES = 10
+
+
+def test_manifest_round_trip_and_history(tmp_path: Path) -> None:
+    path = tmp_path / MANIFEST_FILE
+    manifest = None
+    for i in range(HISTORY_LENGTH + 5):
+        manifest = save_manifest(path, manifest, {f"f{i}.csv": {"sha256": str(i), "rows": i}}, {"mode": "warm_start"})
+
+    loaded = load_manifest(path)
+    assert loaded == manifest
+    assert len(loaded["files"]) == HISTORY_LENGTH + 5
+    assert len(loaded["history"]) == HISTORY_LENGTH
+
+    replaced = save_manifest(path, loaded, {"new.csv": {"sha256": "x", "rows": 1}}, {"mode": "full"}, replace=True)
+    assert list(replaced["files"]) == ["new.csv"]
+
+
+def test_manifest_of_another_format_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / MANIFEST_FILE
+    path.write_text(json.dumps({"format": 0, "files": {}}), encoding="utf-8")
+    assert load_manifest(path) is None
+    assert load_manifest(tmp_path / "missing.json") is None
+
+
+def test_vocabulary_drift() -> None:
+    vectorizer = CountVectorizer().fit(["get dropbox upload", "post gmail send"])
+    assert vocabulary_drift(vectorizer, ["get gmail", "post dropbox"]) == 0.0
+    assert vocabulary_drift(vectorizer, ["get teams call", ""]) == pytest.approx(2 / 3)
+    assert vocabulary_drift(vectorizer, []) == 0.0
+
+
+def test_known_label_mask() -> None:
+    labels = {"service": pd.Series(["Gmail", "Teams", "Gmail"]), "activityType": pd.Series(["Send", "Send", "Call"])}
+    mask, unseen = known_label_mask(labels, {"service": ["Gmail"], "activityType": ["Send"]})
+    np.testing.assert_array_equal(mask, [True, False, False])
+    assert unseen == {"service": ["Teams"], "activityType": ["Call"]}
+
+
+def test_new_tree_count() -> None:
+    assert new_tree_count(100, 1, 10_000) == MIN_NEW_TREES
+    assert new_tree_count(100, 5_000, 10_000) == 50
+
+
+@pytest.fixture
+def training_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Scratch input, model, test and cache folders with small default forests."""
+    for key, name in (
+        ("rfc_python_train_input", "predictions"),
+        ("rfc_python_train_models", "models"),
+        ("rfc_python_train_test", "test"),
+        ("rfc_dataset_cache", "dataset-cache"),
+    ):
+        monkeypatch.setitem(PATHS, key, tmp_path / name)
+        (tmp_path / name).mkdir()
+    monkeypatch.setitem(PATHS, "rfc_training_defaults_file", tmp_path / "training_defaults.json")
+    save_training_defaults(
+        {"python": {"n_estimators": BASE_TREES, "max_depth": None, "max_features": 500, "vectorizer": "binary"}}
+    )
+    return tmp_path
+
+
+def _write(training_dir: Path, name: str, frame: pd.DataFrame) -> None:
+    frame.to_csv(training_dir / "predictions" / name, index=False)
+
+
+def _manifest(training_dir: Path) -> Dict[str, Any]:
+    return load_manifest(training_dir / "models" / MANIFEST_FILE)
+
+
+def _trees(training_dir: Path) -> int:
+    artifact = joblib.load(training_dir / "models" / MODEL_ARTIFACT)
+    return len(artifact["service_model"].estimators_)
+
+
+def test_warm_start_and_fallbacks(training_dir: Path) -> None:
+    _write(training_dir, "a.csv", make_requests(300, seed=1))
+    first = train_rfc_python("a.csv", incremental=True)
+    assert first["incremental"]["mode"] == "full"
+    assert first["incremental"]["reason"] == "no models with a manifest to update"
+    assert list(_manifest(training_dir)["files"]) == ["a.csv"]
+    assert _trees(training_dir) == BASE_TREES
+
+    assert train_rfc_python("a.csv", incremental=True)["incremental"]["mode"] == "unchanged"
+
+    # Same traffic, new file: the forests grow
+    _write(training_dir, "b.csv", make_requests(200, seed=2))
+    update = train_rfc_python("b.csv", incremental=True)["incremental"]
+    assert update["mode"] == "warm_start"
+    assert update["vocabulary_drift"] <= 0.05
+    assert _trees(training_dir) == BASE_TREES + update["trees_added"]
+    manifest = _manifest(training_dir)
+    assert sorted(manifest["files"]) == ["a.csv", "b.csv"]
+    assert [entry["mode"] for entry in manifest["history"]] == ["full", "warm_start"]
+
+    # New path segments everywhere: retrain on all consumed files
+    _write(training_dir, "c.csv", make_requests(100, seed=3, extra_tokens=True))
+    drifted = train_rfc_python("c.csv", incremental=True)["incremental"]
+    assert drifted["mode"] == "full" and drifted["reason"].startswith("vocabulary drift")
+    assert sorted(_manifest(training_dir)["files"]) == ["a.csv", "b.csv", "c.csv"]
+    assert _trees(training_dir) == BASE_TREES
+
+    # A consumed file that changed
+    _write(training_dir, "a.csv", make_requests(310, seed=1))
+    changed = train_rfc_python("a.csv", incremental=True)["incremental"]
+    assert changed["mode"] == "full" and changed["reason"] == "a.csv changed since it was consumed"
+
+
+def test_unseen_labels_fall_back_to_a_full_retrain(training_dir: Path) -> None:
+    _write(training_dir, "a.csv", make_requests(300, seed=1))
+    train_rfc_python("a.csv", incremental=True)
+
+    new = make_requests(200, seed=2)
+    new.loc[::10, "service"] = "Teams"
+    _write(training_dir, "b.csv", new)
+    result = train_rfc_python("b.csv", incremental=True)
+    assert result["incremental"]["mode"] == "full"
+    assert "unseen labels" in result["incremental"]["reason"]
+    # Dropbox, Gmail, Google Drive and the new Teams
+    assert result["unique_services"] == 4
@@ -0,0 +1,100 @@
+"""Background jobs: logs, progress, results, failures, queueing and cancel."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from backend.utils.jobs import Job, JobManager, report_progress, run_job
+
+TIMEOUT_SECONDS = 60
+
+
+# Job functions run in a spawned process, so they live at module level
+def _count(n: int) -> dict:
+    for i in range(n):
+        print(f"step {i}")
+        report_progress(i + 1, n, f"step {i}")
+    return {"success": True, "steps": n}
+
+
+def _fail() -> None:
+    print("about to fail")
+    raise RuntimeError("boom")
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def _wait(job: Job) -> Job:
+    assert job._done.wait(TIMEOUT_SECONDS), f"job {job.id} still {job.status}"
+    return job
+
+
+def _wait_until_running(job: Job) -> None:
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while job.status != "running" or job.pid is None:
+        assert time.monotonic() < deadline, f"job {job.id} never started"
+        time.sleep(0.05)
+
+
+def test_logs_progress_and_result() -> None:
+    job = _wait(JobManager({"train": 1}).submit("train", _count, 3))
+    assert job.status == "succeeded"
+    assert job.logs == ["step 0", "step 1", "step 2"]
+    assert job.progress == 1.0 and job.progress_message == "step 2"
+    assert job.response() == {"success": True, "steps": 3}
+    assert job.to_dict()["log_lines"] == 3
+
+
+def test_failure_keeps_the_log_and_traceback() -> None:
+    job = _wait(JobManager({"train": 1}).submit("train", _fail))
+    assert job.status == "failed"
+    assert job.error == "RuntimeError: boom"
+    assert job.logs[0] == "about to fail"
+    assert "Traceback" in job.logs[-1]
+    response = job.response()
+    assert not response["success"] and response["error"] == "RuntimeError: boom"
+
+
+def test_limit_queues_and_cancel_stops_jobs() -> None:
+    manager = JobManager({"codegen": 1})
+    running = manager.submit("codegen", _sleep, 600)
+    queued = manager.submit("codegen", _sleep, 0)
+    _wait_until_running(running)
+    assert queued.status == "queued"
+
+    manager.cancel(queued.id)
+    started = time.monotonic()
+    manager.cancel(running.id)
+    assert _wait(running).status == "cancelled"
+    assert time.monotonic() - started < TIMEOUT_SECONDS
+    assert _wait(queued).status == "cancelled" and queued.pid is None
+
+
+def test_unknown_job_type() -> None:
+    manager = JobManager({"train": 1})
+    with pytest.raises(ValueError, match="deploy"):
+        manager.submit("deploy", _sleep, 0)
+    assert manager.list() == []
+
+
+def test_logs_since_counts_dropped_lines(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("backend.utils.jobs.MAX_LOG_LINES", 3)
+    job = Job(id="x", type="train", name="x")
+    for i in range(5):
+        job.add_log(str(i))
+    assert job.logs == ["2", "3", "4"] and job.log_offset == 2
+    assert job.logs_since(0) == (["2", "3", "4"], 5)
+    assert job.logs_since(4) == (["4"], 5)
+    assert job.logs_since(5) == ([], 5)
+
+
+def test_run_job_returns_the_function_response() -> None:
+    response = asyncio.run(run_job("convert", _count, 2))
+    assert response["success"] and response["steps"] == 2 and response["job_id"]
+    background = asyncio.run(run_job("convert", _count, 1, background=True))
+    assert background["status_url"] == f"/jobs/{background['job_id']}"
@@ -0,0 +1,93 @@
+"""Bounded, levelled route and job logs."""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.utils import log_sink
+from backend.utils.log_sink import LogSink, count, emit, event
+from backend.utils.rfc.model_registry import ModelRegistry
+
+
+def test_ring_buffer_keeps_the_tail_and_counts_the_rest() -> None:
+    sink = LogSink(capacity=3, echo=False)
+    sink.extend(f"line {i}" for i in range(5))
+
+    assert sink.lines() == ["line 2", "line 3", "line 4"] and len(sink) == 3
+    summary = sink.summary()
+    assert summary["lines"] == 5 and summary["dropped"] == 2
+
+
+def test_levels_filter_and_prefix() -> None:
+    sink = LogSink(level=logging.INFO, echo=False)
+    sink.debug("hidden")
+    sink.info("shown")
+    sink.warning("careful")
+    sink.error("broken")
+
+    assert sink.lines() == ["shown", "[WARNING] careful", "[ERROR] broken"]
+    assert sink.summary()["levels"] == {"DEBUG": 1, "INFO": 1, "WARNING": 1, "ERROR": 1}
+    assert sink.summary()["lines"] == 3
+
+
+def test_events_are_rate_limited_but_counted(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr(log_sink.time, "monotonic", lambda: now[0])
+    sink = LogSink(event_interval=1.0, echo=False)
+    for i in range(5):
+        sink.event("row", f"row {i}")
+        now[0] += 0.3
+    sink.event("other", "first other")
+
+    # Logged at t=0 and t=1.2, suppressed in between
+    assert sink.lines() == ["row 0", "row 4", "first other"]
+    summary = sink.summary()
+    assert summary["counters"] == {"row": 5, "other": 1}
+    assert summary["suppressed_events"] == {"row": 3}
+
+
+def test_payload_carries_lines_and_counters() -> None:
+    sink = LogSink(echo=False)
+    sink.append("started")
+    sink.count("requests", 40)
+    sink.count("requests", 2)
+
+    payload = sink.payload()
+    assert payload["output"] == ["started"]
+    assert payload["log_summary"]["counters"] == {"requests": 42}
+    assert set(payload["log_summary"]) == {"lines", "dropped", "levels", "counters", "suppressed_events", "elapsed_ms"}
+
+
+def test_helpers_accept_lists_and_none() -> None:
+    lines: list = []
+    emit("to a list", lines)
+    event(lines, "row", "every event is kept")
+    event(lines, "row", "every event is kept")
+    count(lines, "requests", 3)
+    emit("console only")
+    assert lines == ["to a list", "every event is kept", "every event is kept"]
+
+    sink = LogSink(echo=False)
+    emit("warned", sink, logging.WARNING)
+    assert sink.lines() == ["[WARNING] warned"]
+
+
+def test_echo_goes_to_the_backend_logger(capsys: pytest.CaptureFixture[str]) -> None:
+    LogSink(echo=True).warning("echoed")
+    LogSink(echo=False).warning("silent")
+    out = capsys.readouterr().out
+    assert "echoed" in out and "silent" not in out
+
+
+def test_startup_failure_is_logged_as_a_warning(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(main, "get_registry", lambda: ModelRegistry(tmp_path))
+    monkeypatch.setattr(log_sink.logger, "log", lambda level, msg: print(logging.getLevelName(level), msg))
+    with TestClient(main.app):
+        pass
+    assert "WARNING RFC models not loaded at startup: Missing model files" in capsys.readouterr().out
@@ -0,0 +1,136 @@
+"""In-memory RFC models: loading, hot reload, fallbacks, readiness and both file formats."""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.pipeline import Pipeline
+
+from backend.main import app
+from backend.routes import rfc_routes
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.model_registry import LEGACY_MODEL_FILES, MODEL_ARTIFACT_FORMAT, ModelRegistry
+
+from .classifier import train_models, write_artifact
+from .traffic import make_requests
+
+
+def _write_legacy(models_dir: Path, parts: Dict[str, Any]) -> None:
+    for head in ("service", "activity"):
+        pipeline = Pipeline([("vectorizer", parts["vectorizer"]), ("classifier", parts[f"{head}_model"])])
+        joblib.dump(pipeline, models_dir / LEGACY_MODEL_FILES[f"{head}_model"])
+        joblib.dump(parts[f"{head}_encoder"], models_dir / LEGACY_MODEL_FILES[f"{head}_encoder"])
+
+
+def _touch_later(path: Path) -> None:
+    # A rewrite within the same mtime tick must still look changed
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture(scope="module")
+def parts() -> Dict[str, Any]:
+    return train_models()
+
+
+@pytest.fixture(scope="module")
+def texts() -> list[str]:
+    return combined_text(make_requests(20, seed=4)).tolist()
+
+
+def test_loads_once_and_reloads_changed_files(tmp_path: Path, parts: Dict[str, Any]) -> None:
+    path = write_artifact(tmp_path, parts)
+    registry = ModelRegistry(tmp_path, check_interval=0)
+    first = registry.get()
+    assert registry.get() is first
+
+    write_artifact(tmp_path, train_models(n_estimators=6))
+    _touch_later(path)
+    second = registry.get()
+    assert second is not first and second.version != first.version
+    assert len(second.service_model.estimators_) == 6
+    # Requests holding the old snapshot keep using it
+    assert len(first.service_model.estimators_) == 4
+
+
+def test_changes_are_checked_at_most_every_interval(tmp_path: Path, parts: Dict[str, Any]) -> None:
+    path = write_artifact(tmp_path, parts)
+    registry = ModelRegistry(tmp_path, check_interval=3600)
+    first = registry.get()
+    _touch_later(path)
+    assert registry.get() is first
+    assert registry.reload() is not first
+
+
+def test_keeps_the_last_good_snapshot(tmp_path: Path, parts: Dict[str, Any]) -> None:
+    path = write_artifact(tmp_path, parts)
+    registry = ModelRegistry(tmp_path, check_interval=0)
+    good = registry.get()
+
+    path.write_bytes(b"half-written")
+    assert registry.get() is good
+    assert registry.status()["ready"] and registry.status()["error"]
+
+    path.unlink()
+    assert registry.get() is good
+    assert registry.status()["error"] == "Model files not found"
+    with pytest.raises(FileNotFoundError):
+        registry.reload()
+
+    write_artifact(tmp_path, parts)
+    assert registry.get() is not good
+    assert registry.status()["error"] is None
+
+
+def test_not_ready_before_the_first_load(tmp_path: Path) -> None:
+    registry = ModelRegistry(tmp_path)
+    assert not registry.ready and registry.status()["ready"] is False
+    with pytest.raises(FileNotFoundError, match="Missing model files"):
+        registry.get()
+
+
+def test_unsupported_artifact_format(tmp_path: Path, parts: Dict[str, Any]) -> None:
+    write_artifact(tmp_path, parts, fmt=MODEL_ARTIFACT_FORMAT + 1)
+    with pytest.raises(ValueError, match="format"):
+        ModelRegistry(tmp_path).get()
+
+
+def test_legacy_files_predict_like_the_artifact(tmp_path: Path, parts: Dict[str, Any], texts: list[str]) -> None:
+    legacy_dir, artifact_dir = tmp_path / "legacy", tmp_path / "artifact"
+    legacy_dir.mkdir()
+    artifact_dir.mkdir()
+    _write_legacy(legacy_dir, parts)
+    write_artifact(artifact_dir, parts)
+
+    legacy = ModelRegistry(legacy_dir).get()
+    current = ModelRegistry(artifact_dir).get()
+    assert not legacy.shared_vectorizer and current.shared_vectorizer
+    for a, b in zip(legacy.predict_proba(*legacy.transform(texts)),
+                    current.predict_proba(*current.transform(texts))):
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_array_equal(legacy.service_labels, current.service_labels)
+
+    # The artifact wins once both formats are present
+    write_artifact(legacy_dir, parts)
+    assert ModelRegistry(legacy_dir).get().shared_vectorizer
+
+
+def test_ready_and_reload_routes(tmp_path: Path, parts: Dict[str, Any], monkeypatch: pytest.MonkeyPatch) -> None:
+    registry = ModelRegistry(tmp_path)
+    monkeypatch.setattr(rfc_routes, "get_registry", lambda: registry)
+    client = TestClient(app)
+
+    assert client.get("/rfc/models/ready").status_code == 503
+    failed = client.post("/rfc/models/reload").json()
+    assert failed["success"] is False and "Missing model files" in failed["error"]
+
+    write_artifact(tmp_path, parts)
+    reloaded = client.post("/rfc/models/reload").json()
+    assert reloaded["success"] and reloaded["ready"] and reloaded["version"] == registry.get().version
+    ready = client.get("/rfc/models/ready")
+    assert ready.status_code == 200 and ready.json()["shared_vectorizer"]
@@ -0,0 +1,88 @@
+"""Fitting the RFC forests within a shared core budget."""
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+
+from backend.utils.rfc import parallel_fit
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.parallel_fit import fit_forests, partition_jobs
+
+from .traffic import make_requests
+
+
+class RecordingForest(RandomForestClassifier):
+    """Remembers the ``n_jobs`` it was fitted with."""
+
+    def fit(self, X: Any, y: Any, sample_weight: Any = None) -> "RecordingForest":
+        self.fit_n_jobs_ = self.n_jobs
+        return super().fit(X, y, sample_weight=sample_weight)
+
+
+@pytest.fixture(scope="module")
+def data() -> Tuple[Any, Dict[str, np.ndarray]]:
+    frame = make_requests(200, seed=5)
+    X = CountVectorizer(binary=True).fit_transform(combined_text(frame))
+    return X, {"service": frame["service"].to_numpy(), "activity": frame["activityType"].to_numpy()}
+
+
+@pytest.fixture
+def eight_cores(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(parallel_fit, "available_cores", lambda: 8)
+
+
+def _specs(targets: Dict[str, np.ndarray], trees: Dict[str, int]) -> Dict[str, Tuple[Any, np.ndarray]]:
+    return {name: (RecordingForest(n_estimators=trees[name], random_state=0), y) for name, y in targets.items()}
+
+
+def test_same_models_concurrently_or_one_after_the_other(data, eight_cores) -> None:
+    X, targets = data
+    trees = {"service": 6, "activity": 6}
+    together, metrics = fit_forests(_specs(targets, trees), X, n_jobs=4, concurrent=True)
+    apart, _ = fit_forests(_specs(targets, trees), X, n_jobs=1, concurrent=False)
+
+    assert metrics["concurrent_heads"]
+    for name in targets:
+        np.testing.assert_array_equal(together[name].predict_proba(X), apart[name].predict_proba(X))
+        for a, b in zip(together[name].estimators_, apart[name].estimators_):
+            np.testing.assert_array_equal(a.tree_.feature, b.tree_.feature)
+            np.testing.assert_array_equal(a.tree_.threshold, b.tree_.threshold)
+
+
+def test_cores_are_split_between_concurrent_heads(data, eight_cores) -> None:
+    X, targets = data
+    fitted, metrics = fit_forests(_specs(targets, {"service": 6, "activity": 2}), X, n_jobs=-1, concurrent=True)
+
+    assert metrics["n_jobs"] == 8 and metrics["concurrent_heads"]
+    assert metrics["jobs_per_forest"] == {"service": 6, "activity": 2}
+    assert {name: forest.fit_n_jobs_ for name, forest in fitted.items()} == metrics["jobs_per_forest"]
+    assert set(metrics["fit_seconds"]) == set(targets)
+
+
+def test_sequential_heads_each_get_every_core(data, eight_cores) -> None:
+    X, targets = data
+    fitted, metrics = fit_forests(_specs(targets, {"service": 3, "activity": 3}), X, n_jobs=4, concurrent=False)
+
+    assert not metrics["concurrent_heads"]
+    assert {forest.fit_n_jobs_ for forest in fitted.values()} == {4}
+
+
+def test_n_jobs_is_reset_on_the_fitted_forests(data, eight_cores) -> None:
+    X, targets = data
+    for concurrent in (True, False):
+        fitted, _ = fit_forests(_specs(targets, {"service": 3, "activity": 3}), X, n_jobs=4, concurrent=concurrent)
+        assert all(forest.n_jobs is None for forest in fitted.values())
+
+
+@pytest.mark.parametrize("n_jobs, weights, shares", [
+    (8, [6, 2], [6, 2]),
+    (5, [1, 1], [3, 2]),
+    (2, [100, 1, 1], [1, 1, 1]),
+    (7, [3, 3, 3], [3, 2, 2]),
+])
+def test_partition_jobs(n_jobs: int, weights: list, shares: list) -> None:
+    assert partition_jobs(n_jobs, weights) == shares
@@ -0,0 +1,52 @@
+"""Minimal perfect hash over the vectorizer vocabulary."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+from backend.utils.rfc.feature_text import combined_text
+from backend.utils.rfc.perfect_hash import build_perfect_hash
+
+from .traffic import make_requests
+
+
+def _random_terms(n: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    alphabet = list("abcdefghijklmnopqrstuvwxyz0123456789_")
+    terms = {"".join(rng.choice(alphabet, size=rng.integers(2, 12))) for _ in range(n)}
+    return sorted(terms)
+
+
+@pytest.mark.parametrize("n_terms", [1, 7, 500, 5000])
+def test_every_term_has_its_own_slot(n_terms: int) -> None:
+    terms = _random_terms(n_terms, seed=n_terms)
+    ph = build_perfect_hash(terms)
+
+    slots = [ph.lookup(term) for term in terms]
+    assert min(slots) >= 0
+    assert len(set(slots)) == len(terms)
+    assert all(ph.slots[slot] == term for slot, term in zip(slots, terms))
+    # Minimal up to the small growth build_perfect_hash allows
+    assert ph.size <= len(terms) * 1.05 + 1
+
+
+def test_vectorizer_vocabulary_resolves_and_unknown_terms_miss() -> None:
+    texts = combined_text(make_requests(200))
+    vocabulary = list(CountVectorizer().fit(texts).get_feature_names_out())
+    ph = build_perfect_hash(vocabulary)
+
+    assert all(ph.lookup(term) >= 0 for term in vocabulary)
+    known = set(vocabulary)
+    unknown = [term for term in _random_terms(2000, seed=1) + ["", "dropbox2", "Dropbox"] if term not in known]
+    assert unknown and all(ph.lookup(term) == -1 for term in unknown)
+
+
+def test_duplicate_terms_are_rejected() -> None:
+    with pytest.raises(ValueError, match="unique"):
+        build_perfect_hash(["get", "post", "get"])
+
+
+def test_empty_vocabulary_misses_everything() -> None:
+    ph = build_perfect_hash([])
+    assert ph.lookup("get") == -1
@@ -0,0 +1,80 @@
+"""Single-request prediction cache: key normalisation, LRU, TTL and versions."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.utils.rfc.feature_text import combined_record
+from backend.utils.rfc.prediction_cache import PredictionCache
+
+from .traffic import make_requests
+
+REQUEST = {
+    "url": "https://www.dropbox.com/upload?id=1",
+    "method": "POST",
+    "headers_Host": "www.dropbox.com",
+    "requestHeaders_Content_Type": "application/json",
+}
+
+
+def test_requests_with_the_same_features_share_a_key() -> None:
+    cache = PredictionCache()
+    missing = {name: None for name in ("requestHeaders_Origin", "requestHeaders_Referer")}
+    nan = {name: np.nan for name in missing}
+    assert cache.key({**REQUEST, **missing}) == cache.key({**REQUEST, **nan}) == cache.key(REQUEST)
+    assert cache.key({**REQUEST, "method": " post "}) == cache.key(REQUEST)
+    assert cache.key({**REQUEST, "method": "GET"}) != cache.key(REQUEST)
+
+
+def test_same_key_means_same_combined_text() -> None:
+    cache = PredictionCache()
+    records = make_requests(200, seed=3).to_dict(orient="records")
+    texts: dict = {}
+    for record in records:
+        texts.setdefault(cache.key(record), set()).add(combined_record(record).lower())
+    assert all(len(group) == 1 for group in texts.values())
+
+
+def test_query_strings_are_only_dropped_on_request() -> None:
+    other = {**REQUEST, "url": "https://www.dropbox.com/upload?folder=photos#top"}
+    assert PredictionCache().key(other) != PredictionCache().key(REQUEST)
+    assert PredictionCache(strip_query=True).key(other) == PredictionCache(strip_query=True).key(REQUEST)
+
+
+def test_precomputed_key_and_variants() -> None:
+    cache = PredictionCache()
+    key = cache.key(REQUEST)
+    cache.put(REQUEST, "v1", {"service": "Dropbox"}, key=key)
+    assert cache.get({}, "v1", key=key) == {"service": "Dropbox"}
+    assert cache.get(REQUEST, "v1") == {"service": "Dropbox"}
+    assert cache.get(REQUEST, "v1", variant=(3,)) is None
+
+
+def test_lru_eviction_and_copies() -> None:
+    cache = PredictionCache(max_entries=2)
+    for method in ("GET", "POST", "PUT"):
+        cache.put({**REQUEST, "method": method}, "v1", {"method": method})
+    assert cache.get({**REQUEST, "method": "GET"}, "v1") is None
+    cached = cache.get({**REQUEST, "method": "PUT"}, "v1")
+    cached["method"] = "changed"
+    assert cache.get({**REQUEST, "method": "PUT"}, "v1") == {"method": "PUT"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expiry_and_model_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr("backend.utils.rfc.prediction_cache.time.monotonic", lambda: now[0])
+    cache = PredictionCache(ttl=10)
+    cache.put(REQUEST, "v1", {"service": "Dropbox"})
+    now[0] += 11
+    assert cache.get(REQUEST, "v1") is None and cache.stats()["expirations"] == 1
+
+    cache.put(REQUEST, "v1", {"service": "Dropbox"})
+    assert cache.get(REQUEST, "v2") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["size"] == 0
+
+
+def test_size_zero_disables_the_cache() -> None:
+    cache = PredictionCache(max_entries=0)
+    cache.put(REQUEST, "v1", {"service": "Dropbox"})
+    assert not cache.enabled and cache.get(REQUEST, "v1") is None
@@ -0,0 +1,100 @@
+"""Python inference: ranking and the deduplicated batch path against single requests."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils.rfc import python_inference
+from backend.utils.rfc.model_registry import ModelRegistry
+from backend.utils.rfc.prediction_cache import PredictionCache
+from backend.utils.rfc.python_inference import (
+    FEATURE_COLUMNS,
+    batch_predict_rfc_python,
+    predict_rfc_python,
+    top_k_classes,
+)
+
+from .classifier import train_models, write_artifact
+from .traffic import make_requests
+
+
+@pytest.fixture(params=[False, True], ids=["separate", "joint"])
+def registry(request: pytest.FixtureRequest, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ModelRegistry:
+    write_artifact(tmp_path, train_models(joint=request.param))
+    registry = ModelRegistry(tmp_path)
+    monkeypatch.setattr(python_inference, "get_registry", lambda: registry)
+    # Every single request is classified, not answered from the cache
+    monkeypatch.setattr(python_inference, "get_prediction_cache", lambda engine: PredictionCache(max_entries=0))
+    return registry
+
+
+LABELS = np.array(["a", "b", "c", "d"])
+
+
+def _labels(ranked: List[Dict[str, Any]]) -> List[str]:
+    return [entry["label"] for entry in ranked]
+
+
+def test_top_k_orders_by_probability() -> None:
+    proba = np.array([0.1, 0.4, 0.2, 0.3])
+    ranked = top_k_classes(proba, LABELS, 3)
+    assert _labels(ranked) == ["b", "d", "c"]
+    assert [entry["probability"] for entry in ranked] == [0.4, 0.3, 0.2]
+    assert all(type(entry["probability"]) is float for entry in ranked)
+
+
+def test_top_k_breaks_ties_by_class_index() -> None:
+    proba = np.array([0.2, 0.3, 0.2, 0.3])
+    assert _labels(top_k_classes(proba, LABELS, 1)) == ["b"]
+    assert _labels(top_k_classes(proba, LABELS, 3)) == ["b", "d", "a"]
+
+
+def test_top_k_beyond_the_class_count_returns_every_class() -> None:
+    proba = np.array([0.1, 0.4, 0.2, 0.3])
+    assert _labels(top_k_classes(proba, LABELS, 10)) == ["b", "d", "c", "a"]
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_top_k_of_zero_or_less_is_empty(k: int) -> None:
+    assert top_k_classes(np.array([0.5, 0.5]), LABELS[:2], k) == []
+
+
+def _records() -> List[Dict[str, Any]]:
+    frame = make_requests(60, seed=7)[FEATURE_COLUMNS].astype(object)
+    frame.loc[::3, "requestHeaders_Referer"] = np.nan
+    frame.loc[1::5, "url"] = None
+    frame.loc[2::7, "requestHeaders_Accept"] = ""
+    frame.loc[::4, "headers_Host"] = "www.google.com"
+    # Every row twice, plus a few rows that differ only by missing-value type
+    duplicated = pd.concat([frame, frame.iloc[::2]], ignore_index=True)
+    records = duplicated.to_dict(orient="records")
+    records += [{**record, "requestHeaders_Origin": None} for record in records[:5]]
+    return records
+
+
+def test_batch_matches_single_requests(registry: ModelRegistry) -> None:
+    records = _records()
+    batch, _ = batch_predict_rfc_python(records)
+    assert len(batch) == len(records)
+
+    for record, result in zip(records, batch):
+        single = predict_rfc_python(record, top_k=0)
+        for head in ("service", "activity"):
+            assert result[f"{head}_prediction"] == single[f"{head}_prediction"]
+            assert result[f"{head}_confidence"] == round(single[f"{head}_confidence"], 2)
+        # The request fields come back unchanged
+        assert {key: result[key] for key in record} == record
+
+
+def test_batch_results_are_not_all_unanimous(registry: ModelRegistry) -> None:
+    batch, _ = batch_predict_rfc_python(_records())
+    # Otherwise the confidence comparison above would prove little
+    assert min(r["service_confidence"] for r in batch) < 1.0
+
+
+def test_empty_batch(registry: ModelRegistry) -> None:
+    assert batch_predict_rfc_python([]) == ([], 0.0)
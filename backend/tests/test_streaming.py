@@ -0,0 +1,119 @@
+"""Chunked file inference: NDJSON and CSV output, errors and the streaming routes."""
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.utils.path_config import PATHS
+from backend.utils.rfc import c_inference, python_inference
+from backend.utils.rfc.c_build import _exe_name
+from backend.utils.rfc.canonical import FEATURE_FIELDS
+from backend.utils.rfc.model_registry import ModelRegistry
+from backend.utils.rfc.streaming import stream_file_predictions
+
+from .classifier import compile_classifier, train_models, write_artifact
+from .traffic import make_requests
+
+ROWS = 23
+
+
+@pytest.fixture
+def test_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setitem(PATHS, "rfc_python_train_test", tmp_path)
+    make_requests(ROWS, seed=6)[list(FEATURE_FIELDS) + ["service"]].to_csv(tmp_path / "t.csv", index=False)
+    return tmp_path
+
+
+def _classifier(chunk_sizes: List[int], fail_after: int | None = None):
+    def classify(chunk: pd.DataFrame) -> pd.DataFrame:
+        if fail_after is not None and len(chunk_sizes) == fail_after:
+            raise RuntimeError("classifier crashed")
+        chunk_sizes.append(len(chunk))
+        # Replaces the input column of the same name
+        return pd.DataFrame({"service": "predicted", "row": chunk.index}, index=chunk.index)
+    return classify
+
+
+def test_ndjson_chunks(test_dir: Path) -> None:
+    sizes: List[int] = []
+    chunks = list(stream_file_predictions("t.csv", _classifier(sizes), chunk_size=10))
+
+    assert sizes == [10, 10, 3] and len(chunks) == 3
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [row["row"] for row in rows] == list(range(ROWS))
+    assert all(row["service"] == "predicted" for row in rows)
+    assert list(rows[0]) == list(FEATURE_FIELDS) + ["service", "row"]
+
+
+def test_csv_header_only_in_the_first_chunk(test_dir: Path) -> None:
+    chunks = list(stream_file_predictions("t.csv", _classifier([]), fmt="csv", chunk_size=10))
+
+    assert chunks[0].startswith("headers_Host,") and not chunks[1].startswith("headers_Host,")
+    frame = pd.read_csv(io.StringIO("".join(chunks)))
+    assert len(frame) == ROWS and frame["row"].tolist() == list(range(ROWS))
+
+
+def test_errors_after_the_first_chunk(test_dir: Path) -> None:
+    chunks = list(stream_file_predictions("t.csv", _classifier([], fail_after=1), chunk_size=10))
+    assert len(chunks[0].splitlines()) == 10
+    assert json.loads(chunks[-1]) == {"error": "classifier crashed", "rows": 10}
+
+    # CSV has no room for an error line; the response is cut off instead
+    stream = stream_file_predictions("t.csv", _classifier([], fail_after=1), fmt="csv", chunk_size=10)
+    next(stream)
+    with pytest.raises(RuntimeError, match="crashed"):
+        next(stream)
+
+
+def test_arguments_are_checked_before_streaming(test_dir: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        stream_file_predictions("missing.csv", _classifier([]))
+    with pytest.raises(ValueError, match="format"):
+        stream_file_predictions("t.csv", _classifier([]), fmt="parquet")
+    with pytest.raises(ValueError, match="chunk_size"):
+        stream_file_predictions("t.csv", _classifier([]), chunk_size=0)
+
+
+def test_python_stream_route(test_dir: Path, tmp_path_factory: pytest.TempPathFactory,
+                             monkeypatch: pytest.MonkeyPatch) -> None:
+    models_dir = tmp_path_factory.mktemp("models")
+    write_artifact(models_dir, train_models())
+    registry = ModelRegistry(models_dir)
+    monkeypatch.setattr(python_inference, "get_registry", lambda: registry)
+
+    response = TestClient(app).post("/rfc/inference/python", params={"file": "t.csv", "stream": True, "chunk_size": 7})
+    assert response.headers["x-model-version"] == registry.get().version
+    assert len(response.text.splitlines()) == ROWS
+
+
+def test_c_stream_route(test_dir: Path, tmp_path_factory: pytest.TempPathFactory, c_compiler: str,
+                        monkeypatch: pytest.MonkeyPatch) -> None:
+    out = compile_classifier(c_compiler, tmp_path_factory.mktemp("classifier"))
+    monkeypatch.setattr(c_inference, "LIBRARY_FILE", out / c_inference.LIBRARY_FILE.name)
+    monkeypatch.setattr(c_inference, "EXECUTABLE_NIX", out / _exe_name())
+    monkeypatch.setattr(c_inference, "EXECUTABLE_WIN", out / _exe_name())
+    monkeypatch.setattr(c_inference, "_native", None)
+    client = TestClient(app)
+
+    response = client.post("/rfc/inference/c", params={"file": "t.csv", "stream": True, "format": "csv"})
+    native = c_inference.get_native_classifier()
+    assert response.headers["x-model-version"] == c_inference._model_version(native, None)
+    frame = pd.read_csv(io.StringIO(response.text))
+    assert len(frame) == ROWS and {"service_id", "activity_id"} <= set(frame.columns)
+
+    # Without the shared library the stream workers classify, under the executable's version
+    (out / c_inference.LIBRARY_FILE.name).unlink()
+    try:
+        response = client.post("/rfc/inference/c", params={"file": "t.csv", "stream": True})
+    finally:
+        c_inference.get_worker_pool().shutdown()
+    assert response.headers["x-model-version"] == c_inference._model_version(None, out / _exe_name())
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["service_id"] for r in rows] == frame["service_id"].tolist()
@@ -0,0 +1,51 @@
+"""Synthetic labelled proxy traffic for the tests."""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from backend.utils.rfc.canonical import FEATURE_FIELDS
+
+# (host, path, method) per (service, activity)
+TRAFFIC = {
+    ("Dropbox", "Upload"): ("content.dropboxapi.com", "/2/files/upload", "POST"),
+    ("Dropbox", "Download"): ("content.dropboxapi.com", "/2/files/download", "POST"),
+    ("Dropbox", "Login"): ("www.dropbox.com", "/login", "GET"),
+    ("Google Drive", "Upload"): ("www.googleapis.com", "/upload/drive/v3/files", "POST"),
+    ("Google Drive", "Download"): ("drive.google.com", "/uc", "GET"),
+    ("Gmail", "Login"): ("accounts.google.com", "/ServiceLogin", "GET"),
+    ("Gmail", "Send"): ("mail.google.com", "/mail/u/0/send", "POST"),
+}
+CONTENT_TYPES = ("application/json", "text/plain;charset=UTF-8", "application/octet-stream", "none")
+
+
+def make_requests(n_rows: int, seed: int = 0, extra_tokens: bool = False) -> pd.DataFrame:
+    """``n_rows`` labelled requests with session ids, hashes and random query values.
+
+    ``extra_tokens`` adds path segments the other rows never use, to cause
+    vocabulary drift.
+    """
+    rng = np.random.default_rng(seed)
+    labels = list(TRAFFIC)
+    rows: List[Dict[str, Any]] = []
+    for i in range(n_rows):
+        service, activity = labels[i % len(labels)]
+        host, path, method = TRAFFIC[(service, activity)]
+        session = "".join(rng.choice(list("0123456789abcdef"), size=32))
+        if extra_tokens:
+            path += "/" + "/".join(f"segment{rng.integers(10**6)}" for _ in range(4))
+        rows.append({
+            "headers_Host": host,
+            "url": f"https://{host}{path}/{session}?rid={rng.integers(10**6)}&authuser=0#top",
+            "method": method,
+            "requestHeaders_Origin": f"https://{host}" if i % 3 else "none",
+            "requestHeaders_Content_Type": CONTENT_TYPES[i % len(CONTENT_TYPES)],
+            "responseHeaders_Content_Type": "application/json",
+            "requestHeaders_Referer": f"https://{host}/?session={session}",
+            "requestHeaders_Accept": "*/*",
+            "service": service,
+            "activityType": activity,
+        })
+    return pd.DataFrame(rows, columns=[*FEATURE_FIELDS, "service", "activityType"])
@@ -1,9 +1,15 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class RfcTrainRequest(BaseModel):
     input_file: str = Field(..., description="CSV filename located in data/output/codebert/predictions directory")
+    joint: bool = Field(False, description="Train one multi-output forest for service and activity instead of two")
+    n_jobs: int = Field(1, description="Threads for fitting the forests; -1 uses all cores")
+    concurrent_heads: bool = Field(True, description="Fit the service and activity forests at the same time, splitting the threads")
+    incremental: bool = Field(False, description="Grow the saved forests with warm-start trees on a new file; full retrain on drift")
+    max_vocabulary_drift: float = Field(0.05, ge=0, le=1, description="Share of out-of-vocabulary tokens in the new file that forces a full retrain")
+    max_label_drift: float = Field(0.01, ge=0, le=1, description="Share of new rows with unseen labels that forces a full retrain")
 
 
 class RfcInferenceRequest(BaseModel):
@@ -16,3 +22,46 @@ class RfcInferenceRequest(BaseModel):
     responseHeaders_Content_Type: Optional[str] = None
     requestHeaders_Referer: Optional[str] = None
     requestHeaders_Accept: Optional[str] = None
+
+
+class RfcBuildRequest(BaseModel):
+    profile: str = Field("O2", description="Optimisation profile: debug, O2, O3 or native (-O3 -march=native)")
+    lto: bool = Field(False, description="Enable link-time optimisation")
+    pgo: bool = Field(False, description="Profile-guided optimisation trained on the latest saved test set")
+
+
+class RfcCodegenRequest(RfcBuildRequest):
+    compile: bool = Field(True, description="Compile the generated code into an executable and shared library")
+    forest_layout: str = Field("nested", description="Tree representation: nested (if/else), table (static node arrays) or compact (packed 4-byte nodes)")
+    benchmark_layouts: bool = Field(False, description="Compare all forest layouts for compile time, size and ns/record")
+    vocab_lookup: str = Field("perfect", description="Vocabulary lookup: perfect (minimal perfect hash) or bucket (chained hash table)")
+    benchmark_lookups: bool = Field(False, description="Compare all vocabulary lookups for ns/record and lookup ns/token")
+    joint: bool = Field(False, description="Train one multi-output forest and classify both heads in a single tree traversal")
+    benchmark_joint: bool = Field(False, description="Also train the other forest setup and compare accuracy and latency")
+    budget_ns: Optional[float] = Field(None, description="Latency budget in ns/record; selects a pruned sub-forest from a larger pool")
+    budget_bytes: Optional[int] = Field(None, description="Binary size budget in bytes; selects a pruned sub-forest from a larger pool")
+    prune_pool: int = Field(25, ge=1, description="Trees trained per forest when pruning to a budget")
+    n_jobs: int = Field(1, description="Threads for fitting the forests; -1 uses all cores")
+    concurrent_heads: bool = Field(True, description="Fit the service and activity forests at the same time, splitting the threads")
+
+
+class RfcBenchmarkRequest(BaseModel):
+    test_file: Optional[str] = Field(None, description="CSV in data/output/rfc/test; defaults to the newest test_set_*.csv")
+    engines: Optional[List[str]] = Field(None, description="Subset of python, c and emlearn; defaults to all")
+    limit: Optional[int] = Field(None, description="Only use the first N records")
+    latency_samples: int = Field(200, description="Records classified one by one to measure latency percentiles")
+
+
+class RfcSweepRequest(BaseModel):
+    n_estimators: Optional[List[int]] = Field(None, description="Tree counts to try; defaults to 5, 10, 25, 50, 100, 150")
+    max_depth: Optional[List[Optional[int]]] = Field(None, description="Depth limits to try, null for unlimited; defaults to null, 32, 16, 8")
+    max_features: Optional[List[int]] = Field(None, description="Vectorizer vocabulary sizes to try; defaults to 127, 1000, 5000")
+    vectorizers: Optional[List[str]] = Field(None, description="Subset of binary and tfidf; defaults to both")
+    engines: Optional[List[str]] = Field(None, description="Subset of python and c to measure and select for; defaults to both")
+    n_jobs: int = Field(1, description="Threads for fitting the forests; -1 uses all cores")
+    latency_samples: int = Field(100, ge=1, description="Validation records timed one by one per configuration")
+    budget_us: Optional[float] = Field(None, description="Python single-request p50 budget in microseconds")
+    budget_ns: Optional[float] = Field(None, description="C classifier budget in ns/record")
+    accuracy_tolerance: float = Field(0.005, ge=0, le=1, description="Without a budget, accuracy traded for the fastest configuration")
+    max_c_builds: int = Field(16, ge=0, description="Most C classifiers compiled and benchmarked")
+    save_defaults: bool = Field(True, description="Save the selected configurations as the training defaults")
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import csv
 import json
+import logging
 from pathlib import Path
 from typing import List, Dict, Any
 
+from .jobs import report_progress
+from .log_sink import emit
 from .path_config import PATHS
 
 
@@ -60,7 +63,9 @@ def convert_all_raw_json_to_csv() -> List[Path]:
 
     created_csv_files: List[Path] = []
 
-    for json_path in raw_dir.glob("*.json"):
+    json_paths = sorted(raw_dir.glob("*.json"))
+    for done, json_path in enumerate(json_paths):
+        report_progress(done, len(json_paths), f"Converting {json_path.name}")
         base_name = json_path.stem
         output_csv = csv_dir / f"{base_name}.csv"
         try:
@@ -70,5 +75,5 @@ def convert_all_raw_json_to_csv() -> List[Path]:
             created_csv_files.append(output_csv)
         except Exception as e:
             # Log error but continue processing others
-            print(f"[csv_utils] Error processing {json_path}: {e}")
+            emit(f"[csv_utils] Error processing {json_path}: {e}", level=logging.ERROR)
     return created_csv_files
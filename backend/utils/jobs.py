@@ -0,0 +1,345 @@
+"""Background jobs for long-running, blocking work (training, codegen, labelling).
+
+Every job runs its function in a separate process, started with the
+``spawn`` method, so CPU-bound work neither holds the GIL nor blocks the
+event loop. Concurrency is bounded per job type (``JOB_LIMITS``, overridable
+with ``JOB_LIMIT_<TYPE>`` environment variables); jobs beyond the limit wait
+in the ``queued`` state.
+
+Inside a job everything printed to stdout/stderr becomes the job log, and
+the function may call :func:`report_progress`. A supervisor thread in the
+server process collects both, plus the return value, into a :class:`Job`.
+Cancelling a running job terminates its whole process group, including
+compilers or C workers it started.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+# Jobs of one type allowed to run at the same time
+JOB_LIMITS: Dict[str, int] = {
+    "train": 1,
+    "codegen": 1,
+    "benchmark": 1,
+    "sweep": 1,
+    "label": 1,
+    "convert": 2,
+}
+MAX_LOG_LINES = 5000
+MAX_FINISHED_JOBS = 100
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+# Set in the job process only; see report_progress
+_job_conn: Any = None
+
+
+def report_progress(done: float, total: float | None = None, message: str | None = None) -> None:
+    """Report progress of the current job; a no-op outside of a job.
+
+    ``done``/``total`` give the fraction (``total`` omitted means ``done`` is
+    already a fraction in [0, 1]).
+    """
+    if _job_conn is None:
+        return
+    fraction = done / total if total else done
+    try:
+        _job_conn.send(("progress", (max(0.0, min(1.0, float(fraction))), message)))
+    except (OSError, ValueError):
+        pass
+
+
+class _PipeWriter(io.TextIOBase):
+    """Text stream that forwards complete lines to the supervising process."""
+
+    def __init__(self, conn: Any) -> None:
+        self._conn = conn
+        self._buffer = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._conn.send(("log", line))
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._conn.send(("log", self._buffer))
+            self._buffer = ""
+
+
+def _job_main(conn: Any, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+    """Entry point of the job process."""
+    global _job_conn
+    if hasattr(os, "setpgrp"):
+        # Own process group, so cancel also stops compilers and workers we start
+        os.setpgrp()
+    _job_conn = conn
+    sys.stdout = sys.stderr = _PipeWriter(conn)
+    try:
+        result = func(*args, **kwargs)
+        sys.stdout.flush()
+        conn.send(("result", result))
+    except BaseException as exc:  # noqa: BLE001 - reported to the parent
+        sys.stdout.flush()
+        conn.send(("error", (f"{type(exc).__name__}: {exc}", traceback.format_exc())))
+    finally:
+        conn.close()
+
+
+@dataclass
+class Job:
+    id: str
+    type: str
+    name: str
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    progress: float | None = None
+    progress_message: str | None = None
+    result: Any = None
+    error: str | None = None
+    logs: List[str] = field(default_factory=list)
+    # Lines dropped from the front of ``logs`` once MAX_LOG_LINES is reached
+    log_offset: int = 0
+    pid: int | None = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+    _cancel: bool = field(default=False, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def add_log(self, line: str) -> None:
+        self.logs.append(line)
+        if len(self.logs) > MAX_LOG_LINES:
+            drop = len(self.logs) - MAX_LOG_LINES
+            del self.logs[:drop]
+            self.log_offset += drop
+
+    def logs_since(self, index: int) -> tuple[List[str], int]:
+        """Log lines from absolute line ``index`` on, and the next index."""
+        start = max(index - self.log_offset, 0)
+        lines = self.logs[start:]
+        return lines, self.log_offset + start + len(lines)
+
+    async def wait(self) -> "Job":
+        """Wait for the job to finish without blocking the event loop."""
+        await asyncio.to_thread(self._done.wait)
+        return self
+
+    def response(self) -> Dict[str, Any]:
+        """The route response of a finished job, in the usual success/output shape."""
+        if self.status == "succeeded" and isinstance(self.result, dict):
+            return self.result
+        if self.status == "succeeded":
+            return {"success": True, "result": self.result}
+        return {"success": False, "error": self.error or self.status, "output": list(self.logs)}
+
+    def to_dict(self, include_logs: bool = False) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "id": self.id,
+            "type": self.type,
+            "name": self.name,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "progress_message": self.progress_message,
+            "error": self.error,
+            "log_lines": self.log_offset + len(self.logs),
+        }
+        if include_logs:
+            info["logs"] = list(self.logs)
+            info["result"] = self.result
+        return info
+
+
+class JobManager:
+    """Starts, tracks and cancels jobs; one supervisor thread per job."""
+
+    def __init__(self, limits: Dict[str, int] | None = None) -> None:
+        limits = dict(limits or JOB_LIMITS)
+        for job_type in limits:
+            env = os.getenv(f"JOB_LIMIT_{job_type.upper()}")
+            if env:
+                limits[job_type] = max(1, int(env))
+        self.limits = limits
+        self._slots = {job_type: threading.BoundedSemaphore(n) for job_type, n in limits.items()}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+
+    def submit(self, job_type: str, func: Callable[..., Any], *args: Any, name: str | None = None, **kwargs: Any) -> Job:
+        """Queue ``func(*args, **kwargs)`` as a job of ``job_type`` and return it immediately.
+
+        ``func`` and its arguments must be picklable (module-level function).
+        """
+        if job_type not in self._slots:
+            raise ValueError(f"Unknown job type {job_type!r}; choose one of {tuple(self._slots)}")
+        job = Job(id=uuid.uuid4().hex[:12], type=job_type, name=name or func.__name__)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        threading.Thread(
+            target=self._supervise, args=(job, func, args, kwargs), name=f"job-{job.id}", daemon=True
+        ).start()
+        return job
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job: Job, status: str, error: str | None = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job._done.set()
+
+    def _supervise(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+        with self._slots[job.type]:
+            if job._cancel:
+                self._finish(job, "cancelled", "Cancelled before it started")
+                return
+            recv_conn, send_conn = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                # Not a daemon: jobs such as the benchmark start processes of their own
+                target=_job_main, args=(send_conn, func, args, kwargs), name=f"job-{job.id}", daemon=False
+            )
+            try:
+                process.start()
+            except Exception as exc:
+                self._finish(job, "failed", f"Could not start job process: {exc}")
+                return
+            send_conn.close()
+            job.pid = process.pid
+            job.status = "running"
+            job.started_at = time.time()
+            if job._cancel:
+                # Cancelled while the process was starting
+                self._terminate(job.pid)
+
+            outcome: tuple | None = None
+            while True:
+                try:
+                    if recv_conn.poll(0.2):
+                        kind, payload = recv_conn.recv()
+                        if kind == "log":
+                            job.add_log(payload)
+                        elif kind == "progress":
+                            job.progress, job.progress_message = payload
+                        else:
+                            outcome = (kind, payload)
+                        continue
+                except (EOFError, OSError):
+                    break
+                if not process.is_alive():
+                    break
+            process.join()
+            recv_conn.close()
+
+        if job._cancel:
+            self._finish(job, "cancelled", "Cancelled")
+        elif outcome and outcome[0] == "result":
+            job.result = outcome[1]
+            job.progress = 1.0
+            self._finish(job, "succeeded")
+        elif outcome and outcome[0] == "error":
+            message, trace = outcome[1]
+            job.add_log(trace.rstrip())
+            self._finish(job, "failed", message)
+        else:
+            self._finish(job, "failed", f"Job process exited with code {process.exitcode}")
+
+    # ---------------------------------------------------------------- queries
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self, job_type: str | None = None, status: str | None = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            job for job in jobs
+            if (job_type is None or job.type == job_type) and (status is None or job.status == status)
+        ]
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued or running job; returns None for unknown ids."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel = True
+        if job.pid is not None:
+            self._terminate(job.pid)
+        return job
+
+    @staticmethod
+    def _terminate(pid: int) -> None:
+        try:
+            if hasattr(os, "killpg"):
+                try:
+                    os.killpg(pid, signal.SIGTERM)
+                    return
+                except ProcessLookupError:
+                    pass  # group not created yet; signal the process itself
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def shutdown(self) -> None:
+        """Cancel every unfinished job (server shutdown)."""
+        for job in self.list():
+            if not job.finished:
+                self.cancel(job.id)
+
+
+_manager: JobManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+async def run_job(
+    job_type: str,
+    func: Callable[..., Any],
+    *args: Any,
+    background: bool = False,
+    name: str | None = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Run ``func`` as a job from a route handler.
+
+    With ``background`` the job id is returned at once; otherwise the handler
+    awaits the job (off the event loop) and returns the function's own
+    response dict, so existing clients see the same response as before.
+    """
+    job = get_job_manager().submit(job_type, func, *args, name=name, **kwargs)
+    if background:
+        return {"success": True, "job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+    await job.wait()
+    return {**job.response(), "job_id": job.id}
@@ -13,6 +13,8 @@ from groq import Groq
 from sklearn.model_selection import train_test_split
 
 from .csv_utils import convert_all_raw_json_to_csv
+from .jobs import report_progress
+from .log_sink import emit
 from .path_config import PATHS
 
 load_dotenv()
@@ -40,11 +42,8 @@ ACTIVITIES = [
 ]
 
 
-def print_status(msg: str) -> None:  
-    try:
-        print(msg, flush=True)
-    except UnicodeEncodeError:
-        print(msg.encode("ascii", "ignore").decode("ascii"), flush=True)
+def print_status(msg: str) -> None:
+    emit(msg)
 
 
 def metadata_path() -> Path:
@@ -142,6 +141,7 @@ def label_file(csv_path: Path, client: Groq, meta: Dict[str, Any]) -> pd.DataFra
             save_metadata(meta)
             df.to_csv(csv_path, index=False)
             print_status(f"    ↳ saved progress ({idx + 1}/{total_rows})")
+            report_progress(idx + 1, total_rows, f"Labelling {name}")
 
     print_status(f"[+] Completed {name}")
     return df
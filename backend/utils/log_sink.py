@@ -0,0 +1,182 @@
+"""Structured, bounded logging for route and job output.
+
+Route handlers used to collect every status message in a plain list and the
+helpers printed each one with ``flush=True``. ``LogSink`` keeps the same
+``append`` interface but adds levels, a bounded ring buffer, rate-limited
+per-row events and aggregate counters; responses carry the retained tail
+and a summary instead of every line.
+
+Console output goes through the ``backend`` logger (level from the
+``BACKEND_LOG_LEVEL`` environment variable, default INFO).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, Iterator, List
+
+DEFAULT_CAPACITY = 500
+# Minimum seconds between two logged occurrences of the same event key
+DEFAULT_EVENT_INTERVAL = 1.0
+
+logger = logging.getLogger("backend")
+
+
+class _ConsoleHandler(logging.Handler):
+    """Write to the *current* ``sys.stdout`` (jobs redirect it into their log)."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        msg = self.format(record)
+        stream = sys.stdout
+        try:
+            stream.write(msg + "\n")
+        except UnicodeEncodeError:
+            # Legacy Windows consoles
+            stream.write(msg.encode("ascii", "ignore").decode("ascii") + "\n")
+        except Exception:
+            self.handleError(record)
+            return
+        if record.levelno >= logging.WARNING:
+            stream.flush()
+
+
+if not logger.handlers:
+    _handler = _ConsoleHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("BACKEND_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+class LogSink:
+    """Bounded, levelled log collector; a drop-in for the ``logs`` lists.
+
+    Args:
+        capacity: Lines retained for the response (older lines are dropped
+            but still counted)
+        level: Messages below this level are counted but neither kept nor echoed
+        echo: Also send kept messages to the ``backend`` logger
+        event_interval: See ``event``
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        level: int = logging.INFO,
+        echo: bool = True,
+        event_interval: float = DEFAULT_EVENT_INTERVAL,
+    ) -> None:
+        self._lines: deque[str] = deque(maxlen=capacity)
+        self.level = level
+        self.echo = echo
+        self.event_interval = event_interval
+        self.total = 0
+        self.levels: Counter[str] = Counter()
+        self.counters: Counter[str] = Counter()
+        self.suppressed: Counter[str] = Counter()
+        self._event_last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    # ------------------------------------------------------------- logging
+    def log(self, level: int, msg: str) -> None:
+        name = logging.getLevelName(level)
+        with self._lock:
+            self.levels[name] += 1
+            if level < self.level:
+                return
+            self.total += 1
+            self._lines.append(msg if level == logging.INFO else f"[{name}] {msg}")
+        if self.echo:
+            logger.log(level, msg)
+
+    def append(self, msg: Any) -> None:
+        """List-compatible alias for ``info``."""
+        self.log(logging.INFO, str(msg))
+
+    def extend(self, messages: Iterable[Any]) -> None:
+        for msg in messages:
+            self.append(msg)
+
+    def debug(self, msg: str) -> None:
+        self.log(logging.DEBUG, msg)
+
+    def info(self, msg: str) -> None:
+        self.log(logging.INFO, msg)
+
+    def warning(self, msg: str) -> None:
+        self.log(logging.WARNING, msg)
+
+    def error(self, msg: str) -> None:
+        self.log(logging.ERROR, msg)
+
+    def event(self, key: str, msg: str, level: int = logging.INFO) -> None:
+        """Count a per-row event and log it at most once per ``event_interval`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self.counters[key] += 1
+            last = self._event_last.get(key)
+            if last is not None and now - last < self.event_interval:
+                self.suppressed[key] += 1
+                return
+            self._event_last[key] = now
+        self.log(level, msg)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    # -------------------------------------------------------------- output
+    def lines(self) -> List[str]:
+        with self._lock:
+            return list(self._lines)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.lines())
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lines": self.total,
+                "dropped": self.total - len(self._lines),
+                "levels": dict(self.levels),
+                "counters": dict(self.counters),
+                "suppressed_events": dict(self.suppressed),
+                "elapsed_ms": round((time.perf_counter() - self._started) * 1000.0, 1),
+            }
+
+    def payload(self) -> Dict[str, Any]:
+        """Response fields: the retained lines as ``output`` plus ``log_summary``."""
+        return {"output": self.lines(), "log_summary": self.summary()}
+
+
+# Helpers accepting either a LogSink, a plain list or None as the sink
+def emit(msg: str, sink: Any = None, level: int = logging.INFO) -> None:
+    """Log ``msg`` to ``sink`` and the console."""
+    if isinstance(sink, LogSink):
+        sink.log(level, msg)
+        return
+    if sink is not None:
+        sink.append(msg)
+    logger.log(level, msg)
+
+
+def event(sink: Any, key: str, msg: str, level: int = logging.INFO) -> None:
+    """Rate-limited per-row message (every occurrence is logged without a LogSink)."""
+    if isinstance(sink, LogSink):
+        sink.event(key, msg, level)
+    else:
+        emit(msg, sink, level)
+
+
+def count(sink: Any, name: str, n: int = 1) -> None:
+    """Add ``n`` to counter ``name``; a no-op without a LogSink."""
+    if isinstance(sink, LogSink):
+        sink.count(name, n)
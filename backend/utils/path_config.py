@@ -14,6 +14,8 @@ PATHS = {
     "rfc_python_train_input": DATA_DIR / "output" / "codebert" / "predictions",
     "rfc_python_train_models": DATA_DIR / "output" / "rfc" / "models",
     "rfc_python_train_test": DATA_DIR / "output" / "rfc" / "test",
+    "rfc_dataset_cache": DATA_DIR / "output" / "rfc" / "dataset-cache",
+    "rfc_training_defaults_file": DATA_DIR / "output" / "rfc" / "training_defaults.json",
 
     # RFC C code generation specific paths
     "rfc_codegen_input_folder": DATA_DIR / "output" / "codebert" / "predictions",
@@ -23,6 +25,9 @@ PATHS = {
     "rfc_python_inference_input_folder": DATA_DIR / "output" / "codebert" / "predictions",
     "rfc_python_inference_output_folder": DATA_DIR / "output" / "rfc" / "inference",
     "rfc_python_inference_models": DATA_DIR / "output" / "rfc" / "models",
+
+    # RFC engine benchmark reports
+    "rfc_benchmarks_folder": DATA_DIR / "output" / "rfc" / "benchmarks",
     
 }
 
@@ -0,0 +1,369 @@
+"""Compare the RFC inference engines on the same test set.
+
+Every engine (sklearn pipeline, generated C classifier, emlearn) classifies
+the same records in its own process so that peak RSS is attributable to the
+engine. The report covers prediction agreement between engines, accuracy
+against the labels in the test set, single-request latency percentiles,
+batch throughput, peak RSS and artifact size, and is written as JSON under
+``PATHS["rfc_benchmarks_folder"]`` so that model versions can be compared
+over time.
+
+Run from the repository root::
+
+    python -m backend.utils.rfc.benchmark --engines python,c --limit 5000
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from ..path_config import DATA_DIR, PATHS
+from ..log_sink import emit as _status
+from .feature_text import combined_text
+from .model_registry import LEGACY_MODEL_FILES, MODEL_ARTIFACT, get_registry
+from .python_inference import FEATURE_COLUMNS
+
+ENGINES = ("python", "c", "emlearn")
+LABEL_COLUMNS = {"service": "service", "activity": "activityType"}
+EMLEARN_SOURCE = DATA_DIR / "output" / "rfc" / "em-codegen" / "rfc_em_inference.c"
+
+
+
+# --------------------------------------------------------------------- inputs
+def _resolve_test_file(test_file: str | None) -> Path:
+    """Return ``test_file`` (absolute or relative to the test directory) or the newest test set."""
+    test_dir = Path(PATHS["rfc_python_train_test"])
+    if test_file:
+        path = Path(test_file)
+        if not path.is_absolute():
+            path = test_dir / path
+        if not path.is_file():
+            raise FileNotFoundError(test_file)
+        return path.resolve()
+    candidates = sorted(test_dir.glob("test_set_*.csv"))
+    if not candidates:
+        raise FileNotFoundError(f"No test_set_*.csv found in {test_dir}")
+    return candidates[-1].resolve()
+
+
+def _load_records(path: Path, limit: int | None) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    df = pd.read_csv(path, nrows=limit)
+    for column in FEATURE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    features = df[FEATURE_COLUMNS].astype(object).where(df[FEATURE_COLUMNS].notna(), None)
+    labels = {
+        head: df[column].astype(str).tolist()
+        for head, column in LABEL_COLUMNS.items()
+        if column in df.columns
+    }
+    return features.to_dict(orient="records"), labels
+
+
+def _file_size(*paths: Path) -> int | None:
+    existing = [p for p in paths if p.exists()]
+    return sum(p.stat().st_size for p in existing) if existing else None
+
+
+def _file_version(path: Path) -> str:
+    digest = hashlib.sha1()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+# -------------------------------------------------------------------- engines
+# Each factory returns (predict, info): ``predict`` maps a list of records to
+# per-head label lists ({"service": [...], "activity": [...]}); a head the
+# engine does not cover is simply absent.
+Predictor = Callable[[List[Dict[str, Any]]], Dict[str, List[str]]]
+
+
+def _python_engine() -> Tuple[Predictor, Dict[str, Any]]:
+    from .python_inference import batch_predict_rfc_python
+
+    registry = get_registry()
+    models = registry.get()
+
+    def predict(records: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        results, _ = batch_predict_rfc_python(records)
+        return {
+            "service": [r["service_prediction"] for r in results],
+            "activity": [r["activity_prediction"] for r in results],
+        }
+
+    models_dir = registry.models_dir
+    info = {
+        "version": models.version,
+        "artifact_size_bytes": _file_size(models_dir / MODEL_ARTIFACT)
+        or _file_size(*(models_dir / name for name in LEGACY_MODEL_FILES.values())),
+    }
+    return predict, info
+
+
+def _c_engine() -> Tuple[Predictor, Dict[str, Any]]:
+    from .c_inference import _get_executable, batch_predict_rfc_c, get_native_classifier
+
+    native = get_native_classifier()
+    artifact = native.path if native is not None else _get_executable()
+
+    def predict(records: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        results, _ = batch_predict_rfc_c(records)
+        return {
+            "service": [str(r["service"]) for r in results],
+            "activity": [str(r["activity"]) for r in results],
+        }
+
+    info = {
+        "version": _file_version(artifact),
+        "transport": "library" if native is not None else "stream",
+        "artifact": str(artifact),
+        "artifact_size_bytes": artifact.stat().st_size,
+    }
+    return predict, info
+
+
+def _emlearn_engine() -> Tuple[Predictor, Dict[str, Any]]:
+    from .codegen_emlearn import convert
+
+    if convert is None:
+        raise RuntimeError("emlearn package not installed")
+    models = get_registry().get()
+    if models.joint_model is not None:
+        raise RuntimeError("emlearn converts single-output forests only; the loaded models are joint")
+    # The emlearn generator only converts the service forest
+    compiled = convert(models.service_model, method="pymodule")
+
+    def predict(records: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        texts = combined_text(pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS)).tolist()
+        features, _ = models.transform(texts)
+        dense = np.asarray(features.todense(), dtype=np.float32)
+        predicted = np.asarray(compiled.predict(dense)).astype(int)
+        return {"service": models.service_labels[predicted].tolist()}
+
+    info = {
+        "version": models.version,
+        "heads": ["service"],
+        "artifact_size_bytes": _file_size(EMLEARN_SOURCE),
+    }
+    return predict, info
+
+
+ENGINE_FACTORIES: Dict[str, Callable[[], Tuple[Predictor, Dict[str, Any]]]] = {
+    "python": _python_engine,
+    "c": _c_engine,
+    "emlearn": _emlearn_engine,
+}
+
+
+def _peak_rss_mb(who: int) -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_engine(engine: str, test_file: str, limit: int | None, latency_samples: int) -> Dict[str, Any]:
+    """Benchmark one engine; runs in a fresh child process."""
+    records, _ = _load_records(Path(test_file), limit)
+    baseline_rss = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+    # Engines log every batch; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        predict, info = ENGINE_FACTORIES[engine]()
+        predict(records[:1])  # warm-up
+
+        start = time.perf_counter()
+        predictions = predict(records)
+        elapsed = time.perf_counter() - start
+
+        sample = np.unique(np.linspace(0, len(records) - 1, num=min(latency_samples, len(records)), dtype=int))
+        latencies_ms = []
+        for i in sample:
+            t0 = time.perf_counter()
+            predict([records[i]])
+            latencies_ms.append((time.perf_counter() - t0) * 1000.0)
+
+        if engine == "c":
+            from .c_inference import get_worker_pool
+
+            get_worker_pool().shutdown()
+
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if latencies_ms else (0.0, 0.0, 0.0)
+    return {
+        **info,
+        "available": True,
+        "records": len(records),
+        "batch_seconds": round(elapsed, 4),
+        "records_per_second": round(len(records) / elapsed, 1) if elapsed > 0 else None,
+        "latency_ms": {
+            "samples": len(latencies_ms),
+            "p50": round(float(p50), 4),
+            "p95": round(float(p95), 4),
+            "p99": round(float(p99), 4),
+        },
+        "baseline_rss_mb": baseline_rss,
+        # This process only; C stream workers (transport "stream") are not included
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "predictions": predictions,
+    }
+
+
+# -------------------------------------------------------------------- scoring
+def _agreement(reports: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Fraction of records on which each pair of engines predicts the same label, per head."""
+    names = [n for n, r in reports.items() if r.get("available")]
+    result: Dict[str, Dict[str, float]] = {}
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            pa, pb = reports[a]["predictions"], reports[b]["predictions"]
+            heads = [h for h in LABEL_COLUMNS if h in pa and h in pb]
+            if heads:
+                result[f"{a}_vs_{b}"] = {
+                    h: round(float(np.mean(np.asarray(pa[h]) == np.asarray(pb[h]))), 4) for h in heads
+                }
+    return result
+
+
+def _compare_previous(report: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change of throughput and p50 latency against an earlier report."""
+    changes: Dict[str, Any] = {}
+    for name, current in report["engines"].items():
+        before = previous.get("engines", {}).get(name, {})
+        if not current.get("available") or not before.get("available"):
+            continue
+        entry: Dict[str, Any] = {"previous_version": before.get("version")}
+        if current.get("records_per_second") and before.get("records_per_second"):
+            entry["throughput_ratio"] = round(current["records_per_second"] / before["records_per_second"], 3)
+        if current["latency_ms"]["p50"] and before.get("latency_ms", {}).get("p50"):
+            entry["p50_ratio"] = round(current["latency_ms"]["p50"] / before["latency_ms"]["p50"], 3)
+        changes[name] = entry
+    return changes
+
+
+def run_benchmark(
+    test_file: str | None = None,
+    engines: List[str] | None = None,
+    limit: int | None = None,
+    latency_samples: int = 200,
+    save: bool = True,
+    logs: List[str] | None = None,
+) -> Dict[str, Any]:
+    """Run every requested engine over the test set and return (and save) the report.
+
+    Args:
+        test_file: CSV in the RFC test directory (or an absolute path);
+            defaults to the newest ``test_set_*.csv``
+        engines: Subset of ENGINES; defaults to all of them. Engines that
+            cannot run here are reported as unavailable with the reason.
+        limit: Only use the first ``limit`` records
+        latency_samples: Number of evenly spaced records classified one by
+            one to measure single-request latency
+        save: Write the report to ``PATHS["rfc_benchmarks_folder"]``
+        logs: Optional sink for status messages
+    """
+    engines = list(engines or ENGINES)
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        raise ValueError(f"Unknown engines {unknown}; choose from {ENGINES}")
+
+    path = _resolve_test_file(test_file)
+    records, labels = _load_records(path, limit)
+    _status(f"Benchmarking {', '.join(engines)} on {len(records)} records from {path.name}", logs)
+
+    reports: Dict[str, Dict[str, Any]] = {}
+    context = multiprocessing.get_context("spawn")
+    for engine in engines:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                reports[engine] = pool.submit(_run_engine, engine, str(path), limit, latency_samples).result()
+            except Exception as exc:
+                reports[engine] = {"available": False, "error": str(exc)}
+                _status(f"{engine}: unavailable ({exc})", logs)
+                continue
+        current = reports[engine]
+        if labels:
+            current["accuracy"] = {
+                head: round(float(np.mean(np.asarray(pred) == np.asarray(labels[head]))), 4)
+                for head, pred in current["predictions"].items()
+                if head in labels
+            }
+        _status(
+            f"{engine}: {current['records_per_second']} records/s, "
+            f"p50 {current['latency_ms']['p50']} ms, p99 {current['latency_ms']['p99']} ms, "
+            f"peak RSS {current['peak_rss_mb']} MB, accuracy {current.get('accuracy')}",
+            logs,
+        )
+
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "test_file": str(path),
+        "records": len(records),
+        "labelled": bool(labels),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "agreement": _agreement(reports),
+        "engines": reports,
+    }
+    for name, agreement in report["agreement"].items():
+        _status(f"Agreement {name}: {agreement}", logs)
+    for engine_report in reports.values():
+        engine_report.pop("predictions", None)
+
+    if save:
+        out_dir = Path(PATHS["rfc_benchmarks_folder"])
+        previous_reports = sorted(out_dir.glob("benchmark_*.json"))
+        if previous_reports:
+            previous = json.loads(previous_reports[-1].read_text(encoding="utf-8"))
+            report["compared_to"] = previous_reports[-1].name
+            report["changes"] = _compare_previous(report, previous)
+        out_file = out_dir / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+        out_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        report["report_file"] = str(out_file)
+        _status(f"Benchmark report written to {out_file}", logs)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the RFC inference engines on a test set")
+    parser.add_argument("--test-file", help="CSV in data/output/rfc/test (default: newest test_set_*.csv)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated subset of " + ",".join(ENGINES))
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N records")
+    parser.add_argument("--latency-samples", type=int, default=200, help="Records timed one by one")
+    parser.add_argument("--no-save", action="store_true", help="Print the report without writing it")
+    args = parser.parse_args()
+    report = run_benchmark(
+        test_file=args.test_file,
+        engines=[e.strip() for e in args.engines.split(",") if e.strip()],
+        limit=args.limit,
+        latency_samples=args.latency_samples,
+        save=not args.no_save,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from ..path_config import PATHS
+from ..log_sink import emit as _status
+from .c_inference import (
+    EXECUTABLE_NIX,
+    EXECUTABLE_WIN,
+    LIBRARY_FILE,
+    STREAM_CHUNK_SIZE,
+    NativeClassifier,
+    _StreamWorker,
+    _stream_line,
+)
+
+
+
+OUTPUT_DIR = Path(PATHS["rfc_codegen_output_folder"]).resolve()
+SOURCE_FILE = OUTPUT_DIR / "api_classifier.c"
+CACHE_DIR = OUTPUT_DIR / "build-cache"
+# Cached builds kept on disk; older entries are evicted first
+CACHE_ENTRIES = 8
+
+BUILD_PROFILES: Dict[str, List[str]] = {
+    "debug": ["-O0", "-g"],
+    "O2": ["-O2"],
+    "O3": ["-O3"],
+    "native": ["-O3", "-march=native"],
+}
+
+# Records used for the latency smoke test and PGO training when no test set exists
+_FALLBACK_RECORDS = [
+    {
+        "headers_Host": "www.dropbox.com",
+        "url": "https://www.dropbox.com/cmd/upload_precheck",
+        "method": "POST",
+        "responseHeaders_Content_Type": "text/plain; charset=utf-8",
+    },
+    {
+        "headers_Host": "play.google.com",
+        "url": "https://play.google.com/log?format=json",
+        "method": "POST",
+        "requestHeaders_Origin": "https://accounts.google.com",
+        "requestHeaders_Content_Type": "text/plain;charset=UTF-8",
+        "requestHeaders_Accept": "*/*",
+    },
+]
+
+
+def _find_compiler() -> str:
+    compiler = os.getenv("CC") or shutil.which("gcc") or shutil.which("clang") or shutil.which("cc")
+    if not compiler:
+        raise RuntimeError("No C compiler found. Install gcc or clang, or set the CC environment variable.")
+    return compiler
+
+
+def _compiler_id(compiler: str) -> str:
+    try:
+        proc = subprocess.run([compiler, "--version"], capture_output=True, text=True, check=True)
+        return proc.stdout.splitlines()[0] if proc.stdout else compiler
+    except (OSError, subprocess.CalledProcessError):
+        return compiler
+
+
+def _latest_test_set() -> Path | None:
+    test_dir = Path(PATHS["rfc_python_train_test"])
+    candidates = sorted(test_dir.glob("test_set_*.csv"))
+    return candidates[-1] if candidates else None
+
+
+def _sample_records(limit: int = 2000) -> List[Dict[str, Any]]:
+    """Records used to train PGO and to smoke-test latency."""
+    test_set = _latest_test_set()
+    if test_set is None:
+        return list(_FALLBACK_RECORDS)
+    df = pd.read_csv(test_set, nrows=limit)
+    return df.to_dict(orient="records") or list(_FALLBACK_RECORDS)
+
+
+def _run(cmd: List[str], cwd: Path) -> None:
+    proc = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Compilation failed ({' '.join(cmd)}):\n{proc.stderr.strip()}")
+
+
+def _exe_name() -> str:
+    return EXECUTABLE_WIN.name if sys.platform.startswith("win") else EXECUTABLE_NIX.name
+
+
+def _cache_key(source: bytes, compiler_id: str, flags: List[str], pgo_input: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(source)
+    digest.update(compiler_id.encode())
+    digest.update("\0".join(flags).encode())
+    digest.update(pgo_input)
+    return digest.hexdigest()[:16]
+
+
+def _stream_all(worker: _StreamWorker, lines: List[str]) -> None:
+    """Send ``lines`` to ``worker`` in chunks, as ``CWorkerPool.run`` does.
+
+    One request writes all its lines before reading any answer, so a large
+    one blocks once both pipe buffers are full. Only the class ids are
+    needed here, so the ranked top-k output is switched off first.
+    """
+    worker.request(["TOPK 0"])
+    for start in range(0, len(lines), STREAM_CHUNK_SIZE):
+        worker.request(lines[start:start + STREAM_CHUNK_SIZE])
+
+
+def _evict_cache() -> None:
+    entries = sorted((p for p in CACHE_DIR.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[CACHE_ENTRIES:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def _compile(
+    compiler: str,
+    source: Path,
+    flags: List[str],
+    out_dir: Path,
+    work_dir: Path,
+    pgo_records: List[Dict[str, Any]] | None,
+    library: bool = True,
+) -> None:
+    """Compile executable and shared library from ``source`` into ``out_dir``.
+
+    Every object is compiled with -fPIC in the same ``work_dir`` so the PGO
+    profile recorded by the instrumented executable matches the objects of
+    both the final executable and the library.
+    """
+    obj = work_dir / "api_classifier.o"
+    lib_obj = work_dir / "api_classifier_lib.o"
+    base = [compiler, *flags, "-fPIC"]
+    profile_flags: List[str] = []
+
+    if pgo_records is not None:
+        profile_dir = work_dir / "profile"
+        instrumented = work_dir / _exe_name()
+        _run([*base, f"-fprofile-generate={profile_dir}", "-c", str(source), "-o", str(obj)], work_dir)
+        _run([*base, f"-fprofile-generate={profile_dir}", str(obj), "-o", str(instrumented)], work_dir)
+        worker = _StreamWorker(instrumented, generation=0)
+        try:
+            _stream_all(worker, [_stream_line(r) for r in pgo_records])
+        finally:
+            worker.close()
+        profile_flags = [f"-fprofile-use={profile_dir}", "-fprofile-correction"]
+
+    _run([*base, *profile_flags, "-c", str(source), "-o", str(obj)], work_dir)
+    _run([*base, str(obj), "-o", str(out_dir / _exe_name())], work_dir)
+    if not library:
+        return
+    # The library object reuses the executable's object path so the profile applies
+    _run([*base, *profile_flags, "-DRFC_NO_MAIN", "-c", str(source), "-o", str(obj)], work_dir)
+    shutil.move(str(obj), lib_obj)
+    _run([*base, "-shared", str(lib_obj), "-o", str(out_dir / LIBRARY_FILE.name)], work_dir)
+
+
+def _install(src: Path, dest: Path) -> None:
+    """Copy ``src`` over ``dest`` atomically so running loaders see a new file."""
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+def _smoke_test(exe: Path, library: Path, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Measure per-record latency of the stream executable and the library."""
+    lines = [_stream_line(r) for r in records]
+    worker = _StreamWorker(exe, generation=0)
+    try:
+        _stream_all(worker, lines[:16])  # warm-up
+        start = time.perf_counter()
+        _stream_all(worker, lines)
+        stream_us = (time.perf_counter() - start) / len(lines) * 1e6
+    finally:
+        worker.close()
+
+    native = NativeClassifier(library)
+    native.classify(records[:16])
+    start = time.perf_counter()
+    native.classify(records)
+    library_us = (time.perf_counter() - start) / len(records) * 1e6
+    return {
+        "records": len(records),
+        "stream_us_per_record": round(stream_us, 2),
+        "library_us_per_record": round(library_us, 2),
+    }
+
+
+def build_c_classifier(
+    profile: str = "O2",
+    lto: bool = False,
+    pgo: bool = False,
+    source: str | Path | None = None,
+    smoke_test: bool = True,
+    logs: List[str] | None = None,
+) -> Dict[str, Any]:
+    """Compile the generated classifier into an executable and a shared library.
+
+    Builds are cached under ``build-cache/<hash>`` keyed on the source, the
+    compiler version, the flags and (for PGO) the training records, so
+    rebuilding unchanged code is a copy. The results are installed next to the
+    source where ``c_inference`` picks them up.
+
+    Parameters
+    ----------
+    profile: str
+        One of ``BUILD_PROFILES`` (``debug``, ``O2``, ``O3``, ``native``).
+    lto: bool
+        Enable link-time optimisation.
+    pgo: bool
+        Profile-guided optimisation trained on the latest saved test set.
+    source: str | Path | None
+        C source to compile, defaults to the generated ``api_classifier.c``.
+    smoke_test: bool
+        Measure per-record latency of the installed binaries.
+    logs: list[str] | None
+        Optional sink for status messages.
+    """
+    if profile not in BUILD_PROFILES:
+        raise ValueError(f"Unknown build profile {profile!r}; choose one of {sorted(BUILD_PROFILES)}")
+    source_path = Path(source) if source else SOURCE_FILE
+    if not source_path.exists():
+        raise FileNotFoundError(f"C source not found at {source_path}. Generate the C code first.")
+
+    compiler = _find_compiler()
+    compiler_id = _compiler_id(compiler)
+    flags = list(BUILD_PROFILES[profile]) + (["-flto"] if lto else [])
+    records = _sample_records()
+    # What the instrumented run sees, see _stream_all
+    pgo_input = "\n".join(["TOPK 0", *(_stream_line(r) for r in records)]).encode() if pgo else b""
+    key = _cache_key(source_path.read_bytes(), compiler_id, flags + (["pgo"] if pgo else []), pgo_input)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    entry = CACHE_DIR / key
+    cached = (entry / _exe_name()).exists() and (entry / LIBRARY_FILE.name).exists()
+    compile_ms = 0.0
+    if cached:
+        _status(f"Using cached build {key} ({profile}{', LTO' if lto else ''}{', PGO' if pgo else ''})", logs)
+        entry.touch()
+    else:
+        _status(f"Compiling {source_path.name} with {compiler_id} {' '.join(flags)}{' + PGO' if pgo else ''}", logs)
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="rfc-build-") as tmp:
+            staging = Path(tmp) / "out"
+            staging.mkdir()
+            _compile(compiler, source_path.resolve(), flags, staging, Path(tmp), records if pgo else None)
+            if entry.exists():
+                shutil.rmtree(entry)
+            shutil.copytree(staging, entry)
+        compile_ms = (time.perf_counter() - start) * 1000.0
+        _status(f"Compiled in {compile_ms / 1000.0:.2f} seconds", logs)
+        _evict_cache()
+
+    exe_dest = OUTPUT_DIR / _exe_name()
+    _install(entry / _exe_name(), exe_dest)
+    _install(entry / LIBRARY_FILE.name, LIBRARY_FILE)
+    _status(f"Installed {exe_dest.name} and {LIBRARY_FILE.name}", logs)
+
+    result: Dict[str, Any] = {
+        "cache_key": key,
+        "cached": cached,
+        "compiler": compiler_id,
+        "flags": flags,
+        "profile": profile,
+        "lto": lto,
+        "pgo": pgo,
+        "compile_ms": round(compile_ms, 1),
+        "executable": str(exe_dest),
+        "executable_size_bytes": exe_dest.stat().st_size,
+        "library": str(LIBRARY_FILE),
+        "library_size_bytes": LIBRARY_FILE.stat().st_size,
+    }
+    if smoke_test:
+        result["smoke_test"] = _smoke_test(exe_dest, LIBRARY_FILE, records)
+        _status(
+            f"Smoke test: {result['smoke_test']['stream_us_per_record']} µs/record (stream), "
+            f"{result['smoke_test']['library_us_per_record']} µs/record (library)",
+            logs,
+        )
+    return result
+
+
+def run_bench(exe: Path, records: List[Dict[str, Any]], iterations: int = 20) -> Dict[str, Any]:
+    """Run the executable's ``--bench`` mode over ``records`` and return its report."""
+    payload = "".join(f"{_stream_line(r)}\n" for r in records)
+    proc = subprocess.run(
+        [str(exe), "--bench", str(iterations)],
+        input=payload,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def benchmark_sources(
+    sources: Dict[str, Path],
+    records: List[Dict[str, Any]] | None = None,
+    profile: str = "O2",
+    iterations: int = 20,
+    logs: List[str] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Compile each named source variant and compare compile time, size, ns/record and lookup ns/token.
+
+    Nothing is installed; variants are built in temporary directories.
+    """
+    compiler = _find_compiler()
+    flags = list(BUILD_PROFILES[profile])
+    records = records or _sample_records()
+    report: Dict[str, Dict[str, Any]] = {}
+    for name, source in sources.items():
+        with tempfile.TemporaryDirectory(prefix="rfc-bench-") as tmp:
+            out_dir = Path(tmp) / "out"
+            out_dir.mkdir()
+            start = time.perf_counter()
+            _compile(compiler, Path(source).resolve(), flags, out_dir, Path(tmp), None, library=False)
+            compile_ms = (time.perf_counter() - start) * 1000.0
+            exe = out_dir / _exe_name()
+            bench = run_bench(exe, records, iterations)
+            report[name] = {
+                "source_size_bytes": Path(source).stat().st_size,
+                "compile_ms": round(compile_ms, 1),
+                "binary_size_bytes": exe.stat().st_size,
+                "ns_per_record": bench["ns_per_record"],
+                "checksum": bench["checksum"],
+                "tokens_per_record": bench.get("tokens_per_record"),
+                "lookup_ns_per_token": bench.get("lookup_ns_per_token"),
+                "vocab_unresolved": bench.get("vocab_unresolved"),
+            }
+        _status(
+            f"{name}: compile {report[name]['compile_ms'] / 1000.0:.2f} s, "
+            f"binary {report[name]['binary_size_bytes'] / 1024:.0f} KiB, "
+            f"{report[name]['ns_per_record']:.0f} ns/record, "
+            f"{report[name]['lookup_ns_per_token']} ns/token lookup",
+            logs,
+        )
+    return report
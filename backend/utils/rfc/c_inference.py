@@ -2,27 +2,46 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Tuple
+import ctypes
+import hashlib
 import json
+import math
+import os
+import queue
+import shutil
 import subprocess
 import sys
+import threading
 import time
 
-from ..path_config import PATHS
-
+import numpy as np
 
+from ..path_config import PATHS
+from ..log_sink import count, emit as _status
+from .canonical import FEATURE_FIELDS
+from .constants import C_ABI_VERSION, DEFAULT_TOP_K
+from .prediction_cache import get_prediction_cache
+from .streaming import DEFAULT_CHUNK_SIZE, stream_file_predictions
 
-def _status(msg: str, sink: List[str] | None = None) -> None:  
-    if sink is not None:
-        sink.append(msg)
-    print(msg, flush=True)
 
 
 
 OUTPUT_DIR = Path(PATHS["rfc_codegen_output_folder"]).resolve()
 EXECUTABLE_WIN = OUTPUT_DIR / "api_classifier.exe"
 EXECUTABLE_NIX = OUTPUT_DIR / "api_classifier" 
+if sys.platform.startswith("win"):
+    LIBRARY_FILE = OUTPUT_DIR / "api_classifier.dll"
+elif sys.platform == "darwin":
+    LIBRARY_FILE = OUTPUT_DIR / "libapi_classifier.dylib"
+else:
+    LIBRARY_FILE = OUTPUT_DIR / "libapi_classifier.so"
+# top_k large enough to list every class, for full vote distributions
+ALL_CLASSES = 1 << 16
 LABEL_MAP_FILE = OUTPUT_DIR / "label_mappings.txt"
+# Loaded copies of the shared library, next to it; see NativeClassifier
+LOADED_DIR_NAME = "loaded"
+LOADED_COPIES = 4
 
 _service_map: Dict[int, str] | None = None
 _activity_map: Dict[int, str] | None = None
@@ -93,8 +112,6 @@ def _build_args_from_request(request: Dict[str, Any]) -> List[str]:
     Ensures each value is a *string* (not None, NaN, etc.) so that the executed
     command always supplies exactly 8 arguments.
     """
-    import math 
-
     def _safe(val: Any) -> str:
         """Sanitize a single field for safe CLI passing."""
         if val is None:
@@ -123,13 +140,461 @@ def _build_args_from_request(request: Dict[str, Any]) -> List[str]:
     ]
 
 
-def predict_rfc_c(request_data: Dict[str, Any], logs: List[str] | None = None) -> Dict[str, Any]:
-    """Run a single inference through the compiled C classifier.
+FIELD_NAMES = list(FEATURE_FIELDS)
 
-    Returns a dict containing the *raw* ids and, if mapping available, the
-    decoded labels.
+# Records sent to a worker before reading its answers. Keeps both pipe buffers
+# well below their capacity so the writer and the worker never block each other.
+STREAM_CHUNK_SIZE = 256
+# Seconds a worker may take to answer one chunk, and a request may wait for an idle worker
+WORKER_TIMEOUT = float(os.getenv("RFC_C_WORKER_TIMEOUT", "30"))
+
+_TAB_TRANSLATION = str.maketrans({"\t": " ", "\r": " ", "\n": " "})
+
+
+def _stream_line(request: Dict[str, Any]) -> str:
+    """Encode a request as one tab-separated line for the ``--stream`` mode.
+
+    Tabs and line breaks are separators for the C tokenizer anyway, so
+    replacing them with spaces does not change the extracted features.
+    """
+    values = []
+    for name in FIELD_NAMES:
+        val = request.get(name)
+        if val is None or (isinstance(val, float) and math.isnan(val)):
+            values.append("")
+        else:
+            values.append(str(val).translate(_TAB_TRANSLATION))
+    return "\t".join(values)
+
+
+class _StreamWorker:
+    """A long-lived ``api_classifier --stream`` process."""
+
+    def __init__(self, exe: Path, generation: int) -> None:
+        self.generation = generation
+        self.proc = subprocess.Popen(
+            [str(exe), "--stream"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self.handled = 0
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def request(self, lines: List[str], timeout: float | None = None) -> List[Dict[str, Any]]:
+        """Send ``lines`` and read one JSON answer per line.
+
+        A worker that has not answered within ``timeout`` seconds (default
+        ``WORKER_TIMEOUT``) is killed. Every failure raises RuntimeError.
+        """
+        assert self.proc.stdin is not None and self.proc.stdout is not None
+        watchdog = threading.Timer(WORKER_TIMEOUT if timeout is None else timeout, self.proc.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            self.proc.stdin.write("".join(f"{ln}\n" for ln in lines))
+            self.proc.stdin.flush()
+            out: List[Dict[str, Any]] = []
+            for _ in lines:
+                raw = self.proc.stdout.readline()
+                if not raw:
+                    if not watchdog.is_alive():
+                        raise RuntimeError("C classifier worker did not answer in time and was killed")
+                    raise RuntimeError(f"C classifier worker exited with code {self.proc.poll()}")
+                out.append(json.loads(raw))
+        except (OSError, ValueError) as exc:
+            # Broken pipe to a dead worker, or a garbled answer
+            raise RuntimeError(f"C classifier worker failed: {exc}") from exc
+        finally:
+            watchdog.cancel()
+        self.handled += len(lines)
+        return out
+
+    def ping(self) -> bool:
+        try:
+            return self.alive() and self.request(["PING"])[0].get("pong") is True
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                self.proc.stdin.close()  # type: ignore[union-attr]
+                self.proc.wait(timeout=2)
+            except Exception:
+                self.proc.kill()
+
+
+class CWorkerPool:
+    """Pool of persistent C classifier processes.
+
+    Workers are started lazily, checked before use and replaced when they
+    crash. The pool is bound to one executable version (path + mtime); if the
+    binary is rebuilt, the next ``acquire`` starts a new generation of workers
+    and old ones are closed as they are released. A worker that does not
+    answer within ``WORKER_TIMEOUT`` is killed, and a request that finds no
+    idle worker in that time fails; both raise RuntimeError, on which callers
+    fall back to one process per request.
+    """
+
+    def __init__(self, size: int | None = None) -> None:
+        self.size = size or int(os.getenv("RFC_C_WORKERS", min(4, os.cpu_count() or 1)))
+        self._idle: "queue.LifoQueue[_StreamWorker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._restarts = 0
+        self._generation = 0
+        self._version: Tuple[str, int] | None = None
+
+    def _sync_version(self, exe: Path) -> None:
+        version = (str(exe), exe.stat().st_mtime_ns)
+        with self._lock:
+            if self._version != version:
+                self._drain()
+                self._version = version
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._started = 0
+        self._generation += 1
+
+    def _spawn(self, exe: Path) -> _StreamWorker:
+        try:
+            worker = _StreamWorker(exe, self._generation)
+        except OSError as exc:
+            raise RuntimeError(f"Could not start {exe}: {exc}") from exc
+        if not worker.ping():
+            worker.close()
+            raise RuntimeError(f"{exe} does not support --stream mode; regenerate and recompile the C code")
+        return worker
+
+    def acquire(self, exe: Path) -> _StreamWorker:
+        self._sync_version(exe)
+        with self._lock:
+            can_start = self._started < self.size
+            if can_start:
+                self._started += 1
+        if can_start:
+            try:
+                return self._spawn(exe)
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+        try:
+            worker = self._idle.get(timeout=WORKER_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError(f"No C classifier worker became idle within {WORKER_TIMEOUT:g} s") from None
+        if worker.alive():
+            return worker
+        worker.close()
+        with self._lock:
+            self._restarts += 1
+        try:
+            return self._spawn(exe)
+        except Exception:
+            # The dead worker's slot is free again
+            with self._lock:
+                self._started -= 1
+            raise
+
+    def release(self, worker: _StreamWorker, healthy: bool = True) -> None:
+        with self._lock:
+            if worker.generation != self._generation:
+                # Binary was rebuilt while this worker was busy
+                worker.close()
+                return
+            if healthy and worker.alive():
+                self._idle.put(worker)
+                return
+            self._started -= 1
+            self._restarts += 1
+        worker.close()
+
+    def run(self, exe: Path, requests: List[Dict[str, Any]], top_k: int | None = None) -> List[Dict[str, Any]]:
+        """Classify ``requests`` on one worker, retrying once if it crashes.
+
+        ``top_k`` sets the classes listed per head (the worker's default when None).
+        """
+        lines = [_stream_line(r) for r in requests]
+        # Workers are shared, so every chunk sets its own top-k first
+        command = [] if top_k is None else [f"TOPK {top_k}"]
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(lines), STREAM_CHUNK_SIZE):
+            chunk = lines[start:start + STREAM_CHUNK_SIZE]
+            for attempt in range(2):
+                worker = self.acquire(exe)
+                try:
+                    results.extend(worker.request(command + chunk)[len(command):])
+                except RuntimeError:
+                    self.release(worker, healthy=False)
+                    if attempt == 1:
+                        raise
+                    continue
+                self.release(worker)
+                break
+        return results
+
+    def health(self) -> Dict[str, Any]:
+        """Ping idle workers, drop dead ones and report pool statistics."""
+        checked: List[_StreamWorker] = []
+        dead = 0
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.ping():
+                checked.append(worker)
+            else:
+                dead += 1
+                self.release(worker, healthy=False)
+        for worker in checked:
+            self._idle.put(worker)
+        return {
+            "size": self.size,
+            "started": self._started,
+            "idle_healthy": len(checked),
+            "dead_removed": dead,
+            "restarts": self._restarts,
+            "executable": self._version[0] if self._version else None,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._drain()
+            self._version = None
+
+
+_pool = CWorkerPool()
+
+
+def get_worker_pool() -> CWorkerPool:
+    """Return the process-wide C classifier worker pool."""
+    return _pool
+
+
+class NativeClassifier:
+    """In-process access to the generated classifier built as a shared library.
+
+    Build it from the generated source with, for example::
+
+        gcc -O2 -shared -fPIC -DRFC_NO_MAIN -o libapi_classifier.so api_classifier.c
+
+    ``classify_batch`` runs without the GIL (ctypes releases it for the call),
+    so concurrent requests classify in parallel.
+
+    The library is loaded from a copy named by its content hash: the dynamic
+    loader returns the handle it already has for a path, so a rebuild
+    installed over ``path`` would otherwise keep running the old trees.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.mtime_ns = path.stat().st_mtime_ns
+        self.loaded_path = _loaded_copy(path)
+        self._lib = ctypes.CDLL(str(self.loaded_path))
+        abi = self._lib.rfc_abi_version()
+        if abi != C_ABI_VERSION:
+            raise RuntimeError(f"{path} implements ABI version {abi}, expected {C_ABI_VERSION}")
+        fn = self._lib.classify_batch
+        fn.argtypes = [
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.c_size_t,
+            ctypes.POINTER(ctypes.c_int32),
+            ctypes.POINTER(ctypes.c_int32),
+            ctypes.POINTER(ctypes.c_float),
+        ]
+        fn.restype = ctypes.c_int
+        self._classify_batch = fn
+        fn = self._lib.classify_votes
+        fn.argtypes = [
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.c_size_t,
+            ctypes.POINTER(ctypes.c_int32),
+            ctypes.POINTER(ctypes.c_int32),
+        ]
+        fn.restype = ctypes.c_int
+        self._classify_votes = fn
+        info = (ctypes.c_int32 * 4)()
+        self._lib.rfc_model_info(info)
+        self.n_service, self.n_activity, self.service_trees, self.activity_trees = list(info)
+
+    @staticmethod
+    def _encode(requests: List[Dict[str, Any]]) -> Any:
+        encoded: List[bytes | None] = []
+        for request in requests:
+            for name in FIELD_NAMES:
+                val = request.get(name)
+                if val is None or (isinstance(val, float) and math.isnan(val)):
+                    encoded.append(None)
+                else:
+                    encoded.append(str(val).encode("utf-8", errors="replace"))
+        return (ctypes.c_char_p * len(encoded))(*encoded)
+
+    def classify(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        n = len(requests)
+        if n == 0:
+            return []
+        fields = self._encode(requests)
+        service_out = (ctypes.c_int32 * n)()
+        activity_out = (ctypes.c_int32 * n)()
+        conf_out = (ctypes.c_float * (2 * n))()
+        rc = self._classify_batch(fields, n, service_out, activity_out, conf_out)
+        if rc != 0:
+            raise RuntimeError(f"classify_batch failed with code {rc}")
+        return [
+            {
+                "service_id": service_out[i],
+                "activity_id": activity_out[i],
+                "service_confidence": round(conf_out[2 * i], 4),
+                "activity_confidence": round(conf_out[2 * i + 1], 4),
+            }
+            for i in range(n)
+        ]
+
+    def votes(self, requests: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-class tree votes of ``requests``: (n, service classes) and (n, activity classes)."""
+        n = len(requests)
+        service_votes = np.zeros((n, self.n_service), dtype=np.int32)
+        activity_votes = np.zeros((n, self.n_activity), dtype=np.int32)
+        if n == 0:
+            return service_votes, activity_votes
+        int32_p = ctypes.POINTER(ctypes.c_int32)
+        rc = self._classify_votes(
+            self._encode(requests), n, service_votes.ctypes.data_as(int32_p), activity_votes.ctypes.data_as(int32_p)
+        )
+        if rc != 0:
+            raise RuntimeError(f"classify_votes failed with code {rc}")
+        return service_votes, activity_votes
+
+    def classify_ranked(self, requests: List[Dict[str, Any]], top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """The output of the ``--stream`` mode (ids, confidence, margin, top-k) computed from the votes."""
+        service_votes, activity_votes = self.votes(requests)
+        service = _rank_votes("service", service_votes, self.service_trees, top_k)
+        activity = _rank_votes("activity", activity_votes, self.activity_trees, top_k)
+        return [{**s, **a} for s, a in zip(service, activity)]
+
+
+def _loaded_copy(path: Path) -> Path:
+    """Copy ``path`` to ``loaded/<stem>-<hash><suffix>`` (once) and return the copy.
+
+    Older copies beyond ``LOADED_COPIES`` are removed; one that is still
+    mapped stays usable on POSIX and is skipped where it cannot be deleted.
+    """
+    data = path.read_bytes()
+    loaded_dir = path.parent / LOADED_DIR_NAME
+    copy = loaded_dir / f"{path.stem}-{hashlib.sha256(data).hexdigest()[:16]}{path.suffix}"
+    if copy.exists():
+        return copy
+    loaded_dir.mkdir(parents=True, exist_ok=True)
+    tmp = loaded_dir / f".{copy.name}.{os.getpid()}.tmp"
+    tmp.write_bytes(data)
+    shutil.copystat(path, tmp)
+    os.replace(tmp, copy)
+    copies = sorted(loaded_dir.glob(f"{path.stem}-*{path.suffix}"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for stale in (p for p in copies[LOADED_COPIES:] if p != copy):
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+    return copy
+
+
+def _rank_votes(head: str, votes: np.ndarray, n_trees: int, top_k: int) -> List[Dict[str, Any]]:
+    """C output members of one head for every row of a vote matrix.
+
+    Classes are ranked by votes, then by id, exactly like the generated code.
+    """
+    order = np.argsort(-votes, axis=1, kind="stable")
+    rows = np.arange(len(votes))
+    first = votes[rows, order[:, 0]]
+    second = votes[rows, order[:, 1]] if votes.shape[1] > 1 else np.zeros_like(first)
+    confidence = np.round(first / n_trees, 4)
+    margin = np.round((first - second) / n_trees, 4)
+    members = []
+    for i in range(len(votes)):
+        member = {
+            f"{head}_id": int(order[i, 0]),
+            f"{head}_confidence": float(confidence[i]),
+            f"{head}_margin": float(margin[i]),
+        }
+        if top_k > 0:
+            member[f"{head}_top_k"] = [[int(c), round(float(votes[i, c]) / n_trees, 4)] for c in order[i, :top_k]]
+        members.append(member)
+    return members
+
+
+_native: NativeClassifier | None = None
+_native_lock = threading.Lock()
+
+
+def get_native_classifier() -> NativeClassifier | None:
+    """Return the loaded shared library, reloading it after a rebuild.
+
+    Returns None when no shared library has been built.
+    """
+    global _native
+    if not LIBRARY_FILE.exists():
+        return None
+    mtime_ns = LIBRARY_FILE.stat().st_mtime_ns
+    with _native_lock:
+        if _native is None or _native.mtime_ns != mtime_ns:
+            _native = NativeClassifier(LIBRARY_FILE)
+        return _native
+
+
+def _decode(out: Dict[str, Any], top_k: int = 0, probabilities: bool = False) -> Dict[str, Any]:
+    """Map a raw C output to labels, in the result schema of ``predict_rfc_python``.
+
+    ``{head}_top_k`` is kept to ``top_k`` classes; ``{head}_probabilities``
+    (vote fractions) needs an output that lists every class.
     """
-    exe = _get_executable()
+    service_id = int(out.get("service_id", -1))
+    activity_id = int(out.get("activity_id", -1))
+
+    _load_label_maps()
+    service_label = _service_map.get(service_id) if _service_map else None
+    activity_label = _activity_map.get(activity_id) if _activity_map else None
+
+    result = {
+        "service_id": service_id,
+        "activity_id": activity_id,
+        "service": service_label,
+        "activity": activity_label,
+    }
+    for head, labels in (("service", _service_map or {}), ("activity", _activity_map or {})):
+        # Executables generated before confidence output only print the ids
+        if f"{head}_confidence" not in out:
+            continue
+        result[f"{head}_prediction"] = result[head]
+        result[f"{head}_confidence"] = out[f"{head}_confidence"]
+        if f"{head}_margin" in out:
+            result[f"{head}_margin"] = out[f"{head}_margin"]
+        ranked = out.get(f"{head}_top_k")
+        if ranked is None:
+            continue
+        if top_k > 0:
+            result[f"{head}_top_k"] = [
+                {"label": labels.get(int(c), str(c)), "probability": p} for c, p in ranked[:top_k]
+            ]
+        if probabilities:
+            result[f"{head}_probabilities"] = {labels.get(int(c), str(c)): p for c, p in ranked}
+    return result
+
+
+def _predict_cli(exe: Path, request_data: Dict[str, Any], logs: List[str] | None = None) -> Dict[str, Any]:
+    """Classify one request by starting the executable with 8 CLI arguments."""
     args_payload = _build_args_from_request(request_data)
     if len(args_payload) != 8:
         raise RuntimeError(f"Internal error: expected 8 args, got {len(args_payload)} – {args_payload}")
@@ -162,50 +627,107 @@ def predict_rfc_c(request_data: Dict[str, Any], logs: List[str] | None = None) -
 
     if parsed is None:
         raise ValueError(f"Could not parse classifier output: {stdout_lines[-1] if stdout_lines else '<empty>'}")
-    out = parsed
+    return parsed
 
-    service_id = int(out.get("service_id", -1))
-    activity_id = int(out.get("activity_id", -1))
 
-    _load_label_maps()
-    service_label = _service_map.get(service_id) if _service_map else None
-    activity_label = _activity_map.get(activity_id) if _activity_map else None
+def _run_classifier(
+    native: NativeClassifier | None,
+    exe: Path | None,
+    requests_data: List[Dict[str, Any]],
+    top_k: int,
+    logs: List[str] | None = None,
+) -> List[Dict[str, Any]]:
+    """Raw C outputs for ``requests_data``, listing ``top_k`` classes per head.
 
-    result = {
-        "service_id": service_id,
-        "activity_id": activity_id,
-        "service": service_label,
-        "activity": activity_label,
-    }
+    Uses the shared library when loaded, else a persistent ``--stream``
+    worker; executables generated before streaming support fall back to one
+    process per request.
+    """
+    if native is not None:
+        _status("Classifying with the shared library", logs)
+        return native.classify_ranked(requests_data, top_k)
+    assert exe is not None
+    try:
+        return get_worker_pool().run(exe, requests_data, top_k=top_k)
+    except RuntimeError as exc:
+        _status(f"Stream worker unavailable ({exc}); running the classifier once per request", logs)
+    # Per-call details only for single requests, batches would flood the log
+    call_logs = logs if len(requests_data) == 1 else None
+    return [_predict_cli(exe, request, call_logs) for request in requests_data]
+
+
+def _model_version(native: NativeClassifier | None, exe: Path | None) -> str:
+    """Identify the classifier build in use, for prediction cache invalidation."""
+    if native is not None:
+        version = f"{LIBRARY_FILE.name}:{native.mtime_ns}"
+    else:
+        version = f"{exe.name}:{exe.stat().st_mtime_ns}"
+    if LABEL_MAP_FILE.exists():
+        version += f"/{LABEL_MAP_FILE.stat().st_mtime_ns}"
+    return version
+
+
+def predict_rfc_c(
+    request_data: Dict[str, Any],
+    logs: List[str] | None = None,
+    top_k: int = DEFAULT_TOP_K,
+    probabilities: bool = False,
+) -> Dict[str, Any]:
+    """Run a single inference through the compiled C classifier.
+
+    The shared library is used in-process when it has been built. Otherwise
+    the request is sent to a persistent ``--stream`` worker; executables
+    generated before streaming support fall back to one process per request.
+
+    Args:
+        request_data: Dictionary containing request features
+        logs: Optional list to collect log messages
+        top_k: Number of classes with the most votes to return per head (0 for none)
+        probabilities: Also return the vote fraction of every class per head
+
+    Returns a dict containing the *raw* ids and, if mapping available, the
+    decoded labels, with confidence, margin and top-k as vote fractions.
+    """
+    native = get_native_classifier()
+    exe = None if native is not None else _get_executable()
+    version = _model_version(native, exe)
+    cache = get_prediction_cache("c")
+    variant = (top_k, probabilities)
+    cached = cache.get(request_data, version, variant)
+    if cached is not None:
+        _status("Prediction cache hit", logs)
+        return cached
+
+    listed = ALL_CLASSES if probabilities else top_k
+    out = _run_classifier(native, exe, [request_data], listed, logs)[0]
+    _status(f"C output: {json.dumps(out)}", logs)
+    result = _decode(out, top_k, probabilities)
+    cache.put(request_data, version, result, variant)
     return result
 
 
+def _classify_records(requests_data: List[Dict[str, Any]], logs: List[str] | None = None) -> List[Dict[str, Any]]:
+    """Raw C outputs (class ids only) for ``requests_data``, see ``_run_classifier``."""
+    count(logs, "requests", len(requests_data))
+    native = get_native_classifier()
+    exe = None if native is not None else _get_executable()
+    return _run_classifier(native, exe, requests_data, 0, logs)
+
+
 def batch_predict_rfc_c(requests_data: List[Dict[str, Any]], logs: List[str] | None = None) -> Tuple[List[Dict[str, Any]], float]:
-    """Run inference for a list of requests."""
-    results: List[Dict[str, Any]] = []
+    """Run inference for a list of requests in one native call or a persistent C worker."""
     total_requests = len(requests_data)
     start_time = time.perf_counter()
-    
-    for i, req in enumerate(requests_data, 1):
-        iter_start = time.perf_counter()
-        res = predict_rfc_c(req, logs)
-        results.append({**req, **res})
-        
-        iter_time = (time.perf_counter() - iter_start) * 1000  
-        
-        service = res.get('service', 'Unknown Service')
-        activity = res.get('activity', 'Unknown Activity')
-        
-        status_msg = (
-            f"Processing request {i}/{total_requests} "
-            f"[{iter_time:.2f} ms] "
-            f"Service: {service}, "
-            f"Activity: {activity}"
-        )
-        _status(status_msg, logs)
-    
+
+    outputs = _classify_records(requests_data, logs)
+    results = [{**req, **_decode(out)} for req, out in zip(requests_data, outputs)]
+
     total_time = time.perf_counter() - start_time
-    _status(f"Processed {total_requests} requests in {total_time:.2f} seconds", logs)
+    per_record_us = (total_time / total_requests * 1e6) if total_requests else 0.0
+    _status(
+        f"Processed {total_requests} requests in {total_time:.2f} seconds ({per_record_us:.1f} µs/request)",
+        logs,
+    )
     
     return results, round(total_time, 2)
 
@@ -222,3 +744,34 @@ def batch_predict_rfc_c_file(filename: str, logs: List[str] | None = None) -> Tu
     df = pd.read_csv(csv_path)
     requests = df.to_dict(orient="records")
     return batch_predict_rfc_c(requests, logs)
+
+
+def stream_predict_rfc_c_file(
+    filename: str,
+    fmt: str = "ndjson",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    logs: List[str] | None = None,
+) -> Tuple[Iterator[str], str]:
+    """Classify a test CSV chunk by chunk through the C classifier, yielding NDJSON lines or CSV text.
+
+    All chunks use the classifier build current when the stream starts.
+
+    Returns:
+        The output iterator and the version of the classifier used
+
+    Raises:
+        FileNotFoundError: If the file does not exist under the test directory
+    """
+    import pandas as pd
+
+    native = get_native_classifier()
+    exe = None if native is not None else _get_executable()
+
+    def classify_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+        records = chunk.to_dict(orient="records")
+        count(logs, "requests", len(records))
+        outputs = _run_classifier(native, exe, records, 0)
+        return pd.DataFrame([_decode(out) for out in outputs], index=chunk.index)
+
+    stream = stream_file_predictions(filename, classify_chunk, fmt=fmt, chunk_size=chunk_size, logs=logs)
+    return stream, _model_version(native, exe)
@@ -0,0 +1,170 @@
+"""Canonical form of the request fields, shared by training and every engine.
+
+Session tokens, hashes and ids in URLs add thousands of one-off vocabulary
+terms that only slow tokenisation down. Before the eight fields are joined
+and vectorised, each one is canonicalised:
+
+1. URL fields (``url``, ``requestHeaders_Referer``): the fragment is dropped
+   and every query parameter keeps its key but loses its value
+   (``/log?format=json&authuser=0`` -> ``/log?format=&authuser=``).
+2. The field is capped at ``MAX_FIELD_BYTES`` UTF-8 bytes.
+3. Every maximal run of ``[A-Za-z0-9-]`` is replaced as a whole by
+   ``HEX_TOKEN`` if it consists of hex digits and dashes only, has at least
+   ``HEX_MIN_DIGITS`` hex digits and at least one decimal digit (hashes,
+   UUIDs), or by ``B64_TOKEN`` if it is at least ``B64_MIN_LENGTH`` long and
+   mixes upper case, lower case and digits (base64 tokens).
+
+The result is idempotent: ``canonicalize_field(canonicalize_field(x)) ==
+canonicalize_field(x)``. ``C_SOURCE`` is the same algorithm in C; the
+classifier generated by ``codegen_manual`` runs it inside
+``extract_features`` so C and Python models see identical text.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+# The request features in the order they are joined
+FEATURE_FIELDS = (
+    "headers_Host",
+    "url",
+    "method",
+    "requestHeaders_Origin",
+    "requestHeaders_Content_Type",
+    "responseHeaders_Content_Type",
+    "requestHeaders_Referer",
+    "requestHeaders_Accept",
+)
+URL_FIELDS = ("url", "requestHeaders_Referer")
+MAX_FIELD_BYTES = 512
+HEX_MIN_DIGITS = 16
+B64_MIN_LENGTH = 24
+HEX_TOKEN = "hex"
+B64_TOKEN = "b64"
+
+# Shorter maximal runs can never be collapsed, so they are not even matched
+_RUN = re.compile(rf"(?<![A-Za-z0-9-])[A-Za-z0-9-]{{{min(HEX_MIN_DIGITS, B64_MIN_LENGTH)},}}(?![A-Za-z0-9-])")
+_HEX_CHARS = frozenset("0123456789abcdefABCDEF")
+
+
+def _collapse(match: re.Match) -> str:
+    run = match.group(0)
+    digits = any(c.isdigit() for c in run)
+    if digits and all(c in _HEX_CHARS or c == "-" for c in run):
+        if sum(c in _HEX_CHARS for c in run) >= HEX_MIN_DIGITS:
+            return HEX_TOKEN
+    if (
+        digits
+        and len(run) >= B64_MIN_LENGTH
+        and any("A" <= c <= "Z" for c in run)
+        and any("a" <= c <= "z" for c in run)
+    ):
+        return B64_TOKEN
+    return run
+
+
+def drop_query_values(url: str) -> str:
+    """Drop the fragment and the value of every query parameter of ``url``."""
+    url = url.split("#", 1)[0]
+    base, sep, query = url.partition("?")
+    if not sep:
+        return url
+    params = (p.split("=", 1)[0] + ("=" if "=" in p else "") for p in query.split("&"))
+    return base + "?" + "&".join(params)
+
+
+def canonicalize_field(value: str, field: str) -> str:
+    """Canonical form of one request field (see the module docstring)."""
+    if field in URL_FIELDS:
+        value = drop_query_values(value)
+    if len(value) > MAX_FIELD_BYTES // 4:
+        # Cheap length check first; only long values can exceed the byte cap
+        value = value.encode("utf-8")[:MAX_FIELD_BYTES].decode("utf-8", "ignore")
+    return _RUN.sub(_collapse, value)
+
+
+def canonicalize_request(request: Dict[str, Any], fields: Iterable[str]) -> Dict[str, str]:
+    """Canonical ``fields`` of a request dict; missing values become ""."""
+    return {
+        field: canonicalize_field("" if request.get(field) is None else str(request.get(field)), field)
+        for field in fields
+    }
+
+
+def canonicalize_frame(frame: pd.DataFrame, fields: Iterable[str]) -> pd.DataFrame:
+    """Canonical string columns ``fields`` of ``frame``; NaN becomes "".
+
+    Each distinct value is canonicalised once, which is what makes this cheap
+    on real traffic.
+    """
+    out = {}
+    for field in fields:
+        column = frame[field].fillna("").astype(str) if field in frame else pd.Series("", index=frame.index)
+        codes, uniques = pd.factorize(column, sort=False)
+        canonical = np.array([canonicalize_field(value, field) for value in uniques], dtype=object)
+        out[field] = pd.Series(canonical[codes], index=frame.index, dtype=object)
+    return pd.DataFrame(out, index=frame.index)
+
+
+# Same algorithm for the generated classifier; ``out`` needs MAX_FIELD_BYTES + 1 bytes.
+C_SOURCE = f"""\
+#define CANON_MAX_FIELD {MAX_FIELD_BYTES}
+#define CANON_HEX_MIN_DIGITS {HEX_MIN_DIGITS}
+#define CANON_B64_MIN_LENGTH {B64_MIN_LENGTH}
+
+static inline int canon_run_char(unsigned char c) {{
+    return isalnum(c) || c == '-';
+}}
+
+// Canonical form of one field (see canonical.py); returns its length
+static int canonicalize_field(const char* in, int is_url, char* out) {{
+    char capped[CANON_MAX_FIELD + 1];
+    int n = 0, in_query = 0, in_value = 0;
+    for (const char* p = in; *p && n < CANON_MAX_FIELD; p++) {{
+        char c = *p;
+        if (is_url) {{
+            if (c == '#') break;
+            if (in_query) {{
+                if (c == '&') in_value = 0;
+                else if (in_value) continue;
+                else if (c == '=') in_value = 1;
+            }} else if (c == '?') {{
+                in_query = 1;
+            }}
+        }}
+        capped[n++] = c;
+    }}
+    capped[n] = '\\0';
+
+    int len = 0;
+    for (int i = 0; i < n;) {{
+        if (!canon_run_char((unsigned char)capped[i])) {{
+            out[len++] = capped[i++];
+            continue;
+        }}
+        int start = i, hex_digits = 0, digits = 0, upper = 0, lower = 0, only_hex = 1;
+        for (; i < n && canon_run_char((unsigned char)capped[i]); i++) {{
+            unsigned char c = (unsigned char)capped[i];
+            if (isxdigit(c)) hex_digits++;
+            else if (c != '-') only_hex = 0;
+            if (isdigit(c)) digits++;
+            else if (isupper(c)) upper = 1;
+            else if (islower(c)) lower = 1;
+        }}
+        const char* replacement = NULL;
+        if (digits && only_hex && hex_digits >= CANON_HEX_MIN_DIGITS) replacement = "{HEX_TOKEN}";
+        else if (digits && upper && lower && i - start >= CANON_B64_MIN_LENGTH) replacement = "{B64_TOKEN}";
+        if (replacement) {{
+            for (const char* r = replacement; *r; r++) out[len++] = *r;
+        }} else {{
+            memcpy(out + len, capped + start, (size_t)(i - start));
+            len += i - start;
+        }}
+    }}
+    out[len] = '\\0';
+    return len;
+}}
+"""
@@ -11,13 +11,10 @@ except ImportError:
     convert = None 
 
 from ..path_config import DATA_DIR
+from ..log_sink import emit as _status
+from .model_registry import LEGACY_MODEL_FILES, MODEL_ARTIFACT
 
 
-def _status(msg: str, sink: List[str] | None):
-    if sink is not None:
-        sink.append(msg)
-    print(msg, flush=True)
-
 
 def train_rfc_c_emlearn(model_dir: str | Path | None = None, logs: List[str] | None = None) -> Dict[str, Any]:
     """Convert trained RandomForest to C using emlearn (if installed)."""
@@ -31,8 +28,16 @@ def train_rfc_c_emlearn(model_dir: str | Path | None = None, logs: List[str] | N
     for d in (out_dir, include_dir, models_dir):
         d.mkdir(parents=True, exist_ok=True)
 
-    svc_model = joblib.load(model_dir / "service_classifier.joblib")
-    svc_le = joblib.load(model_dir / "service_encoder.joblib")
+    artifact_path = model_dir / MODEL_ARTIFACT
+    if artifact_path.exists():
+        artifact = joblib.load(artifact_path)
+        if artifact.get("joint_model") is not None:
+            raise ValueError("emlearn converts single-output forests only; retrain the Python models with joint=false")
+        svc_model = artifact["service_model"]
+        svc_le = artifact["service_encoder"]
+    else:
+        svc_model = joblib.load(model_dir / LEGACY_MODEL_FILES["service_model"])
+        svc_le = joblib.load(model_dir / LEGACY_MODEL_FILES["service_encoder"])
 
     _status("Converting service classifier via emlearn", logs)
     portable_model = convert(svc_model)  
@@ -3,12 +3,21 @@ from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.pipeline import make_pipeline
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
 import numpy as np
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 
+from ..log_sink import emit
+from .canonical import C_SOURCE as CANONICAL_C_SOURCE
+from .constants import C_ABI_VERSION, DEFAULT_TOP_K
+from .dataset_cache import COMBINED, encode_labels, load_dataset
+from .parallel_fit import fit_forests as fit_in_parallel
+from .training_defaults import load_training_defaults, make_vectorizer
+from .forest_pruning import CostModel, ForestPruner, pareto_front, select as select_sub_forest
+from .perfect_hash import FNV64_OFFSET, FNV64_PRIME, GOLDEN64, build_perfect_hash
+
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
 DATA_DIR = PROJECT_ROOT / "backend" / "data"
@@ -35,23 +44,105 @@ PATHS = {
     
 }
 
+FOREST_LAYOUTS = ("nested", "table", "compact")
+VOCAB_LOOKUPS = ("perfect", "bucket")
+# Feature id of a leaf in the compact layout
+COMPACT_LEAF = 0xFFFF
+
+C_HEADER = """\
+#ifndef API_CLASSIFIER_H
+#define API_CLASSIFIER_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+/* Version of the interface below; compare against RFC_ABI_VERSION. */
+int rfc_abi_version(void);
+
+/*
+ * Classify n_records requests in one call.
+ *
+ * fields       n_records * 8 NUL-terminated UTF-8 strings, row-major, in the
+ *              order host, url, method, origin, request content type,
+ *              response content type, referer, accept. NULL means empty.
+ * service_out  n_records service class ids
+ * activity_out n_records activity class ids
+ * conf_out     optional (may be NULL) 2 * n_records vote fractions,
+ *              service then activity for each record
+ *
+ * Returns 0 on success, -1 on invalid arguments. The function is reentrant.
+ */
+int classify_batch(const char* const* fields, size_t n_records,
+                   int32_t* service_out, int32_t* activity_out, float* conf_out);
+
+/*
+ * Class and tree counts of the model: info[0] service classes, info[1]
+ * activity classes, info[2] service trees, info[3] activity trees.
+ * Returns 0.
+ */
+int rfc_model_info(int32_t info[4]);
+
+/*
+ * Per-class tree votes of n_records requests (same fields as classify_batch).
+ * A vote divided by the head's tree count is that class's vote fraction.
+ *
+ * service_votes  n_records * info[0] counts, row-major
+ * activity_votes n_records * info[1] counts, row-major
+ *
+ * Returns 0 on success, -1 on invalid arguments. The function is reentrant.
+ */
+int classify_votes(const char* const* fields, size_t n_records,
+                   int32_t* service_votes, int32_t* activity_votes);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif /* API_CLASSIFIER_H */
+"""
+
 def print_status(message: str):
-    """Print status message with immediate flush"""
-    print(message, flush=True)
+    """Log a status message to the console"""
+    emit(message)
 
 
-def tree_to_c_code(trees, feature_names, label_encoders, vectorizer, test_data, file=None):
+def tree_to_c_code(
+    trees,
+    feature_names,
+    label_encoders,
+    vectorizer,
+    test_data,
+    file=None,
+    forest_layout="nested",
+    vocab_lookup="perfect",
+):
     """
     Generates C code for multiple decision trees from scikit-learn RandomForestClassifiers.
     
     Args:
-        trees: Dictionary containing service and activity trees
+        trees: Dictionary containing the service and activity forests, or a
+            single multi-output (service, activity) forest under "joint"
         feature_names: List of feature names from TF-IDF
         label_encoders: Dictionary containing service and activity LabelEncoders
         vectorizer: TfidfVectorizer instance
         test_data: DataFrame containing test data
         file: File object to write the code to
+        forest_layout: "nested" emits one if/else function per tree, "table"
+            emits static node tables walked by a single iterative loop,
+            "compact" packs every node into 4 bytes (see generate_compact_forest)
+        vocab_lookup: "perfect" emits a minimal perfect hash over the
+            vocabulary (one key comparison per token), "bucket" the chained
+            FNV-1a bucket table
     """
+    if forest_layout not in FOREST_LAYOUTS:
+        raise ValueError(f"Unknown forest layout {forest_layout!r}; choose one of {FOREST_LAYOUTS}")
+    if vocab_lookup not in VOCAB_LOOKUPS:
+        raise ValueError(f"Unknown vocabulary lookup {vocab_lookup!r}; choose one of {VOCAB_LOOKUPS}")
+
     def write_line(line, indent=0):
         indent_str = "    " * indent
         if file:
@@ -59,35 +150,189 @@ def tree_to_c_code(trees, feature_names, label_encoders, vectorizer, test_data,
         else:
             print(f"{indent_str}{line}")
 
-    def generate_tree_function(tree, function_name, label_encoder, depth=1):
+    def check_binary_split(threshold):
+        # Features are presence bits, so every split must separate 0 from 1
+        if not 0.0 <= threshold < 1.0:
+            raise ValueError(f"Split threshold {threshold} is not a binary feature test; train on binary features")
+
+    joint = "joint" in trees
+    heads = ("joint",) if joint else ("service", "activity")
+    # Joint leaves pack both class ids; compact leaves have 16 bits for both
+    leaf_shift = 8 if forest_layout == "compact" else 16
+    leaf_mask = (1 << leaf_shift) - 1
+
+    def leaf_value(forest, tree, node, head):
+        """Return the C leaf value and its labels: a class id, or both ids packed for a joint forest."""
+        if joint:
+            ids = [
+                int(classes[np.argmax(tree.value[node][output][:len(classes)])])
+                for output, classes in enumerate(forest.classes_)
+            ]
+            labels = [label_encoders[h].inverse_transform([i])[0] for h, i in zip(("service", "activity"), ids)]
+            return (ids[0] << leaf_shift) | ids[1], " / ".join(labels)
+        class_id = int(forest.classes_[np.argmax(tree.value[node])])
+        return class_id, label_encoders[head].inverse_transform([class_id])[0]
+
+    def generate_tree_function(forest, tree, function_name, head, depth=1):
         def recurse(node, depth):
             if tree.feature[node] != -2:  # Not a leaf node
                 feature_idx = tree.feature[node]
-                threshold = tree.threshold[node]
-                write_line(f"if (features[{feature_idx}] <= {threshold:.6f}) {{", depth)
+                check_binary_split(tree.threshold[node])
+                write_line(f"if (!FEATURE_TEST(features, {feature_idx})) {{", depth)
                 recurse(tree.children_left[node], depth + 1)
                 write_line("} else {", depth)
                 recurse(tree.children_right[node], depth + 1)
                 write_line("}", depth)
             else:  # Leaf node
-                class_id = np.argmax(tree.value[node])
-                write_line(f"return {class_id};  // {label_encoder.inverse_transform([class_id])[0]}", depth)
+                value, label = leaf_value(forest, tree, node, head)
+                write_line(f"return {value};  // {label}", depth)
 
-        write_line(f"int {function_name}(float features[]) {{")
+        write_line(f"int {function_name}(const uint64_t features[]) {{")
         recurse(0, 1)
         write_line("}")
         write_line("")
 
+    def generate_perfect_hash_lookup(vocabulary):
+        """Emit a minimal perfect hash: one hash, one displacement, one strcmp per lookup."""
+        ph = build_perfect_hash(list(vocabulary))
+        disp_type = "uint32_t" if max(ph.displacements) <= 0xFFFFFFFF else "uint64_t"
+        print_status(
+            f"Perfect hash: {len(vocabulary)} terms in {ph.size} slots, "
+            f"{ph.n_buckets} {disp_type} displacements, every term verified"
+        )
+
+        write_line("// Feature table in perfect-hash slot order; empty slots never match a token")
+        write_line("static const FeatureEntry FEATURE_TABLE[] = {")
+        for term in ph.slots:
+            write_line(f'    {{ "{term}", {vocabulary[term] if term else -1} }},', 1)
+        write_line("};")
+        write_line("")
+        write_line(f"#define NUM_FEATURES {len(vocabulary)}")
+        write_line(f"#define TABLE_SLOTS {ph.size}")
+        write_line(f"#define PH_BUCKETS {ph.n_buckets}")
+        write_line("")
+        write_line("// Per-bucket displacement d, placing a key at (f1 + (d / TABLE_SLOTS) * f2 + d % TABLE_SLOTS)")
+        write_line(f"static const {disp_type} PH_DISP[PH_BUCKETS] = {{")
+        for start in range(0, ph.n_buckets, 16):
+            write_line(", ".join(str(d) for d in ph.displacements[start:start + 16]) + ",", 1)
+        write_line("};")
+        write_line("")
+        write_line("// 64-bit FNV-1a hash function")
+        write_line("static inline uint64_t hash_string(const char* str) {")
+        write_line(f"    uint64_t hash = {FNV64_OFFSET:#x}ULL;", 1)
+        write_line("    while (*str) {", 1)
+        write_line("        hash ^= (unsigned char)*str;", 2)
+        write_line(f"        hash *= {FNV64_PRIME:#x}ULL;", 2)
+        write_line("        str++;", 2)
+        write_line("    }", 1)
+        write_line("    return hash;", 1)
+        write_line("}")
+        write_line("")
+        write_line("// Find feature index")
+        write_line("static inline int find_feature(const char* term) {")
+        write_line("    uint64_t hash = hash_string(term);", 1)
+        write_line("    uint64_t bucket = (uint32_t)(hash >> 32) % PH_BUCKETS;", 1)
+        write_line("    uint64_t f1 = (uint32_t)hash % TABLE_SLOTS;", 1)
+        write_line(f"    uint64_t f2 = (uint32_t)((hash * {GOLDEN64:#x}ULL) >> 32) % TABLE_SLOTS;", 1)
+        write_line("    uint64_t d = PH_DISP[bucket];", 1)
+        write_line("    const FeatureEntry* entry = &FEATURE_TABLE[(f1 + (d / TABLE_SLOTS) * f2 + d % TABLE_SLOTS) % TABLE_SLOTS];", 1)
+        write_line("    return strcmp(entry->term, term) == 0 ? entry->feature_index : -1;", 1)
+        write_line("}")
+        write_line("")
+
+    def generate_bucket_lookup(vocabulary):
+        """Emit the chained FNV-1a bucket table, sized to the fullest bucket."""
+        write_line("// Static feature table")
+        write_line("static const FeatureEntry FEATURE_TABLE[] = {")
+        for term, idx in vocabulary.items():
+            write_line(f'    {{ "{term}", {idx} }},', 1)
+        write_line("};")
+        write_line("")
+
+        # Pre-compute hash buckets
+        buckets = [[] for _ in range(8192)]
+        for i, term in enumerate(vocabulary):
+            hash_val = 2166136261
+            for c in term.encode():
+                hash_val ^= c
+                hash_val *= 16777619
+                hash_val &= 0xFFFFFFFF
+            buckets[hash_val % 8192].append(i)
+        bucket_slots = max(1, max(len(bucket) for bucket in buckets))
+
+        write_line(f"#define NUM_FEATURES {len(vocabulary)}")
+        write_line("#define TABLE_SLOTS NUM_FEATURES")
+        write_line("// Hash table size (power of 2 for efficient modulo)")
+        write_line("#define HASH_TABLE_SIZE 8192")
+        write_line(f"#define HASH_BUCKET_SLOTS {bucket_slots}  // Fullest bucket of this vocabulary")
+        write_line("")
+
+        write_line("// FNV-1a hash function")
+        write_line("static inline unsigned int hash_string(const char* str) {")
+        write_line("    unsigned int hash = 2166136261u;", 1)
+        write_line("    while (*str) {", 1)
+        write_line("        hash ^= (unsigned char)*str;", 2)
+        write_line("        hash *= 16777619;", 2)
+        write_line("        str++;", 2)
+        write_line("    }", 1)
+        write_line("    return hash % HASH_TABLE_SIZE;", 1)
+        write_line("}")
+        write_line("")
+
+        write_line("// Static hash table buckets")
+        write_line("typedef struct {")
+        write_line("    int indices[HASH_BUCKET_SLOTS];", 1)
+        write_line("    int count;", 1)
+        write_line("} HashBucket;")
+        write_line("")
+
+        write_line("static const HashBucket HASH_BUCKETS[HASH_TABLE_SIZE] = {")
+        for bucket in buckets:
+            indices = bucket + [-1] * (bucket_slots - len(bucket))
+            write_line(f"    {{ {{ {', '.join(map(str, indices))} }}, {len(bucket)} }},", 1)
+        write_line("};")
+        write_line("")
+
+        write_line("// Find feature index")
+        write_line("static inline int find_feature(const char* term) {")
+        write_line("    unsigned int hash = hash_string(term);", 1)
+        write_line("    const HashBucket* bucket = &HASH_BUCKETS[hash];", 1)
+        write_line("    for (int i = 0; i < bucket->count; i++) {", 1)
+        write_line("        int idx = bucket->indices[i];", 2)
+        write_line("        if (strcmp(FEATURE_TABLE[idx].term, term) == 0) {", 2)
+        write_line("            return FEATURE_TABLE[idx].feature_index;", 3)
+        write_line("        }", 2)
+        write_line("    }", 1)
+        write_line("    return -1;  // Term not found", 1)
+        write_line("}")
+        write_line("")
+
     write_line("#include <stdio.h>")
+    write_line("#include <stdlib.h>")
     write_line("#include <string.h>")
     write_line("#include <ctype.h>")  
+    write_line("#include <stddef.h>")
+    write_line("#include <stdint.h>")
+    write_line("#include <time.h>")
+    write_line("#include <limits.h>")
+    write_line("")
+    write_line("// Exported symbols when built as a shared library (-shared -DRFC_NO_MAIN)")
+    write_line("#if defined(_WIN32)")
+    write_line("#define RFC_API __declspec(dllexport)")
+    write_line("#else")
+    write_line("#define RFC_API __attribute__((visibility(\"default\")))")
+    write_line("#endif")
+    write_line(f"#define RFC_ABI_VERSION {C_ABI_VERSION}")
     write_line("")
 
-    # Add hash table implementation
-    write_line("// Hash table size (power of 2 for efficient modulo)")
-    write_line("#define HASH_TABLE_SIZE 8192")
+    # Binary feature bitset
     write_line(f"#define MAX_FEATURES {len(feature_names)}")
     write_line("")
+    write_line("// Features are binary, so a record is a bitset of present vocabulary terms")
+    write_line("#define FEATURE_WORDS ((MAX_FEATURES + 63) / 64)")
+    write_line("#define FEATURE_SET(f, i) ((f)[(i) >> 6] |= (uint64_t)1 << ((i) & 63))")
+    write_line("#define FEATURE_TEST(f, i) (((f)[(i) >> 6] >> ((i) & 63)) & 1)")
+    write_line("")
 
     # Static feature entry structure
     write_line("// Feature entry structure")
@@ -97,80 +342,41 @@ def tree_to_c_code(trees, feature_names, label_encoders, vectorizer, test_data,
     write_line("} FeatureEntry;")
     write_line("")
 
-    # Create static feature table
-    write_line("// Static feature table")
-    write_line("static const FeatureEntry FEATURE_TABLE[] = {")
     vocabulary = vectorizer.vocabulary_
-    for term, idx in vocabulary.items():
-        write_line(f'    {{ "{term}", {idx} }},', 1)
-    write_line("};")
-    write_line("")
-
-    write_line(f"#define NUM_FEATURES {len(vocabulary)}")
-    write_line("")
+    if vocab_lookup == "perfect":
+        generate_perfect_hash_lookup(vocabulary)
+    else:
+        generate_bucket_lookup(vocabulary)
 
-    write_line("// FNV-1a hash function")
-    write_line("static inline unsigned int hash_string(const char* str) {")
-    write_line("    unsigned int hash = 2166136261u;", 1)
-    write_line("    while (*str) {", 1)
-    write_line("        hash ^= (unsigned char)*str;", 2)
-    write_line("        hash *= 16777619;", 2)
-    write_line("        str++;", 2)
+    # Tokenizer shared by feature extraction and the lookup benchmark
+    write_line("// Next alphanumeric token of *cursor, lower-cased into buf; returns its length (0 at end)")
+    write_line("static inline int next_token(const char** cursor, char* buf, int cap) {")
+    write_line("    const char* p = *cursor;", 1)
+    write_line("    while (*p && !isalnum((unsigned char)*p)) p++;", 1)
+    write_line("    int len = 0;", 1)
+    write_line("    while (*p && isalnum((unsigned char)*p) && len < cap - 1) {", 1)
+    write_line("        buf[len++] = (char)tolower((unsigned char)*p);", 2)
+    write_line("        p++;", 2)
     write_line("    }", 1)
-    write_line("    return hash % HASH_TABLE_SIZE;", 1)
+    write_line("    buf[len] = '\\0';", 1)
+    write_line("    *cursor = p;", 1)
+    write_line("    return len;", 1)
     write_line("}")
     write_line("")
 
-    write_line("// Static hash table buckets")
-    write_line("typedef struct {")
-    write_line("    int indices[10];  // Allow up to 10 entries per bucket", 1)
-    write_line("    int count;", 1)
-    write_line("} HashBucket;")
-    write_line("")
-
-    write_line("static const HashBucket HASH_BUCKETS[HASH_TABLE_SIZE] = {")
-    
-    # Pre-compute hash buckets
-    buckets = [[] for _ in range(8192)]
-    for i, (term, _) in enumerate(vocabulary.items()):
-        hash_val = 2166136261
-        for c in term.encode():
-            hash_val ^= c
-            hash_val *= 16777619
-            hash_val &= 0xFFFFFFFF
-        hash_val %= 8192
-        buckets[hash_val].append(i)
-
-    for bucket in buckets:
-        indices = bucket + [-1] * (10 - len(bucket)) 
-        write_line(f"    {{ {{ {', '.join(map(str, indices))} }}, {len(bucket)} }},", 1)
-    write_line("};")
-    write_line("")
-
-    write_line("// Find feature index")
-    write_line("static inline int find_feature(const char* term) {")
-    write_line("    unsigned int hash = hash_string(term);", 1)
-    write_line("    const HashBucket* bucket = &HASH_BUCKETS[hash];", 1)
-    write_line("    for (int i = 0; i < bucket->count; i++) {", 1)
-    write_line("        int idx = bucket->indices[i];", 2)
-    write_line("        if (strcmp(FEATURE_TABLE[idx].term, term) == 0) {", 2)
-    write_line("            return FEATURE_TABLE[idx].feature_index;", 3)
-    write_line("        }", 2)
-    write_line("    }", 1)
-    write_line("    return -1;  // Term not found", 1)
-    write_line("}")
+    # Field canonicalisation, identical to canonical.py
+    for line in CANONICAL_C_SOURCE.splitlines():
+        write_line(line)
     write_line("")
 
-    write_line("void extract_features(const char* headers_host, const char* url, const char* method,")
+    write_line("// Fill the feature bitset; returns the number of tokens looked up")
+    write_line("int extract_features(const char* headers_host, const char* url, const char* method,")
     write_line("                     const char* headers_origin, const char* content_type,")
     write_line("                     const char* response_content_type, const char* referer,")
-    write_line("                     const char* accept, float features[]) {")
+    write_line("                     const char* accept, uint64_t features[]) {")
     
-    # Initialize features to 0
-    write_line("    // Initialize all features to 0", 1)
-    write_line(f"    for(int i = 0; i < {len(feature_names)}; i++) {{", 1)
-    write_line("        features[i] = 0.0f;", 2)
-    write_line("    }", 1)
+    # Clear the bitset (MAX_FEATURES / 8 bytes)
+    write_line("    memset(features, 0, FEATURE_WORDS * sizeof(uint64_t));", 1)
     write_line("", 1)
 
     # Process input fields
@@ -188,75 +394,269 @@ def tree_to_c_code(trees, feature_names, label_encoders, vectorizer, test_data,
     write_line("", 1)
 
     write_line("    char token_buffer[1024]; // Buffer for current token", 1)
-    write_line("    int token_len;", 1)
+    write_line("    char canonical[CANON_MAX_FIELD + 1];", 1)
+    write_line("    int token_len, tokens = 0;", 1)
     write_line("", 1)
     
     write_line("    // Process each input field, mimicking CountVectorizer tokenization", 1)
     write_line("    for (int i = 0; i < 8; i++) {", 1)
-    write_line("        const char* p = inputs[i];", 2)
-    write_line("        while (*p) {", 2)
-    write_line("            // Skip non-alphanumeric characters", 3)
-    write_line("            while (*p && !isalnum((unsigned char)*p)) {", 3)
-    write_line("                p++;", 4)
-    write_line("            }", 3)
-    write_line("            if (!*p) break; // End of string", 3)
-    write_line("", 3)
-    write_line("            // Mark start of token and find its end", 3)
-    write_line("            const char* token_start = p;", 3)
-    write_line("            token_len = 0;", 3)
-    write_line("            while (*p && isalnum((unsigned char)*p) && token_len < sizeof(token_buffer) - 1) {", 3)
-    write_line("                token_buffer[token_len++] = tolower((unsigned char)*p);", 4)
-    write_line("                p++;", 4)
-    write_line("            }", 3)
-    write_line("            token_buffer[token_len] = '\\0'; // Null-terminate the token", 3)
-    write_line("", 3)
+    write_line("        canonicalize_field(inputs[i], i == 1 || i == 6, canonical); // url, referer", 2)
+    write_line("        const char* p = canonical;", 2)
+    write_line("        while ((token_len = next_token(&p, token_buffer, sizeof(token_buffer))) > 0) {", 2)
     write_line("            // Process token if length >= 2 (like \\w\\w+)", 3)
     write_line("            if (token_len >= 2) {", 3)
     write_line("                int feature_idx = find_feature(token_buffer);", 4)
     write_line("                if (feature_idx >= 0) {", 4)
-    write_line("                    features[feature_idx] = 1.0f;", 5)
+    write_line("                    FEATURE_SET(features, feature_idx);", 5)
     write_line("                }", 4)
+    write_line("                tokens++;", 4)
     write_line("            }", 3)
     write_line("        }", 2)
     write_line("    }", 1)
+    write_line("    return tokens;", 1)
     write_line("}")
     write_line("")
+    def generate_forest_table(forest, head):
+        """Write all trees of ``forest`` as one static node table plus root offsets."""
+        prefix = head.upper()
+        roots = []
+        write_line(f"static const TreeNode {prefix}_NODES[] = {{")
+        offset = 0
+        for tree_idx, estimator in enumerate(forest.estimators_):
+            tree = estimator.tree_
+            roots.append(offset)
+            write_line(f"// tree {tree_idx}", 1)
+            for node in range(tree.node_count):
+                if tree.feature[node] != -2:
+                    check_binary_split(tree.threshold[node])
+                    write_line(
+                        f"{{ {tree.feature[node]}, "
+                        f"{offset + tree.children_left[node]}, {offset + tree.children_right[node]}, -1 }},",
+                        1,
+                    )
+                else:
+                    value, _ = leaf_value(forest, tree, node, head)
+                    write_line(f"{{ -1, -1, -1, {value} }},", 1)
+            offset += tree.node_count
+        write_line("};")
+        write_line(f"static const int32_t {prefix}_ROOTS[{len(roots)}] = {{ {', '.join(map(str, roots))} }};")
+        write_line("")
+
+    def generate_compact_forest(forest, head):
+        """Write all trees of ``forest`` as packed 4-byte nodes in depth-first order.
+
+        The left child of an internal node is always the next node, so only the
+        right child's offset within the tree is stored. Trees are contiguous
+        and in pre-order, so the common path walks forward through memory.
+        """
+        prefix = head.upper()
+        max_class = leaf_mask if joint else 0xFF
+        nodes, roots = [], []
+
+        for tree_idx, estimator in enumerate(forest.estimators_):
+            tree = estimator.tree_
+            if tree.node_count > 0xFFFF:
+                raise ValueError(f"{head} tree {tree_idx} has {tree.node_count} nodes; the compact layout allows 65535")
+            start = len(nodes)
+            roots.append(start)
+            stack = [(0, None)]  # (sklearn node, index of the parent whose right child it is)
+            while stack:
+                node, parent = stack.pop()
+                index = len(nodes) - start
+                if parent is not None:
+                    nodes[start + parent] = (nodes[start + parent][0], index)
+                if tree.feature[node] != -2:
+                    check_binary_split(tree.threshold[node])
+                    nodes.append((int(tree.feature[node]), 0))
+                    # Right is popped after the whole left subtree has been written
+                    stack.append((tree.children_right[node], index))
+                    stack.append((tree.children_left[node], None))
+                else:
+                    value, label = leaf_value(forest, tree, node, head)
+                    ids = (value >> leaf_shift, value & leaf_mask) if joint else (value,)
+                    if max(ids) > max_class:
+                        raise ValueError(f"Class id {max(ids)} of {head} does not fit a compact leaf; use the table layout")
+                    nodes.append((COMPACT_LEAF, value))
+
+        write_line(f"static const CompactNode {prefix}_NODES[{len(nodes)}] = {{")
+        for first in range(0, len(nodes), 8):
+            write_line(" ".join(f"{{{f},{r}}}," for f, r in nodes[first:first + 8]), 1)
+        write_line("};")
+        write_line(f"static const uint32_t {prefix}_ROOTS[{len(roots)}] = {{ {', '.join(map(str, roots))} }};")
+        write_line("")
+        print_status(
+            f"Compact {head} forest: {len(nodes)} nodes in {len(nodes) * 4 / 1024:.1f} KiB "
+            f"(table layout: {len(nodes) * 16 / 1024:.1f} KiB, {1 - 4 / 16:.0%} smaller)"
+        )
 
     # Generate tree functions
-    for tree_idx, tree in enumerate(trees['service'].estimators_):
-        generate_tree_function(tree.tree_, f"service_tree_{tree_idx}", label_encoders['service'])
-    
-    for tree_idx, tree in enumerate(trees['activity'].estimators_):
-        generate_tree_function(tree.tree_, f"activity_tree_{tree_idx}", label_encoders['activity'])
-
-    # Generate prediction functions that combine tree predictions
-    write_line("int predict_service(float features[]) {")
-    write_line(f"    int votes[{len(label_encoders['service'].classes_)}] = {{0}};  // Array size matches number of service classes", 1)
-    for i in range(len(trees['service'].estimators_)):
-        write_line(f"    votes[service_tree_{i}(features)]++;", 1)
-    write_line("    int max_votes = 0, predicted_class = 0;", 1)
-    write_line(f"    for(int i = 0; i < {len(label_encoders['service'].classes_)}; i++) {{", 1)
-    write_line("        if(votes[i] > max_votes) {", 2)
-    write_line("            max_votes = votes[i];", 3)
-    write_line("            predicted_class = i;", 3)
+    if forest_layout == "compact":
+        if len(feature_names) >= COMPACT_LEAF:
+            raise ValueError(f"{len(feature_names)} features do not fit uint16 ids; use the table layout")
+        write_line("// Compact node, 4 bytes. Internal: feature id and the offset of the right child")
+        write_line("// within its tree; the left child (feature absent) is the next node.")
+        write_line(f"// Leaf: feature == COMPACT_LEAF, right holds the class id{' (service << 8 | activity)' if joint else ''}.")
+        write_line("typedef struct {")
+        write_line("    uint16_t feature;", 1)
+        write_line("    uint16_t right;", 1)
+        write_line("} CompactNode;")
+        write_line(f"#define COMPACT_LEAF {COMPACT_LEAF:#x}")
+        write_line("")
+        write_line("static inline int walk_compact(const CompactNode* tree, const uint64_t features[]) {")
+        write_line("    uint32_t node = 0;", 1)
+        write_line("    while (tree[node].feature != COMPACT_LEAF) {", 1)
+        write_line("        node = FEATURE_TEST(features, tree[node].feature) ? tree[node].right : node + 1;", 2)
+        write_line("    }", 1)
+        write_line("    return tree[node].right;", 1)
+        write_line("}")
+        write_line("")
+        for head in heads:
+            generate_compact_forest(trees[head], head)
+    elif forest_layout == "table":
+        write_line("// Flattened decision tree node; feature < 0 marks a leaf.")
+        write_line("// Splits test feature presence: absent goes left, present goes right.")
+        write_line("typedef struct {")
+        write_line("    int32_t feature;", 1)
+        write_line("    int32_t left;", 1)
+        write_line("    int32_t right;", 1)
+        write_line("    int32_t leaf_class;", 1)
+        write_line("} TreeNode;")
+        write_line("")
+        write_line("static inline int walk_tree(const TreeNode* nodes, int32_t node, const uint64_t features[]) {")
+        write_line("    while (nodes[node].feature >= 0) {", 1)
+        write_line("        const TreeNode* n = &nodes[node];", 2)
+        write_line("        node = FEATURE_TEST(features, n->feature) ? n->right : n->left;", 2)
+        write_line("    }", 1)
+        write_line("    return nodes[node].leaf_class;", 1)
+        write_line("}")
+        write_line("")
+        for head in heads:
+            generate_forest_table(trees[head], head)
+    else:
+        for head in heads:
+            for tree_idx, tree in enumerate(trees[head].estimators_):
+                generate_tree_function(trees[head], tree.tree_, f"{head}_tree_{tree_idx}", head)
+
+    def write_vote_argmax(votes, n_classes, n_trees, result, confidence):
+        write_line(f"    int max_{votes} = 0, {result} = 0;", 1)
+        write_line(f"    for(int i = 0; i < {n_classes}; i++) {{", 1)
+        write_line(f"        if({votes}[i] > max_{votes}) {{", 2)
+        write_line(f"            max_{votes} = {votes}[i];", 3)
+        write_line(f"            {result} = i;", 3)
+        write_line("        }", 2)
+        write_line("    }", 1)
+        write_line(f"    if ({confidence}) *{confidence} = (float)max_{votes} / {n_trees}.0f;", 1)
+
+    def walk_expression(head):
+        prefix = head.upper()
+        if forest_layout == "compact":
+            return f"walk_compact({prefix}_NODES + {prefix}_ROOTS[t], features)"
+        return f"walk_tree({prefix}_NODES, {prefix}_ROOTS[t], features)"
+
+    n_service = len(label_encoders["service"].classes_)
+    n_activity = len(label_encoders["activity"].classes_)
+    tree_counts = {head: len(trees[head].estimators_) for head in heads}
+    write_line(f"#define N_SERVICE_CLASSES {n_service}")
+    write_line(f"#define N_ACTIVITY_CLASSES {n_activity}")
+    write_line(f"#define N_SERVICE_TREES {tree_counts['joint' if joint else 'service']}")
+    write_line(f"#define N_ACTIVITY_TREES {tree_counts['joint' if joint else 'activity']}")
+    write_line("#define MAX_CLASSES (N_SERVICE_CLASSES > N_ACTIVITY_CLASSES ? N_SERVICE_CLASSES : N_ACTIVITY_CLASSES)")
+    write_line(f"#define RFC_DEFAULT_TOP_K {DEFAULT_TOP_K}")
+    write_line("")
+    if joint:
+        # One traversal per tree yields both class ids, packed as service << leaf_shift | activity
+        n_trees = tree_counts["joint"]
+        write_line("static inline void count_votes(const uint64_t features[], int service_votes[], int activity_votes[]) {")
+        write_line("    memset(service_votes, 0, N_SERVICE_CLASSES * sizeof(int));", 1)
+        write_line("    memset(activity_votes, 0, N_ACTIVITY_CLASSES * sizeof(int));", 1)
+        if forest_layout == "nested":
+            write_line("    int leaf;", 1)
+            for i in range(n_trees):
+                write_line(f"    leaf = joint_tree_{i}(features);", 1)
+                write_line(f"    service_votes[leaf >> {leaf_shift}]++; activity_votes[leaf & {leaf_mask:#x}]++;", 1)
+        else:
+            write_line(f"    for (int t = 0; t < {n_trees}; t++) {{", 1)
+            write_line(f"        int leaf = {walk_expression('joint')};", 2)
+            write_line(f"        service_votes[leaf >> {leaf_shift}]++;", 2)
+            write_line(f"        activity_votes[leaf & {leaf_mask:#x}]++;", 2)
+            write_line("    }", 1)
+        write_line("}")
+        write_line("")
+        write_line("static inline void predict_both(const uint64_t features[], int32_t* service, int32_t* activity,")
+        write_line("                                float* service_conf, float* activity_conf) {")
+        write_line("    int service_votes[N_SERVICE_CLASSES], activity_votes[N_ACTIVITY_CLASSES];", 1)
+        write_line("    count_votes(features, service_votes, activity_votes);", 1)
+        write_vote_argmax("service_votes", n_service, n_trees, "service_class", "service_conf")
+        write_vote_argmax("activity_votes", n_activity, n_trees, "activity_class", "activity_conf")
+        write_line("    *service = service_class;", 1)
+        write_line("    *activity = activity_class;", 1)
+        write_line("}")
+        write_line("")
+    else:
+        # Generate prediction functions that combine tree predictions
+        for head, n_classes in (("service", n_service), ("activity", n_activity)):
+            n_trees = tree_counts[head]
+            write_line(f"static inline void count_{head}_votes(const uint64_t features[], int votes[]) {{")
+            write_line(f"    memset(votes, 0, N_{head.upper()}_CLASSES * sizeof(int));", 1)
+            if forest_layout == "nested":
+                for i in range(n_trees):
+                    write_line(f"    votes[{head}_tree_{i}(features)]++;", 1)
+            else:
+                write_line(f"    for (int t = 0; t < {n_trees}; t++) {{", 1)
+                write_line(f"        votes[{walk_expression(head)}]++;", 2)
+                write_line("    }", 1)
+            write_line("}")
+            write_line("")
+            write_line(f"int predict_{head}(const uint64_t features[], float* confidence) {{")
+            write_line(f"    int votes[{n_classes}];  // Array size matches number of {head} classes", 1)
+            write_line(f"    count_{head}_votes(features, votes);", 1)
+            write_vote_argmax("votes", n_classes, n_trees, "predicted_class", "confidence")
+            write_line("    return predicted_class;", 1)
+            write_line("}")
+            write_line("")
+        write_line("static inline void count_votes(const uint64_t features[], int service_votes[], int activity_votes[]) {")
+        write_line("    count_service_votes(features, service_votes);", 1)
+        write_line("    count_activity_votes(features, activity_votes);", 1)
+        write_line("}")
+        write_line("")
+        write_line("static inline void predict_both(const uint64_t features[], int32_t* service, int32_t* activity,")
+        write_line("                                float* service_conf, float* activity_conf) {")
+        write_line("    *service = predict_service(features, service_conf);", 1)
+        write_line("    *activity = predict_activity(features, activity_conf);", 1)
+        write_line("}")
+        write_line("")
+
+    # Ranking for the confidence, margin and top-k output
+    write_line("// Classes in order of votes (descending), then id; writes min(k, n) ids and returns that count")
+    write_line("static int top_classes(const int votes[], int n, int k, int32_t ids[]) {")
+    write_line("    int count = 0, prev_votes = INT_MAX, prev_id = -1;", 1)
+    write_line("    if (k > n) k = n;", 1)
+    write_line("    while (count < k) {", 1)
+    write_line("        int best = -1;", 2)
+    write_line("        for (int i = 0; i < n; i++) {", 2)
+    write_line("            int after_prev = votes[i] < prev_votes || (votes[i] == prev_votes && i > prev_id);", 3)
+    write_line("            if (after_prev && (best < 0 || votes[i] > votes[best])) best = i;", 3)
     write_line("        }", 2)
+    write_line("        ids[count++] = best;", 2)
+    write_line("        prev_votes = votes[best];", 2)
+    write_line("        prev_id = best;", 2)
     write_line("    }", 1)
-    write_line("    return predicted_class;", 1)
+    write_line("    return count;", 1)
     write_line("}")
     write_line("")
-
-    write_line("int predict_activity(float features[]) {")
-    write_line(f"    int votes[{len(label_encoders['activity'].classes_)}] = {{0}};  // Array size matches number of activity classes", 1)
-    for i in range(len(trees['activity'].estimators_)):
-        write_line(f"    votes[activity_tree_{i}(features)]++;", 1)
-    write_line("    int max_votes = 0, predicted_class = 0;", 1)
-    write_line(f"    for(int i = 0; i < {len(label_encoders['activity'].classes_)}; i++) {{", 1)
-    write_line("        if(votes[i] > max_votes) {", 2)
-    write_line("            max_votes = votes[i];", 3)
-    write_line("            predicted_class = i;", 3)
-    write_line("        }", 2)
+    write_line("// JSON members of one head: id, confidence and margin as vote fractions, then the top k classes")
+    write_line("static void print_head(const char* name, const int votes[], int n, int n_trees, int k) {")
+    write_line("    int32_t ids[MAX_CLASSES];", 1)
+    write_line("    int ranked = top_classes(votes, n, k > 2 ? k : 2, ids);", 1)
+    write_line("    int runner_up = ranked > 1 ? votes[ids[1]] : 0;", 1)
+    write_line("    printf(\"\\\"%s_id\\\":%d,\\\"%s_confidence\\\":%.4f,\\\"%s_margin\\\":%.4f\", name, (int)ids[0],", 1)
+    write_line("           name, (float)votes[ids[0]] / n_trees, name, (float)(votes[ids[0]] - runner_up) / n_trees);", 1)
+    write_line("    if (k <= 0) return;", 1)
+    write_line("    printf(\",\\\"%s_top_k\\\":[\", name);", 1)
+    write_line("    for (int j = 0; j < k && j < ranked; j++) {", 1)
+    write_line("        printf(\"%s[%d,%.4f]\", j ? \",\" : \"\", (int)ids[j], (float)votes[ids[j]] / n_trees);", 2)
     write_line("    }", 1)
-    write_line("    return predicted_class;", 1)
+    write_line("    printf(\"]\");", 1)
     write_line("}")
     write_line("")
 
@@ -333,26 +733,234 @@ def tree_to_c_code(trees, feature_names, label_encoders, vectorizer, test_data,
     # write_line("}")
     # write_line("")
 
+    # Classify one record and print the JSON result line
+    write_line("static void classify_and_print(const char* fields[8], int top_k) {")
+    write_line("    uint64_t features[FEATURE_WORDS];", 1)
+    write_line("    int service_votes[N_SERVICE_CLASSES], activity_votes[N_ACTIVITY_CLASSES];", 1)
+    write_line("    extract_features(fields[0], fields[1], fields[2], fields[3], fields[4], fields[5], fields[6], fields[7], features);", 1)
+    write_line("    count_votes(features, service_votes, activity_votes);", 1)
+    write_line("    printf(\"{\");", 1)
+    write_line("    print_head(\"service\", service_votes, N_SERVICE_CLASSES, N_SERVICE_TREES, top_k);", 1)
+    write_line("    printf(\",\");", 1)
+    write_line("    print_head(\"activity\", activity_votes, N_ACTIVITY_CLASSES, N_ACTIVITY_TREES, top_k);", 1)
+    write_line("    printf(\"}\\n\");", 1)
+    write_line("}")
+    write_line("")
+
+    # Shared library entry points, see C_HEADER for the documented ABI
+    write_line("RFC_API int rfc_abi_version(void) {")
+    write_line("    return RFC_ABI_VERSION;", 1)
+    write_line("}")
+    write_line("")
+    write_line("RFC_API int classify_batch(const char* const* fields, size_t n_records,")
+    write_line("                           int32_t* service_out, int32_t* activity_out, float* conf_out) {")
+    write_line("    if (fields == NULL || service_out == NULL || activity_out == NULL) return -1;", 1)
+    write_line("    uint64_t features[FEATURE_WORDS];", 1)
+    write_line("    for (size_t r = 0; r < n_records; r++) {", 1)
+    write_line("        const char* const* f = fields + r * 8;", 2)
+    write_line("        float service_conf, activity_conf;", 2)
+    write_line("        extract_features(f[0], f[1], f[2], f[3], f[4], f[5], f[6], f[7], features);", 2)
+    write_line("        predict_both(features, &service_out[r], &activity_out[r], &service_conf, &activity_conf);", 2)
+    write_line("        if (conf_out) {", 2)
+    write_line("            conf_out[2 * r] = service_conf;", 3)
+    write_line("            conf_out[2 * r + 1] = activity_conf;", 3)
+    write_line("        }", 2)
+    write_line("    }", 1)
+    write_line("    return 0;", 1)
+    write_line("}")
+    write_line("")
+    write_line("RFC_API int rfc_model_info(int32_t info[4]) {")
+    write_line("    info[0] = N_SERVICE_CLASSES;", 1)
+    write_line("    info[1] = N_ACTIVITY_CLASSES;", 1)
+    write_line("    info[2] = N_SERVICE_TREES;", 1)
+    write_line("    info[3] = N_ACTIVITY_TREES;", 1)
+    write_line("    return 0;", 1)
+    write_line("}")
+    write_line("")
+    write_line("RFC_API int classify_votes(const char* const* fields, size_t n_records,")
+    write_line("                           int32_t* service_votes, int32_t* activity_votes) {")
+    write_line("    if (fields == NULL || service_votes == NULL || activity_votes == NULL) return -1;", 1)
+    write_line("    uint64_t features[FEATURE_WORDS];", 1)
+    write_line("    int sv[N_SERVICE_CLASSES], av[N_ACTIVITY_CLASSES];", 1)
+    write_line("    for (size_t r = 0; r < n_records; r++) {", 1)
+    write_line("        const char* const* f = fields + r * 8;", 2)
+    write_line("        extract_features(f[0], f[1], f[2], f[3], f[4], f[5], f[6], f[7], features);", 2)
+    write_line("        count_votes(features, sv, av);", 2)
+    write_line("        for (int i = 0; i < N_SERVICE_CLASSES; i++) service_votes[r * N_SERVICE_CLASSES + i] = sv[i];", 2)
+    write_line("        for (int i = 0; i < N_ACTIVITY_CLASSES; i++) activity_votes[r * N_ACTIVITY_CLASSES + i] = av[i];", 2)
+    write_line("    }", 1)
+    write_line("    return 0;", 1)
+    write_line("}")
+    write_line("")
+    write_line("#ifndef RFC_NO_MAIN")
+
+    # Streaming mode: one tab-separated record per line on stdin, one JSON line per record on stdout
+    write_line("// Read one line of arbitrary length; returns NULL on EOF")
+    write_line("static char* read_line(char** buf, size_t* cap) {")
+    write_line("    size_t len = 0;", 1)
+    write_line("    if (*buf == NULL) {", 1)
+    write_line("        *cap = 4096;", 2)
+    write_line("        *buf = (char*)malloc(*cap);", 2)
+    write_line("        if (*buf == NULL) return NULL;", 2)
+    write_line("    }", 1)
+    write_line("    while (fgets(*buf + len, (int)(*cap - len), stdin)) {", 1)
+    write_line("        len += strlen(*buf + len);", 2)
+    write_line("        if (len > 0 && (*buf)[len - 1] == '\\n') break;", 2)
+    write_line("        if (len + 1 < *cap) continue;", 2)
+    write_line("        char* grown = (char*)realloc(*buf, *cap * 2);", 2)
+    write_line("        if (grown == NULL) return NULL;", 2)
+    write_line("        *buf = grown;", 2)
+    write_line("        *cap *= 2;", 2)
+    write_line("    }", 1)
+    write_line("    if (len == 0) return NULL;", 1)
+    write_line("    while (len > 0 && ((*buf)[len - 1] == '\\n' || (*buf)[len - 1] == '\\r')) (*buf)[--len] = '\\0';", 1)
+    write_line("    return *buf;", 1)
+    write_line("}")
+    write_line("")
+    write_line("// Split a tab-separated record in place into 8 fields")
+    write_line("static void split_fields(char* line, const char* fields[8]) {")
+    write_line("    char* p = line;", 1)
+    write_line("    for (int i = 0; i < 8; i++) {", 1)
+    write_line("        fields[i] = p ? p : \"\";", 2)
+    write_line("        char* tab = p ? strchr(p, '\\t') : NULL;", 2)
+    write_line("        if (tab) { *tab = '\\0'; p = tab + 1; }", 2)
+    write_line("        else p = NULL;", 2)
+    write_line("    }", 1)
+    write_line("}")
+    write_line("")
+    write_line("static int run_stream(int top_k) {")
+    write_line("    char* line = NULL;", 1)
+    write_line("    size_t cap = 0;", 1)
+    write_line("    while (read_line(&line, &cap)) {", 1)
+    write_line("        if (strchr(line, '\\t') == NULL) {", 2)
+    write_line("            // Lines without fields are control commands: PING, TOPK <k>", 3)
+    write_line("            if (strcmp(line, \"PING\") == 0) printf(\"{\\\"pong\\\":true}\\n\");", 3)
+    write_line("            else if (strncmp(line, \"TOPK \", 5) == 0) {", 3)
+    write_line("                top_k = atoi(line + 5);", 4)
+    write_line("                if (top_k < 0) top_k = 0;", 4)
+    write_line("                printf(\"{\\\"top_k\\\":%d}\\n\", top_k);", 4)
+    write_line("            }", 3)
+    write_line("            else printf(\"{\\\"error\\\":\\\"expected 8 tab-separated fields\\\"}\\n\");", 3)
+    write_line("        } else {", 2)
+    write_line("            const char* fields[8];", 3)
+    write_line("            split_fields(line, fields);", 3)
+    write_line("            classify_and_print(fields, top_k);", 3)
+    write_line("        }", 2)
+    write_line("        fflush(stdout);", 2)
+    write_line("    }", 1)
+    write_line("    free(line);", 1)
+    write_line("    return 0;", 1)
+    write_line("}")
+    write_line("")
+
+    # Benchmark mode: load stream-format records from stdin, time repeated classification
+    write_line("static int run_bench(int iterations) {")
+    write_line("    size_t n = 0, cap_records = 1024;", 1)
+    write_line("    char** lines = (char**)malloc(cap_records * sizeof(char*));", 1)
+    write_line("    char* line = NULL;", 1)
+    write_line("    size_t cap = 0;", 1)
+    write_line("    while (lines && read_line(&line, &cap)) {", 1)
+    write_line("        if (strchr(line, '\\t') == NULL) continue;", 2)
+    write_line("        if (n == cap_records) {", 2)
+    write_line("            cap_records *= 2;", 3)
+    write_line("            lines = (char**)realloc(lines, cap_records * sizeof(char*));", 3)
+    write_line("            if (!lines) break;", 3)
+    write_line("        }", 2)
+    write_line("        lines[n] = (char*)malloc(strlen(line) + 1);", 2)
+    write_line("        strcpy(lines[n++], line);", 2)
+    write_line("    }", 1)
+    write_line("    free(line);", 1)
+    write_line("    if (!lines || n == 0) {", 1)
+    write_line("        printf(\"{\\\"error\\\":\\\"no records\\\"}\\n\");", 2)
+    write_line("        return 1;", 2)
+    write_line("    }", 1)
+    write_line("    const char** fields = (const char**)malloc(n * 8 * sizeof(char*));", 1)
+    write_line("    for (size_t r = 0; r < n; r++) split_fields(lines[r], fields + r * 8);", 1)
+    write_line("    uint64_t features[FEATURE_WORDS];", 1)
+    write_line("    long checksum = 0, tokens = 0;", 1)
+    write_line("    clock_t start = clock();", 1)
+    write_line("    for (int it = 0; it < iterations; it++) {", 1)
+    write_line("        for (size_t r = 0; r < n; r++) {", 2)
+    write_line("            const char** f = fields + r * 8;", 3)
+    write_line("            tokens += extract_features(f[0], f[1], f[2], f[3], f[4], f[5], f[6], f[7], features);", 3)
+    write_line("            int32_t service, activity;", 3)
+    write_line("            predict_both(features, &service, &activity, NULL, NULL);", 3)
+    write_line("            checksum += service * 31 + activity;", 3)
+    write_line("        }", 2)
+    write_line("    }", 1)
+    write_line("    double seconds = (double)(clock() - start) / CLOCKS_PER_SEC;", 1)
+    write_line("", 1)
+    write_line("    // Lookup alone: the same tokens, pre-split, through find_feature", 1)
+    write_line("    size_t n_tokens = 0, cap_tokens = 4096;", 1)
+    write_line("    char** token_list = (char**)malloc(cap_tokens * sizeof(char*));", 1)
+    write_line("    char token_buffer[1024], canonical[CANON_MAX_FIELD + 1];", 1)
+    write_line("    for (size_t r = 0; token_list && r < n * 8; r++) {", 1)
+    write_line("        canonicalize_field(fields[r], r % 8 == 1 || r % 8 == 6, canonical);", 2)
+    write_line("        const char* p = canonical;", 2)
+    write_line("        int len;", 2)
+    write_line("        while ((len = next_token(&p, token_buffer, sizeof(token_buffer))) > 0) {", 2)
+    write_line("            if (len < 2) continue;", 3)
+    write_line("            if (n_tokens == cap_tokens) {", 3)
+    write_line("                cap_tokens *= 2;", 4)
+    write_line("                token_list = (char**)realloc(token_list, cap_tokens * sizeof(char*));", 4)
+    write_line("                if (!token_list) break;", 4)
+    write_line("            }", 3)
+    write_line("            token_list[n_tokens] = (char*)malloc((size_t)len + 1);", 3)
+    write_line("            memcpy(token_list[n_tokens++], token_buffer, (size_t)len + 1);", 3)
+    write_line("        }", 2)
+    write_line("    }", 1)
+    write_line("    long hits = 0;", 1)
+    write_line("    start = clock();", 1)
+    write_line("    for (int it = 0; token_list && it < iterations; it++) {", 1)
+    write_line("        for (size_t t = 0; t < n_tokens; t++) hits += find_feature(token_list[t]) >= 0;", 2)
+    write_line("    }", 1)
+    write_line("    double lookup_seconds = (double)(clock() - start) / CLOCKS_PER_SEC;", 1)
+    write_line("", 1)
+    write_line("    // Every vocabulary term must resolve to its own feature index", 1)
+    write_line("    int unresolved = 0;", 1)
+    write_line("    for (int i = 0; i < TABLE_SLOTS; i++) {", 1)
+    write_line("        const FeatureEntry* e = &FEATURE_TABLE[i];", 2)
+    write_line("        if (e->feature_index >= 0 && find_feature(e->term) != e->feature_index) unresolved++;", 2)
+    write_line("    }", 1)
+    write_line("", 1)
+    write_line("    printf(\"{\\\"records\\\":%lu,\\\"iterations\\\":%d,\\\"ns_per_record\\\":%.1f,\\\"checksum\\\":%ld,\"", 1)
+    write_line("           \"\\\"tokens_per_record\\\":%.1f,\\\"lookup_ns_per_token\\\":%.2f,\\\"lookup_hit_rate\\\":%.4f,\"", 1)
+    write_line("           \"\\\"vocab_unresolved\\\":%d}\\n\",", 1)
+    write_line("           (unsigned long)n, iterations, seconds * 1e9 / ((double)n * iterations), checksum,", 1)
+    write_line("           (double)tokens / ((double)n * iterations),", 1)
+    write_line("           n_tokens ? lookup_seconds * 1e9 / ((double)n_tokens * iterations) : 0.0,", 1)
+    write_line("           n_tokens ? (double)hits / ((double)n_tokens * iterations) : 0.0, unresolved);", 1)
+    write_line("    return unresolved ? 2 : 0;", 1)
+    write_line("}")
+    write_line("")
+
     # Generate CLI main function for inference
     write_line("int main(int argc, char* argv[]) {")
-    write_line("    if (argc < 9) {")
-    write_line("        fprintf(stderr, \"Warning: expected 8 params but got %d. Missing values will be treated as empty.\\n\", argc-1);")
+    write_line("    // Optional leading --top-k K: classes listed per head in CLI and --stream output", 1)
+    write_line("    int top_k = RFC_DEFAULT_TOP_K, arg = 1;", 1)
+    write_line("    if (argc >= 3 && strcmp(argv[1], \"--top-k\") == 0) {", 1)
+    write_line("        top_k = atoi(argv[2]);", 2)
+    write_line("        if (top_k < 0) top_k = 0;", 2)
+    write_line("        arg = 3;", 2)
     write_line("    }", 1)
-    write_line("    const char* host = argc>1 ? argv[1] : \"\";", 1)
-    write_line("    const char* url = argc>2 ? argv[2] : \"\";", 1)
-    write_line("    const char* method = argc>3 ? argv[3] : \"\";", 1)
-    write_line("    const char* origin = argc>4 ? argv[4] : \"\";", 1)
-    write_line("    const char* req_ct = argc>5 ? argv[5] : \"\";", 1)
-    write_line("    const char* resp_ct = argc>6 ? argv[6] : \"\";", 1)
-    write_line("    const char* referer = argc>7 ? argv[7] : \"\";", 1)
-    write_line("    const char* accept = argc>8 ? argv[8] : \"\";", 1)
-    write_line("    float features[5000] = {0};", 1)
-    write_line("    extract_features(host, url, method, origin, req_ct, resp_ct, referer, accept, features);", 1)
-    write_line("    int predicted_service = predict_service(features);", 1)
-    write_line("    int predicted_activity = predict_activity(features);", 1)
-    write_line("    printf(\"{\\\"service_id\\\":%d,\\\"activity_id\\\":%d}\\n\", predicted_service, predicted_activity);", 1)
+    write_line("    if (argc == arg + 1 && strcmp(argv[arg], \"--stream\") == 0) {", 1)
+    write_line("        return run_stream(top_k);", 2)
+    write_line("    }", 1)
+    write_line("    if (argc >= arg + 1 && strcmp(argv[arg], \"--bench\") == 0) {", 1)
+    write_line("        int iterations = argc > arg + 1 ? atoi(argv[arg + 1]) : 100;", 2)
+    write_line("        return run_bench(iterations > 0 ? iterations : 1);", 2)
+    write_line("    }", 1)
+    write_line("    if (argc - arg < 8) {", 1)
+    write_line("        fprintf(stderr, \"Warning: expected 8 params but got %d. Missing values will be treated as empty.\\n\", argc - arg);", 2)
+    write_line("    }", 1)
+    write_line("    const char* fields[8];", 1)
+    write_line("    for (int i = 0; i < 8; i++) {", 1)
+    write_line("        fields[i] = argc > arg + i ? argv[arg + i] : \"\";", 2)
+    write_line("    }", 1)
+    write_line("    classify_and_print(fields, top_k);", 1)
     write_line("    return 0;", 1)
     write_line("}")
+    write_line("#endif  // RFC_NO_MAIN")
 
 
     # write_line("    float features[5000] = {0};  // Feature array for predictions", 1)
@@ -394,29 +1002,9 @@ def load_and_preprocess_data():
     if not prediction_files:
         raise Exception(f"No prediction files found in {input_dir}")
     
-    # Combine all prediction files
-    dfs = []
-    for file in prediction_files:
-        df = pd.read_csv(file)
-        dfs.append(df)
-    
-    df = pd.concat(dfs, ignore_index=True)
-    
-    # Process features using apply function
-    def combine_features(row):
-        features = [
-            row['headers_Host'],
-            row['url'],
-            row['method'],
-            row['requestHeaders_Origin'],
-            row['requestHeaders_Content_Type'],
-            row['responseHeaders_Content_Type'],
-            row['requestHeaders_Referer'],
-            row['requestHeaders_Accept']
-        ]
-        return ' '.join(str(f) if pd.notna(f) else '' for f in features)
-    
-    df['combined_headers'] = df.apply(combine_features, axis=1)
+    # Combine all prediction files; the canonical combined text (the same the
+    # generated C builds) and the label categories come from the dataset cache
+    df = load_dataset(sorted(prediction_files)).rename(columns={COMBINED: 'combined_headers'})
 
     # Use predicted labels from CodeBERT
     # df['service'] = df['predicted_service'].astype(str)
@@ -424,12 +1012,44 @@ def load_and_preprocess_data():
 
     return df
 
-def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
+def train_rfc_c_manual(
+    logs: list[str] = None,
+    forest_layout: str = "nested",
+    benchmark_layouts: bool = False,
+    vocab_lookup: str = "perfect",
+    benchmark_lookups: bool = False,
+    joint: bool = False,
+    benchmark_joint: bool = False,
+    budget_ns: float | None = None,
+    budget_bytes: int | None = None,
+    prune_pool: int = 25,
+    n_jobs: int = 1,
+    concurrent_heads: bool = True,
+) -> dict[str, object]:
     """Train RFC models and generate manual C code.
     
     Args:
         logs: List to append log messages to
-        
+        forest_layout: Tree representation in the generated code, see FOREST_LAYOUTS
+        benchmark_layouts: Also generate every other layout from the same
+            forests and compare compile time, binary size and ns/record
+        vocab_lookup: Vocabulary lookup in the generated code, see VOCAB_LOOKUPS
+        benchmark_lookups: Also generate every other lookup and compare
+            ns/record and lookup ns/token
+        joint: Train one multi-output forest on (service, activity); the C
+            code then gets both labels from a single traversal per tree
+        benchmark_joint: Also train the other setup (two forests vs. joint)
+            and compare accuracy, Python latency and C ns/record
+        budget_ns: Estimated ns/record the generated classifier may take;
+            a sub-forest is selected from a pool of ``prune_pool`` trees
+            (see forest_pruning.py)
+        budget_bytes: Estimated binary size the classifier may have; may be
+            combined with ``budget_ns``
+        prune_pool: Trees trained per forest when pruning to a budget
+        n_jobs: Threads for fitting, -1 for all cores (see parallel_fit.py)
+        concurrent_heads: Fit the service and activity forests at the same
+            time on a share of the threads each
+
     Returns:
         Dictionary containing training results and metrics
     """
@@ -438,8 +1058,7 @@ def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
         
     def log_message(message: str):
         """Log message to both console and logs list."""
-        print(message, flush=True)
-        logs.append(message)
+        emit(message, logs)
     
     try:        
         # Load and preprocess data
@@ -451,41 +1070,161 @@ def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
         train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
         log_message(f"Training set size: {len(train_df)}, Test set size: {len(test_df)}")
 
-        # Create and fit label encoders
-        le_service = LabelEncoder()
-        le_activity = LabelEncoder()
-        
-        # Fit encoders on all data to ensure all classes are known
-        le_service.fit(df['service'])
-        le_activity.fit(df['activityType'])
-        
-        # Transform labels for both train and test sets
-        train_df['service_encoded'] = le_service.transform(train_df['service'])
-        train_df['activityType_encoded'] = le_activity.transform(train_df['activityType'])
-        test_df['service_encoded'] = le_service.transform(test_df['service'])
-        test_df['activityType_encoded'] = le_activity.transform(test_df['activityType'])
+        # Label encoders over all data so every class is known; the cached
+        # label categories are sorted, so their codes are the encoding
+        le_service, _ = encode_labels(df['service'])
+        le_activity, _ = encode_labels(df['activityType'])
+        for part in (train_df, test_df):
+            part['service_encoded'] = part['service'].cat.codes.astype(np.int64)
+            part['activityType_encoded'] = part['activityType'].cat.codes.astype(np.int64)
 
+        # Forest size, depth and vocabulary size from the training defaults (see training_defaults.py)
+        hyper = load_training_defaults("c", logs)
+        log_message(
+            f"Hyperparameters: {hyper['n_estimators']} trees, max depth {hyper['max_depth'] or 'unlimited'}, "
+            f"up to {hyper['max_features']} features"
+        )
         # Create and fit vectorizer using Binary Count Features
         log_message("Using CountVectorizer (binary=True) to match C code feature extraction...")
-        vectorizer = CountVectorizer(max_features=5000, binary=True) # Use binary features
+        vectorizer = make_vectorizer(hyper) # Binary features
         X_train = vectorizer.fit_transform(train_df['combined_headers'])
         X_test = vectorizer.transform(test_df['combined_headers'])
 
-        # Train Random Forest models
-        log_message("Training Random Forest models...")
-        rf_service = RandomForestClassifier(n_estimators=5, random_state=42)
-        rf_activity = RandomForestClassifier(n_estimators=5, random_state=42)
+        training_runs = []
+
+        def fit_forests(use_joint, n_estimators=hyper['n_estimators'], X=X_train, frame=train_df):
+            def forest():
+                return RandomForestClassifier(n_estimators=n_estimators, max_depth=hyper['max_depth'], random_state=42)
+
+            if use_joint:
+                targets = np.column_stack([frame['service_encoded'], frame['activityType_encoded']])
+                specs = {'joint': (forest(), targets)}
+            else:
+                specs = {
+                    'service': (forest(), frame['service_encoded']),
+                    'activity': (forest(), frame['activityType_encoded']),
+                }
+            fitted, metrics = fit_in_parallel(specs, X, n_jobs=n_jobs, concurrent=concurrent_heads, log=logs)
+            training_runs.append(metrics)
+            return fitted
+
+        def evaluate(forests):
+            """Test-set accuracy of both heads and sklearn predict time per record."""
+            start = time.perf_counter()
+            if 'joint' in forests:
+                service_pred, activity_pred = forests['joint'].predict(X_test).T
+            else:
+                service_pred = forests['service'].predict(X_test)
+                activity_pred = forests['activity'].predict(X_test)
+            seconds = time.perf_counter() - start
+            return {
+                "service_accuracy": float(np.mean(service_pred == test_df['service_encoded'])),
+                "activity_accuracy": float(np.mean(activity_pred == test_df['activityType_encoded'])),
+                "python_us_per_record": round(seconds * 1e6 / max(1, X_test.shape[0]), 2),
+            }
+
+        def write_c_code(path, layout, lookup, trees=None):
+            with open(path, "w") as f:
+                tree_to_c_code(
+                    trees if trees is not None else forests,
+                    vectorizer.get_feature_names_out(),
+                    {'service': le_service, 'activity': le_activity},
+                    vectorizer,
+                    test_df,
+                    file=f,
+                    forest_layout=layout,
+                    vocab_lookup=lookup,
+                )
 
-        rf_service.fit(X_train, train_df['service_encoded'])
-        rf_activity.fit(X_train, train_df['activityType_encoded'])
+        variants_dir = Path(PATHS['rfc_codegen_output_folder']) / "variants"
+        records = test_df.to_dict(orient="records")
+
+        def prune_to_budget():
+            """Pick the sub-forest of a larger pool that best agrees with it within the budgets."""
+            from .c_build import benchmark_sources
+
+            fit_idx, val_idx = train_test_split(np.arange(X_train.shape[0]), test_size=0.2, random_state=42)
+            log_message(f"Training a pool of {prune_pool} trees per forest on {len(fit_idx)} samples...")
+            pool = fit_forests(joint, prune_pool, X_train[fit_idx], train_df.iloc[fit_idx])
+            pruner = ForestPruner(
+                pool,
+                (len(le_service.classes_), len(le_activity.classes_)),
+                X_train[val_idx],
+                X_test,
+                (test_df['service_encoded'].to_numpy(), test_df['activityType_encoded'].to_numpy()),
+            )
+            log_message(f"Scoring sub-forests on {len(val_idx)} validation samples (depth limits {pruner.depths})...")
+            rows = pruner.candidates()
+
+            # Calibrate the cost model on the full pool and the cheapest candidate
+            full = next(r for r in rows if r["max_depth"] is None and r["trees"] == prune_pool)
+            cheapest = min(rows, key=lambda r: r["nodes_visited"])
+            calibration_rows = {"full": full, "cheapest": cheapest}
+            variants_dir.mkdir(parents=True, exist_ok=True)
+            sources = {}
+            for name, row in calibration_rows.items():
+                sources[name] = variants_dir / f"api_classifier_prune_{name}.c"
+                write_c_code(sources[name], forest_layout, vocab_lookup, trees=pruner.sub_forests(row))
+            log_message("Calibrating the latency and size model...")
+            measured = benchmark_sources(sources, records, logs=logs)
+            cost = CostModel.fit([
+                (row["nodes_visited"], measured[name]["ns_per_record"], row["nodes"], measured[name]["binary_size_bytes"])
+                for name, row in calibration_rows.items()
+            ])
+            for row in rows:
+                cost.annotate(row)
+
+            selected, fits = select_sub_forest(rows, budget_ns, budget_bytes)
+            if not fits:
+                log_message("Warning: no sub-forest meets the budget; using the cheapest one")
+            table = pareto_front(rows)
+            if selected not in table:
+                table = sorted(table + [selected], key=lambda r: r["est_ns_per_record"])
+            log_message("depth  trees  nodes  visited  est ns  est KiB  agreement  service  activity")
+            for row in table:
+                log_message(
+                    f"{str(row['max_depth'] or '-'):>5}  {row['trees']:>5}  {row['nodes']:>5}  "
+                    f"{row['nodes_visited']:>7.1f}  {row['est_ns_per_record']:>6.0f}  "
+                    f"{row['est_binary_bytes'] / 1024:>7.0f}  {row['agreement']:>9.4f}  "
+                    f"{row['service_accuracy']:>7.4f}  {row['activity_accuracy']:>8.4f}"
+                    + ("  <- selected" if row is selected else "")
+                )
+            log_message(
+                f"Selected {selected['trees']} of {prune_pool} trees, max depth {selected['max_depth'] or 'unlimited'}: "
+                f"agreement {selected['agreement']:.4f}, ~{selected['est_ns_per_record']:.0f} ns/record "
+                f"(full pool ~{full['est_ns_per_record']:.0f})"
+            )
+            pruning = {
+                "budget_ns": budget_ns,
+                "budget_bytes": budget_bytes,
+                "pool_trees": prune_pool,
+                "validation_samples": len(val_idx),
+                "within_budget": fits,
+                "calibration": {
+                    "base_ns": round(cost.base_ns, 1),
+                    "ns_per_node_visited": round(cost.ns_per_node, 3),
+                    "base_bytes": int(cost.base_bytes),
+                    "bytes_per_node": round(cost.bytes_per_node, 2),
+                    "measured": measured,
+                },
+                "table": table,
+                "selected": selected,
+            }
+            return pruner.sub_forests(selected), pruning
+
+        # Train Random Forest models
+        pruning = None
+        if budget_ns is not None or budget_bytes is not None:
+            forests, pruning = prune_to_budget()
+        else:
+            log_message("Training a joint multi-output Random Forest..." if joint else "Training Random Forest models...")
+            forests = fit_forests(joint)
 
         # Evaluate on test set
         log_message("Evaluating on test set...")
-        service_predictions = rf_service.predict(X_test)
-        activity_predictions = rf_activity.predict(X_test)
-        
-        service_accuracy = np.mean(service_predictions == test_df['service_encoded'])
-        activity_accuracy = np.mean(activity_predictions == test_df['activityType_encoded'])
+        evaluation = evaluate(forests)
+        service_accuracy = evaluation["service_accuracy"]
+        activity_accuracy = evaluation["activity_accuracy"]
         
         log_message(f"Service Classification Accuracy: {service_accuracy:.4f}")
         log_message(f"Activity Classification Accuracy: {activity_accuracy:.4f}")
@@ -493,15 +1232,9 @@ def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
         # Generate C code and write to file
         output_file = Path(PATHS['rfc_codegen_output_folder']) / "api_classifier.c"
         try:
-            with open(output_file, "w") as f:
-                tree_to_c_code(
-                    {'service': rf_service, 'activity': rf_activity},
-                    vectorizer.get_feature_names_out(),
-                    {'service': le_service, 'activity': le_activity},
-                    vectorizer,
-                    test_df,  
-                    file=f
-                )
+            write_c_code(output_file, forest_layout, vocab_lookup)
+            header_file = output_file.with_suffix(".h")
+            header_file.write_text(C_HEADER)
             log_message(f"C code has been written to {output_file}")
         except Exception as e:
             log_message(f"Error writing C code: {e}")
@@ -522,6 +1255,68 @@ def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
             log_message(f"Error writing label mappings: {e}")
             raise
             
+        layout_benchmark = None
+        lookup_benchmark = None
+        joint_benchmark = None
+        if benchmark_layouts or benchmark_lookups or benchmark_joint:
+            from .c_build import benchmark_sources
+
+            variants_dir.mkdir(parents=True, exist_ok=True)
+
+        # Bytes of the static node tables, for the layouts that have them
+        forest_nodes = sum(e.tree_.node_count for forest in forests.values() for e in forest.estimators_)
+        node_table_bytes = {"table": forest_nodes * 16, "compact": forest_nodes * 4}
+
+        if benchmark_layouts:
+            sources = {forest_layout: output_file}
+            for layout in FOREST_LAYOUTS:
+                if layout == forest_layout:
+                    continue
+                variant_file = variants_dir / f"api_classifier_{layout}.c"
+                write_c_code(variant_file, layout, vocab_lookup)
+                sources[layout] = variant_file
+            log_message("Benchmarking forest layouts...")
+            layout_benchmark = benchmark_sources(sources, records, logs=logs)
+
+        if layout_benchmark and "compact" in layout_benchmark and "table" in layout_benchmark:
+            compact, table = layout_benchmark["compact"], layout_benchmark["table"]
+            log_message(
+                f"Compact layout: node tables {node_table_bytes['compact'] / 1024:.1f} KiB vs "
+                f"{node_table_bytes['table'] / 1024:.1f} KiB, binary {compact['binary_size_bytes'] / 1024:.0f} KiB vs "
+                f"{table['binary_size_bytes'] / 1024:.0f} KiB, {compact['ns_per_record']:.0f} vs "
+                f"{table['ns_per_record']:.0f} ns/record"
+            )
+
+        if benchmark_lookups:
+            sources = {vocab_lookup: output_file}
+            for lookup in VOCAB_LOOKUPS:
+                if lookup == vocab_lookup:
+                    continue
+                variant_file = variants_dir / f"api_classifier_{lookup}_lookup.c"
+                write_c_code(variant_file, forest_layout, lookup)
+                sources[lookup] = variant_file
+            log_message("Benchmarking vocabulary lookups...")
+            lookup_benchmark = benchmark_sources(sources, records, logs=logs)
+
+        if benchmark_joint:
+            setup = "joint" if joint else "separate"
+            other = "separate" if joint else "joint"
+            log_message(f"Training the {other} setup for comparison...")
+            other_forests = fit_forests(not joint)
+            variant_file = variants_dir / f"api_classifier_{other}.c"
+            write_c_code(variant_file, forest_layout, vocab_lookup, trees=other_forests)
+            log_message("Benchmarking joint vs. separate forests...")
+            c_report = benchmark_sources({setup: output_file, other: variant_file}, records, logs=logs)
+            joint_benchmark = {
+                setup: {**evaluation, **c_report[setup]},
+                other: {**evaluate(other_forests), **c_report[other]},
+            }
+            for name, row in joint_benchmark.items():
+                log_message(
+                    f"{name}: service {row['service_accuracy']:.4f}, activity {row['activity_accuracy']:.4f}, "
+                    f"Python {row['python_us_per_record']} us/record, C {row['ns_per_record']:.0f} ns/record"
+                )
+
         # Return results
         return {
             "service_accuracy": float(service_accuracy),
@@ -529,9 +1324,22 @@ def train_rfc_c_manual(logs: list[str] = None) -> dict[str, object]:
             "train_samples": len(train_df),
             "test_samples": len(test_df),
             "output_file": str(output_file),
+            "header_file": str(header_file),
             "label_mappings_file": str(label_mappings_file),
             "service_classes": len(le_service.classes_),
-            "activity_classes": len(le_activity.classes_)
+            "activity_classes": len(le_activity.classes_),
+            "forest_layout": forest_layout,
+            "forest_nodes": forest_nodes,
+            "node_table_bytes": node_table_bytes,
+            "layout_benchmark": layout_benchmark,
+            "vocab_lookup": vocab_lookup,
+            "lookup_benchmark": lookup_benchmark,
+            "joint": joint,
+            "joint_benchmark": joint_benchmark,
+            "pruning": pruning,
+            "hyperparameters": hyper,
+            # The first fit is the one that produced the emitted forests (or their pool)
+            "training": training_runs[0],
         }
 
     except Exception as e:
@@ -0,0 +1,13 @@
+"""Constants shared by RFC code generation and the inference engines.
+
+Kept free of imports so that the generator and the engines can agree on
+them without depending on each other.
+"""
+
+# Version of the shared library interface exported by the generated C code.
+# Bump when the exported functions or their semantics change.
+C_ABI_VERSION = 2
+
+# Classes per head returned for a single request unless asked otherwise, by
+# both engines and by the generated command line classifier
+DEFAULT_TOP_K = 3
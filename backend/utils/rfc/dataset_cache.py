@@ -0,0 +1,171 @@
+"""Cached training data for the RFC trainers.
+
+Both trainers used to re-parse every prediction CSV and rebuild the combined
+feature text on each run. ``load_frame`` keeps one columnar file per source
+CSV under ``data/output/rfc/dataset-cache`` holding
+
+* the CSV columns as parsed by pandas,
+* ``combined``: the canonicalised feature fields joined by spaces
+  (``feature_text.py``), i.e. the text both vectorizers are fitted on,
+* the label columns as sorted string categoricals, so their codes are the
+  ``LabelEncoder`` encoding and ``encode_labels`` needs no pass over the rows.
+
+The cache is stored as Feather when pyarrow is installed and as a pickle
+otherwise. An entry is used while the CSV's mtime and size match; if only
+the mtime moved, the SHA-256 decides and a matching hash just refreshes the
+recorded mtime. Entries are also rebuilt when ``canonical.py`` or
+``feature_text.py`` changes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sklearn.preprocessing import LabelEncoder
+
+from ..path_config import PATHS
+from ..log_sink import emit as _status
+from . import canonical, feature_text
+from .feature_text import combined_text
+from .incremental import fingerprint
+
+try:
+    import pyarrow  # noqa: F401  (Feather storage)
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+CACHE_FORMAT = 1
+COMBINED = "combined"
+LABEL_COLUMNS = ("service", "activityType")
+
+
+@lru_cache(maxsize=1)
+def _canonical_version() -> str:
+    # The text depends on the canonical form and on how the fields are joined
+    digest = hashlib.sha256()
+    for module in (canonical, feature_text):
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _storage() -> str:
+    return "feather" if pyarrow is not None else "pickle"
+
+
+def _entry_paths(source: Path, cache_dir: Path) -> Tuple[Path, Path]:
+    # The same file name may exist in several input folders
+    tag = hashlib.sha1(str(source.resolve()).encode("utf-8")).hexdigest()[:8]
+    stem = f"{source.stem}-{tag}"
+    return cache_dir / f"{stem}.{_storage()}", cache_dir / f"{stem}.json"
+
+
+def _read_meta(path: Path) -> Dict[str, Any] | None:
+    try:
+        meta = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    current = (CACHE_FORMAT, _canonical_version(), _storage())
+    return meta if (meta.get("format"), meta.get("canonical"), meta.get("storage")) == current else None
+
+
+def _write_meta(path: Path, meta: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _sorted_categories(values: pd.Series) -> pd.Series:
+    values = values.astype(str)
+    return values.astype(pd.CategoricalDtype(sorted(values.unique())))
+
+
+def _build(source: Path) -> pd.DataFrame:
+    frame = pd.read_csv(source)
+    frame[COMBINED] = combined_text(frame)
+    for column in LABEL_COLUMNS:
+        if column in frame:
+            frame[column] = _sorted_categories(frame[column])
+    return frame
+
+
+def _write_frame(frame: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if pyarrow is not None:
+        frame.reset_index(drop=True).to_feather(tmp)
+    else:
+        frame.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def _read_frame(path: Path) -> pd.DataFrame:
+    return pd.read_feather(path) if pyarrow is not None else pd.read_pickle(path)
+
+
+def load_frame(source: Path, log: List[str] | None = None, cache_dir: Path | None = None) -> pd.DataFrame:
+    """Rows of the CSV ``source`` with ``combined`` text and categorical labels, cached.
+
+    Args:
+        source: Prediction CSV
+        log: Optional list to collect log messages
+        cache_dir: Cache directory, ``PATHS["rfc_dataset_cache"]`` by default
+    """
+    source = Path(source)
+    cache_dir = Path(cache_dir or PATHS["rfc_dataset_cache"])
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    data_path, meta_path = _entry_paths(source, cache_dir)
+    stat = source.stat()
+    meta = _read_meta(meta_path) if data_path.exists() else None
+
+    if meta is not None and meta["bytes"] == stat.st_size:
+        if meta["mtime_ns"] == stat.st_mtime_ns:
+            return _read_frame(data_path)
+        if fingerprint(source)["sha256"] == meta["sha256"]:
+            _write_meta(meta_path, {**meta, "mtime_ns": stat.st_mtime_ns})
+            return _read_frame(data_path)
+
+    _status(f"Building dataset cache for {source.name}", log)
+    frame = _build(source)
+    _write_frame(frame, data_path)
+    _write_meta(meta_path, {
+        "format": CACHE_FORMAT,
+        "canonical": _canonical_version(),
+        "storage": _storage(),
+        "source": str(source),
+        "mtime_ns": stat.st_mtime_ns,
+        "bytes": stat.st_size,
+        "sha256": fingerprint(source)["sha256"],
+        "rows": len(frame),
+    })
+    return frame
+
+
+def load_dataset(
+    sources: Iterable[Path], log: List[str] | None = None, cache_dir: Path | None = None
+) -> pd.DataFrame:
+    """All ``sources`` (see ``load_frame``) in one frame with shared sorted label categories."""
+    frames = [load_frame(source, log, cache_dir) for source in sources]
+    if not frames:
+        raise ValueError("No source files to load")
+    df = pd.concat(frames, ignore_index=True)
+    for column in LABEL_COLUMNS:
+        if all(column in frame for frame in frames):
+            df[column] = pd.Series(
+                union_categoricals([frame[column] for frame in frames], sort_categories=True),
+                index=df.index,
+            )
+    return df
+
+
+def encode_labels(labels: pd.Series) -> Tuple[LabelEncoder, np.ndarray]:
+    """Label encoder of a categorical label column and the column's codes."""
+    if not isinstance(labels.dtype, pd.CategoricalDtype):
+        labels = _sorted_categories(labels)
+    encoder = LabelEncoder().fit(labels.cat.categories.to_numpy(dtype=object))
+    return encoder, labels.cat.codes.to_numpy(dtype=np.int64)
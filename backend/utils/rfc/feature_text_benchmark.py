@@ -0,0 +1,135 @@
+"""Throughput of the combined feature text builders.
+
+Compares ``feature_text.combined_text`` with the row-wise builders it
+replaced on requests resampled from the training CSVs, once with the
+repetition of real traffic and once with every URL made unique. Every
+builder must produce the same text. The report is written as JSON under
+``PATHS["rfc_benchmarks_folder"]``.
+
+Run from the repository root::
+
+    python -m backend.utils.rfc.feature_text_benchmark --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from ..path_config import PATHS
+from .canonical import FEATURE_FIELDS, canonicalize_field, canonicalize_frame
+from . import feature_text
+from .feature_text import combined_text
+
+
+def _row_wise_apply(frame: pd.DataFrame) -> pd.Series:
+    # DataFrame.apply with a per-row join, as the trainers used to do
+    fields = list(FEATURE_FIELDS)
+
+    def combine(row: pd.Series) -> str:
+        return " ".join(
+            canonicalize_field("" if pd.isna(row[field]) else str(row[field]), field) for field in fields
+        )
+
+    return frame.apply(combine, axis=1)
+
+
+def _row_wise_agg(frame: pd.DataFrame) -> pd.Series:
+    # Canonical columns first, then agg(" ".join, axis=1)
+    return canonicalize_frame(frame, FEATURE_FIELDS).agg(" ".join, axis=1)
+
+
+def _str_cat(frame: pd.DataFrame) -> pd.Series:
+    # Canonical columns first, then Series.str.cat
+    columns = canonicalize_frame(frame, FEATURE_FIELDS)
+    first, *rest = FEATURE_FIELDS
+    return columns[first].str.cat([columns[field] for field in rest], sep=" ")
+
+
+BUILDERS = {
+    "row_wise_apply": _row_wise_apply,
+    "row_wise_agg": _row_wise_agg,
+    "str_cat": _str_cat,
+    "combined_text": combined_text,
+}
+
+
+def _benchmark_frame(sources: List[Path], n_rows: int, distinct_urls: bool, seed: int = 42) -> pd.DataFrame:
+    """``n_rows`` requests sampled from ``sources``; optionally every URL made unique."""
+    pool = pd.concat([pd.read_csv(path, usecols=lambda c: c in FEATURE_FIELDS) for path in sources], ignore_index=True)
+    frame = pool.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    if distinct_urls:
+        suffix = pd.Series(np.arange(n_rows), dtype=str)
+        frame["url"] = frame["url"].fillna("").astype(str) + "/r" + suffix
+    return frame
+
+
+def run_benchmark(
+    n_rows: int = 1_000_000,
+    builders: Iterable[str] | None = None,
+    output_dir: Path | None = None,
+) -> Dict[str, Any]:
+    """Time every builder on ``n_rows`` sampled requests, with repeated and with distinct URLs.
+
+    The training CSVs under ``PATHS["rfc_python_train_input"]`` are resampled
+    to ``n_rows``; the report is written as JSON to ``output_dir``
+    (``PATHS["rfc_benchmarks_folder"]`` by default).
+    """
+    sources = sorted(Path(PATHS["rfc_python_train_input"]).glob("*_predictions.csv"))
+    if not sources:
+        raise FileNotFoundError(f"No prediction files in {PATHS['rfc_python_train_input']}")
+    names = list(builders or BUILDERS)
+    report: Dict[str, Any] = {
+        "rows": n_rows,
+        "sources": [path.name for path in sources],
+        "pyarrow": feature_text.pa is not None,
+        "datasets": {},
+    }
+    for dataset, distinct_urls in (("repeated", False), ("distinct_urls", True)):
+        frame = _benchmark_frame(sources, n_rows, distinct_urls)
+        results: Dict[str, Any] = {}
+        reference = None
+        for name in names:
+            start = time.perf_counter()
+            text = BUILDERS[name](frame)
+            seconds = time.perf_counter() - start
+            # Compare values only: pandas may return "str" or object dtype
+            text = text.astype(object)
+            if reference is None:
+                reference = text
+            results[name] = {
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(n_rows / seconds) if seconds > 0 else None,
+                "identical": bool(text.equals(reference)),
+            }
+            print(f"{dataset:>13} {name:>15}: {seconds:8.3f} s  {n_rows / seconds:>12,.0f} rows/s", flush=True)
+        baseline = results[names[0]]["seconds"]
+        for result in results.values():
+            result["speedup"] = round(baseline / result["seconds"], 1) if result["seconds"] else None
+        report["datasets"][dataset] = {"distinct_rows": int(frame.drop_duplicates().shape[0]), "builders": results}
+
+    output_dir = Path(output_dir or PATHS["rfc_benchmarks_folder"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"feature_text_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    report["report_file"] = str(path)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the combined feature text builders")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--builders", help=f"Comma-separated subset of {', '.join(BUILDERS)}")
+    args = parser.parse_args()
+    report = run_benchmark(args.rows, args.builders.split(",") if args.builders else None)
+    print(f"Report written to {report['report_file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Latency- and size-aware sub-forest selection for the generated C classifier.
+
+A pool of trees is trained, and every candidate configuration (a depth limit
+plus the first ``k`` trees of a greedy order) is scored by how often its
+hard-voted prediction agrees with the full pool on a validation split. Each
+candidate's cost is estimated from the nodes it visits per record and the
+nodes it stores, using a linear model calibrated by compiling and timing
+two real variants (see ``codegen_manual``).
+
+The selected configuration is returned as ``SubForest`` objects that expose
+the parts of the sklearn API the C emitter reads (``estimators_[i].tree_``
+arrays and ``classes_``), so every forest layout can emit it unchanged.
+Depth limits turn the nodes at that depth into leaves predicting the
+majority class of their training samples.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Depth limits tried besides the unlimited trees
+DEFAULT_DEPTHS = (24, 16, 12, 8, 6, 4, 3, 2)
+LEAF = -2
+# Rows densified at a time when walking trees
+_CHUNK_ROWS = 4096
+
+
+@dataclass
+class TreeView:
+    """The arrays of an sklearn ``Tree`` that the code generator uses."""
+
+    feature: np.ndarray
+    threshold: np.ndarray
+    children_left: np.ndarray
+    children_right: np.ndarray
+    value: np.ndarray
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+
+@dataclass
+class _Estimator:
+    tree_: TreeView
+
+
+@dataclass
+class SubForest:
+    """Selected trees of a forest; ``predict`` uses hard voting like the generated C."""
+
+    estimators_: List[_Estimator]
+    classes_: Any
+    n_classes: List[int] = field(default_factory=list)
+
+    @property
+    def joint(self) -> bool:
+        return isinstance(self.classes_, list)
+
+    def predict(self, X: Any) -> np.ndarray:
+        leaves = [tree_class_ids(e.tree_, self.classes_, X)[0] for e in self.estimators_]
+        outputs = [
+            hard_vote([leaf[output] for leaf in leaves], n)
+            for output, n in enumerate(self.n_classes)
+        ]
+        return np.column_stack(outputs) if self.joint else outputs[0]
+
+
+def truncate_tree(tree: Any, max_depth: int | None) -> TreeView:
+    """Copy of ``tree`` with the nodes at ``max_depth`` turned into leaves (pre-order, renumbered)."""
+    feature, left, right = [], [], []
+    source = []
+    stack = [(0, 0, None, None)]  # (node, depth, parent index, is_left)
+    while stack:
+        node, depth, parent, is_left = stack.pop()
+        index = len(feature)
+        source.append(node)
+        if parent is not None:
+            (left if is_left else right)[parent] = index
+        if tree.feature[node] != LEAF and (max_depth is None or depth < max_depth):
+            feature.append(int(tree.feature[node]))
+            left.append(-1)
+            right.append(-1)
+            stack.append((tree.children_right[node], depth + 1, index, False))
+            stack.append((tree.children_left[node], depth + 1, index, True))
+        else:
+            feature.append(LEAF)
+            left.append(-1)
+            right.append(-1)
+    source = np.asarray(source)
+    return TreeView(
+        feature=np.asarray(feature, dtype=np.int64),
+        threshold=np.where(np.asarray(feature) == LEAF, -2.0, tree.threshold[source]),
+        children_left=np.asarray(left, dtype=np.int64),
+        children_right=np.asarray(right, dtype=np.int64),
+        value=tree.value[source],
+    )
+
+
+def _leaf_classes(tree: TreeView, classes: Any) -> List[np.ndarray]:
+    """Class id predicted at every node, per output."""
+    if isinstance(classes, list):
+        return [
+            np.asarray(c)[tree.value[:, output, :len(c)].argmax(axis=1)].astype(np.int64)
+            for output, c in enumerate(classes)
+        ]
+    return [np.asarray(classes)[tree.value[:, 0, :].argmax(axis=1)].astype(np.int64)]
+
+
+def tree_class_ids(tree: TreeView, classes: Any, X: Any) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Per-output class ids of every row of the binary matrix ``X``, and nodes visited per row."""
+    per_node = _leaf_classes(tree, classes)
+    n_rows = X.shape[0]
+    reached = np.empty(n_rows, dtype=np.int64)
+    visits = np.zeros(n_rows, dtype=np.int64)
+    for start in range(0, n_rows, _CHUNK_ROWS):
+        chunk = X[start:start + _CHUNK_ROWS]
+        dense = np.asarray(chunk.todense() if hasattr(chunk, "todense") else chunk) > 0.5
+        node = np.zeros(len(dense), dtype=np.int64)
+        steps = np.ones(len(dense), dtype=np.int64)
+        rows = np.arange(len(dense))
+        active = tree.feature[node] != LEAF
+        while active.any():
+            idx = rows[active]
+            present = dense[idx, tree.feature[node[idx]]]
+            node[idx] = np.where(present, tree.children_right[node[idx]], tree.children_left[node[idx]])
+            steps[idx] += 1
+            active = tree.feature[node] != LEAF
+        reached[start:start + len(dense)] = node
+        visits[start:start + len(dense)] = steps
+    return [ids[reached] for ids in per_node], visits
+
+
+def hard_vote(predictions: Sequence[np.ndarray], n_classes: int) -> np.ndarray:
+    """Majority class per row; ties go to the lowest class id, as in the generated C."""
+    votes = np.zeros((len(predictions[0]), n_classes), dtype=np.int64)
+    rows = np.arange(len(predictions[0]))
+    for pred in predictions:
+        np.add.at(votes, (rows, pred), 1)
+    return votes.argmax(axis=1)
+
+
+@dataclass
+class _Head:
+    """Per-tree predictions of one output at one depth limit."""
+
+    preds: np.ndarray  # (trees, rows)
+    reference: np.ndarray  # full-pool prediction per row
+    n_classes: int
+
+
+def _greedy_order(heads: List[_Head]) -> Tuple[List[int], List[float]]:
+    """Order trees by greedy forward selection of mean agreement with the reference."""
+    n_trees, n_rows = heads[0].preds.shape
+    rows = np.arange(n_rows)
+    votes = [np.zeros((n_rows, h.n_classes), dtype=np.int64) for h in heads]
+    chosen: List[int] = []
+    agreement: List[float] = []
+    remaining = list(range(n_trees))
+    while remaining:
+        best, best_score = remaining[0], -1.0
+        for t in remaining:
+            score = 0.0
+            for h, v in zip(heads, votes):
+                trial = v.copy()
+                trial[rows, h.preds[t]] += 1
+                score += float(np.mean(trial.argmax(axis=1) == h.reference))
+            if score > best_score:
+                best, best_score = t, score
+        for h, v in zip(heads, votes):
+            v[rows, h.preds[best]] += 1
+        chosen.append(best)
+        agreement.append(best_score / len(heads))
+        remaining.remove(best)
+    return chosen, agreement
+
+
+class ForestPruner:
+    """Score sub-forests of ``forests`` on a validation split.
+
+    Args:
+        forests: {"service": rf, "activity": rf} or {"joint": multi-output rf}
+        label_counts: Number of classes per head (service, activity), for voting
+        X_val: Binary validation features
+        X_test: Binary test features, for the accuracy column
+        y_test: True (service, activity) class ids of ``X_test``
+        depths: Depth limits to try besides unlimited
+    """
+
+    def __init__(
+        self,
+        forests: Dict[str, Any],
+        label_counts: Tuple[int, int],
+        X_val: Any,
+        X_test: Any,
+        y_test: Tuple[np.ndarray, np.ndarray],
+        depths: Sequence[int] = DEFAULT_DEPTHS,
+    ) -> None:
+        self.forests = forests
+        self.joint = "joint" in forests
+        self.label_counts = label_counts
+        self.X_val = X_val
+        self.X_test = X_test
+        self.y_test = y_test
+        pool_depth = max(e.tree_.max_depth for f in forests.values() for e in f.estimators_)
+        self.depths: List[int | None] = [None] + [d for d in depths if d < pool_depth]
+        self._views: Dict[Tuple[str, int | None], List[TreeView]] = {}
+
+    # Heads as (forest name, output index, head index)
+    def _outputs(self) -> List[Tuple[str, int, int]]:
+        if self.joint:
+            return [("joint", 0, 0), ("joint", 1, 1)]
+        return [("service", 0, 0), ("activity", 0, 1)]
+
+    def views(self, name: str, depth: int | None) -> List[TreeView]:
+        key = (name, depth)
+        if key not in self._views:
+            self._views[key] = [truncate_tree(e.tree_, depth) for e in self.forests[name].estimators_]
+        return self._views[key]
+
+    def _predict_trees(self, depth: int | None, X: Any) -> Tuple[Dict[Tuple[str, int], np.ndarray], np.ndarray]:
+        """Per-tree predictions (trees, rows) per (forest, output) and visits (trees, rows) summed over forests."""
+        preds: Dict[Tuple[str, int], List[np.ndarray]] = {}
+        visits = None
+        for name, forest in self.forests.items():
+            forest_visits = []
+            for view in self.views(name, depth):
+                ids, steps = tree_class_ids(view, forest.classes_, X)
+                for output, pred in enumerate(ids):
+                    preds.setdefault((name, output), []).append(pred)
+                forest_visits.append(steps)
+            stacked = np.asarray(forest_visits)
+            visits = stacked if visits is None else visits + stacked
+        return {key: np.asarray(p) for key, p in preds.items()}, visits
+
+    def candidates(self) -> List[Dict[str, Any]]:
+        """Every (depth, k) configuration with its agreement, accuracy and node counts."""
+        val_full, _ = self._predict_trees(None, self.X_val)
+        reference = {
+            (name, output): hard_vote(list(val_full[(name, output)]), self.label_counts[head])
+            for name, output, head in self._outputs()
+        }
+        rows: List[Dict[str, Any]] = []
+        for depth in self.depths:
+            val_preds, val_visits = self._predict_trees(depth, self.X_val)
+            test_preds, _ = self._predict_trees(depth, self.X_test)
+            heads = [
+                _Head(val_preds[(name, output)], reference[(name, output)], self.label_counts[head])
+                for name, output, head in self._outputs()
+            ]
+            order, agreement = _greedy_order(heads)
+            stored = {name: np.array([v.node_count for v in self.views(name, depth)]) for name in self.forests}
+            for k in range(1, len(order) + 1):
+                chosen = order[:k]
+                accuracy = [
+                    float(np.mean(hard_vote(list(test_preds[(name, output)][chosen]), self.label_counts[head])
+                                  == self.y_test[head]))
+                    for name, output, head in self._outputs()
+                ]
+                rows.append({
+                    "max_depth": depth,
+                    "trees": k,
+                    "tree_indices": [int(t) for t in chosen],
+                    "nodes": int(sum(stored[name][chosen].sum() for name in self.forests)),
+                    "nodes_visited": round(float(val_visits[chosen].sum(axis=0).mean()), 2),
+                    "agreement": round(agreement[k - 1], 4),
+                    "service_accuracy": round(accuracy[0], 4),
+                    "activity_accuracy": round(accuracy[1], 4),
+                })
+        return rows
+
+    def sub_forests(self, row: Dict[str, Any]) -> Dict[str, SubForest]:
+        """The forests of one candidate row, ready for ``tree_to_c_code``."""
+        result = {}
+        for name, forest in self.forests.items():
+            views = self.views(name, row["max_depth"])
+            n_classes = list(self.label_counts) if self.joint else [
+                self.label_counts[0 if name == "service" else 1]
+            ]
+            result[name] = SubForest(
+                estimators_=[_Estimator(views[t]) for t in row["tree_indices"]],
+                classes_=forest.classes_,
+                n_classes=n_classes,
+            )
+        return result
+
+
+@dataclass
+class CostModel:
+    """ns/record and binary bytes as linear functions of visited and stored nodes."""
+
+    base_ns: float
+    ns_per_node: float
+    base_bytes: float
+    bytes_per_node: float
+
+    @classmethod
+    def fit(cls, points: List[Tuple[float, float, float, float]]) -> "CostModel":
+        """Fit from two measured (nodes_visited, ns_per_record, nodes, binary_bytes) points."""
+        (v1, ns1, n1, b1), (v2, ns2, n2, b2) = points
+        ns_per_node = max(0.0, (ns2 - ns1) / (v2 - v1)) if v2 != v1 else 0.0
+        bytes_per_node = max(0.0, (b2 - b1) / (n2 - n1)) if n2 != n1 else 0.0
+        return cls(
+            base_ns=ns1 - ns_per_node * v1,
+            ns_per_node=ns_per_node,
+            base_bytes=b1 - bytes_per_node * n1,
+            bytes_per_node=bytes_per_node,
+        )
+
+    def annotate(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row["est_ns_per_record"] = round(self.base_ns + self.ns_per_node * row["nodes_visited"], 1)
+        row["est_binary_bytes"] = int(self.base_bytes + self.bytes_per_node * row["nodes"])
+        return row
+
+
+def pareto_front(
+    rows: List[Dict[str, Any]], cost: str = "est_ns_per_record", score: str = "agreement"
+) -> List[Dict[str, Any]]:
+    """Rows not beaten on both ``score`` (higher is better) and ``cost``, cheapest first."""
+    front: List[Dict[str, Any]] = []
+    best = -float("inf")
+    for row in sorted(rows, key=lambda r: (r[cost], -r[score])):
+        if row[score] > best:
+            front.append(row)
+            best = row[score]
+    return front
+
+
+def select(
+    rows: List[Dict[str, Any]],
+    budget_ns: float | None = None,
+    budget_bytes: int | None = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """Most agreeing row within the budgets (ties: fastest); falls back to the fastest row.
+
+    Returns the row and whether it meets the budgets.
+    """
+    fits = [
+        r for r in rows
+        if (budget_ns is None or r["est_ns_per_record"] <= budget_ns)
+        and (budget_bytes is None or r["est_binary_bytes"] <= budget_bytes)
+    ]
+    if not fits:
+        return min(rows, key=lambda r: (r["est_ns_per_record"], r["est_binary_bytes"])), False
+    return max(fits, key=lambda r: (r["agreement"], -r["est_ns_per_record"], -r["nodes"])), True
@@ -0,0 +1,359 @@
+"""Latency-aware hyperparameter sweep of the RFC models.
+
+Trains a grid of (vectorizer, max_features, max_depth, n_estimators) on the
+training CSVs and measures for every point the validation accuracy of both
+heads and real inference latency:
+
+* Python: single-request latency (vectorize, then ``predict_proba`` of both
+  forests as ``predict_rfc_python`` does; p50 and p95) and batch time per
+  record.
+* C: ns/record of the generated classifier, compiled and run in ``--bench``
+  mode (``c_build.benchmark_sources``). The generated code tests feature
+  presence, so only binary-vectorizer points can be measured. Compiling is
+  the slow part and the C cost grows with the nodes visited per record
+  (``forest_pruning.CostModel``), so only points on the accuracy / visited
+  nodes front of their vocabulary size are compiled, at most
+  ``max_c_builds`` of them.
+
+Forests are fitted once per (vectorizer, max_features, max_depth) with the
+largest tree count, within the ``n_jobs`` core budget (``parallel_fit.py``).
+Random forests draw their tree seeds in order, so the first ``n`` trees are
+exactly the forest ``n_estimators=n`` would fit, and every smaller point is
+evaluated on a prefix.
+
+The report holds every point, the Pareto front of accuracy (mean of both
+heads) against latency per engine, and the selected point: the most
+accurate one within the latency budget or, without a budget, the fastest
+one within ``accuracy_tolerance`` of the most accurate. The selections are
+saved as the trainers' defaults (``training_defaults.py``) and the report
+as JSON under ``PATHS["rfc_benchmarks_folder"]``.
+
+Run from the repository root::
+
+    python -m backend.utils.rfc.hyperparameter_sweep --n-jobs -1
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import itertools
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from ..path_config import PATHS
+from ..log_sink import emit as _status
+from .c_build import benchmark_sources
+from .canonical import FEATURE_FIELDS
+from .codegen_manual import tree_to_c_code
+from .dataset_cache import COMBINED, encode_labels, load_dataset
+from .forest_pruning import pareto_front
+from .parallel_fit import fit_forests
+from .training_defaults import ENGINES, VECTORIZERS, make_vectorizer, save_training_defaults
+
+DEFAULT_GRID: Dict[str, Tuple[Any, ...]] = {
+    "vectorizer": ("binary", "tfidf"),
+    "max_features": (127, 1000, 5000),
+    "max_depth": (None, 32, 16, 8),
+    "n_estimators": (5, 10, 25, 50, 100, 150),
+}
+ACCURACY_TOLERANCE = 0.005
+MAX_C_BUILDS = 16
+LATENCY_KEYS = {"python": "python_p50_us", "c": "c_ns_per_record"}
+HEADS = ("service", "activity")
+
+
+def _prefix(forest: RandomForestClassifier, n_trees: int) -> RandomForestClassifier:
+    """The forest of the first ``n_trees`` trees of ``forest``."""
+    sub = copy.copy(forest)
+    sub.estimators_ = forest.estimators_[:n_trees]
+    sub.n_estimators = n_trees
+    sub.n_jobs = None
+    return sub
+
+
+def _prefix_accuracy(forest: RandomForestClassifier, X: Any, y: np.ndarray, sizes: Sequence[int]) -> Dict[int, float]:
+    """Accuracy of every prefix size, summing the per-tree probabilities once."""
+    total = np.zeros((X.shape[0], len(forest.classes_)))
+    accuracy = {}
+    for i, tree in enumerate(forest.estimators_, start=1):
+        total += tree.predict_proba(X, check_input=False)
+        if i in sizes:
+            accuracy[i] = float(np.mean(forest.classes_[total.argmax(axis=1)] == y))
+    return accuracy
+
+
+def _tree_costs(forest: RandomForestClassifier, X: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Node count and mean nodes visited per record of every tree."""
+    nodes = np.array([tree.tree_.node_count for tree in forest.estimators_])
+    visited = np.array([tree.decision_path(X, check_input=False).sum() / X.shape[0] for tree in forest.estimators_])
+    return nodes, visited
+
+
+def _python_latency(vectorizer: Any, forests: Sequence[Any], texts: np.ndarray, samples: int) -> Dict[str, float]:
+    """Single-request p50/p95 and batch time per record, in microseconds."""
+    timings = []
+    for i in np.unique(np.linspace(0, len(texts) - 1, num=min(samples, len(texts)), dtype=int)):
+        start = time.perf_counter()
+        X = vectorizer.transform([texts[i]])
+        for forest in forests:
+            forest.predict_proba(X)
+        timings.append((time.perf_counter() - start) * 1e6)
+    start = time.perf_counter()
+    X = vectorizer.transform(texts)
+    for forest in forests:
+        forest.predict_proba(X)
+    batch = (time.perf_counter() - start) * 1e6 / len(texts)
+    return {
+        "python_p50_us": round(float(np.percentile(timings, 50)), 1),
+        "python_p95_us": round(float(np.percentile(timings, 95)), 1),
+        "python_batch_us_per_record": round(batch, 2),
+    }
+
+
+def _c_candidates(points: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Binary points on the accuracy / visited nodes front of their vocabulary size, at most ``limit``."""
+    candidates: List[Dict[str, Any]] = []
+    binary = [p for p in points if p["vectorizer"] == "binary"]
+    for _, group in itertools.groupby(sorted(binary, key=lambda p: p["max_features"]), key=lambda p: p["max_features"]):
+        candidates += pareto_front(list(group), cost="nodes_visited", score="accuracy")
+    candidates.sort(key=lambda p: p["nodes_visited"])
+    if len(candidates) > limit:
+        keep = np.unique(np.linspace(0, len(candidates) - 1, num=limit, dtype=int))
+        candidates = [candidates[i] for i in keep]
+    return candidates
+
+
+def _select(
+    front: List[Dict[str, Any]], latency: str, budget: float | None, tolerance: float
+) -> Tuple[Dict[str, Any], bool]:
+    """Point to use from a front (cheapest first) and whether it meets the budget."""
+    if budget is not None:
+        fits = [p for p in front if p[latency] <= budget]
+        if not fits:
+            return front[0], False
+        return max(fits, key=lambda p: (p["accuracy"], -p[latency])), True
+    best = max(p["accuracy"] for p in front)
+    return next(p for p in front if p["accuracy"] >= best - tolerance), True
+
+
+def _describe(point: Dict[str, Any]) -> str:
+    return (
+        f"{point['vectorizer']:>6} {point['max_features']:>5} feats  depth {str(point['max_depth'] or '-'):>3}  "
+        f"{point['n_estimators']:>3} trees"
+    )
+
+
+def run_sweep(
+    grid: Dict[str, Sequence[Any]] | None = None,
+    engines: Sequence[str] | None = None,
+    n_jobs: int | None = 1,
+    latency_samples: int = 100,
+    budget_us: float | None = None,
+    budget_ns: float | None = None,
+    accuracy_tolerance: float = ACCURACY_TOLERANCE,
+    max_c_builds: int = MAX_C_BUILDS,
+    save_defaults: bool = True,
+    logs: List[str] | None = None,
+) -> Dict[str, Any]:
+    """Sweep the grid, report the Pareto fronts and save the selections as training defaults.
+
+    Args:
+        grid: Values per hyperparameter overriding ``DEFAULT_GRID``
+        engines: Subset of ("python", "c") to measure and select for
+        n_jobs: Threads for fitting, -1 for all cores
+        latency_samples: Validation records timed one by one per point
+        budget_us: Python single-request p50 budget in microseconds
+        budget_ns: C budget in ns/record
+        accuracy_tolerance: Without a budget, accuracy the fastest selected
+            point may give up against the most accurate one
+        max_c_builds: Most C classifiers compiled and benchmarked
+        save_defaults: Save the selections with ``save_training_defaults``
+        logs: Optional sink for status messages
+    """
+    grid = {**DEFAULT_GRID, **{key: tuple(values) for key, values in (grid or {}).items() if values}}
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters {sorted(unknown)}; choose from {list(DEFAULT_GRID)}")
+    if set(grid["vectorizer"]) - set(VECTORIZERS):
+        raise ValueError(f"Unknown vectorizers in {grid['vectorizer']}; choose from {VECTORIZERS}")
+    engines = list(engines or ENGINES)
+    if set(engines) - set(ENGINES):
+        raise ValueError(f"Unknown engines {engines}; choose from {ENGINES}")
+
+    sources = sorted(Path(PATHS["rfc_python_train_input"]).glob("*_predictions.csv"))
+    if not sources:
+        raise FileNotFoundError(f"No prediction files in {PATHS['rfc_python_train_input']}")
+    df = load_dataset(sources, logs)
+    encoders, labels = {}, {}
+    for head, column in zip(HEADS, ("service", "activityType")):
+        encoders[head], labels[head] = encode_labels(df[column])
+    train_idx, val_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    texts = df[COMBINED].to_numpy(dtype=object)
+    val_texts = texts[val_idx]
+    sizes = sorted(set(grid["n_estimators"]))
+    groups = list(itertools.product(grid["vectorizer"], grid["max_features"], grid["max_depth"]))
+    _status(
+        f"Sweeping {len(groups) * len(sizes)} configurations ({len(groups)} forest pairs of {sizes[-1]} trees) "
+        f"on {len(train_idx)} training and {len(val_idx)} validation samples",
+        logs,
+    )
+
+    points: List[Dict[str, Any]] = []
+    models: Dict[int, Tuple[Any, Dict[str, Any]]] = {}
+    training = []
+    for vectorizer_name, max_features in itertools.product(grid["vectorizer"], grid["max_features"]):
+        vectorizer = make_vectorizer({"vectorizer": vectorizer_name, "max_features": max_features})
+        X_train = vectorizer.fit_transform(texts[train_idx])
+        X_val = vectorizer.transform(val_texts).astype(np.float32).tocsr()
+        for max_depth in grid["max_depth"]:
+            specs = {
+                head: (RandomForestClassifier(n_estimators=sizes[-1], max_depth=max_depth, random_state=42),
+                       labels[head][train_idx])
+                for head in HEADS
+            }
+            forests, metrics = fit_forests(specs, X_train, n_jobs=n_jobs, log=logs)
+            training.append({"vectorizer": vectorizer_name, "max_features": max_features, "max_depth": max_depth,
+                             "wall_seconds": metrics["wall_seconds"]})
+            accuracy = {head: _prefix_accuracy(forests[head], X_val, labels[head][val_idx], sizes) for head in HEADS}
+            costs = {head: _tree_costs(forests[head], X_val) for head in HEADS}
+            for n_trees in sizes:
+                point: Dict[str, Any] = {
+                    "vectorizer": vectorizer_name,
+                    "max_features": max_features,
+                    "vocabulary_size": len(vectorizer.vocabulary_),
+                    "max_depth": max_depth,
+                    "n_estimators": n_trees,
+                    "service_accuracy": round(accuracy["service"][n_trees], 4),
+                    "activity_accuracy": round(accuracy["activity"][n_trees], 4),
+                    "accuracy": round((accuracy["service"][n_trees] + accuracy["activity"][n_trees]) / 2, 4),
+                    "nodes": int(sum(costs[head][0][:n_trees].sum() for head in HEADS)),
+                    "nodes_visited": round(float(sum(costs[head][1][:n_trees].sum() for head in HEADS)), 1),
+                }
+                subs = {head: _prefix(forests[head], n_trees) for head in HEADS}
+                if "python" in engines:
+                    point.update(_python_latency(vectorizer, list(subs.values()), val_texts, latency_samples))
+                models[id(point)] = (vectorizer, subs)
+                points.append(point)
+            _status(
+                f"{vectorizer_name} {max_features} features, depth {max_depth or 'unlimited'}: "
+                f"accuracy {points[-1]['accuracy']:.4f} with {sizes[-1]} trees "
+                f"(fitted in {metrics['wall_seconds']:.2f} s)",
+                logs,
+            )
+
+    if "c" in engines:
+        candidates = _c_candidates(points, max_c_builds)
+        if not candidates:
+            _status("No binary-vectorizer points to measure on the C engine", logs)
+        records = df.iloc[val_idx][list(FEATURE_FIELDS)].to_dict(orient="records")
+        label_encoders = {"service": encoders["service"], "activity": encoders["activity"]}
+        with tempfile.TemporaryDirectory(prefix="rfc-sweep-") as tmp:
+            for i, point in enumerate(candidates):
+                vectorizer, subs = models[id(point)]
+                source = Path(tmp) / f"sweep_{i}.c"
+                with open(source, "w") as f:
+                    tree_to_c_code(subs, vectorizer.get_feature_names_out(), label_encoders, vectorizer, None, file=f)
+                _status(f"C engine {i + 1}/{len(candidates)}: {_describe(point)}", logs)
+                measured = benchmark_sources({f"sweep_{i}": source}, records, logs=logs)[f"sweep_{i}"]
+                point.update({
+                    "c_ns_per_record": measured["ns_per_record"],
+                    "c_binary_size_bytes": measured["binary_size_bytes"],
+                    "c_compile_ms": measured["compile_ms"],
+                })
+
+    fronts, selected, budgets = {}, {}, {"python": budget_us, "c": budget_ns}
+    for engine in engines:
+        latency = LATENCY_KEYS[engine]
+        measured = [p for p in points if latency in p]
+        if not measured:
+            continue
+        fronts[engine] = pareto_front(measured, cost=latency, score="accuracy")
+        point, fits = _select(fronts[engine], latency, budgets[engine], accuracy_tolerance)
+        selected[engine] = {**point, "within_budget": fits}
+        unit = "us p50" if engine == "python" else "ns/record"
+        _status(f"{engine} Pareto front (accuracy vs {unit}):", logs)
+        for p in fronts[engine]:
+            _status(
+                f"  {_describe(p)}  accuracy {p['accuracy']:.4f}  {p[latency]:>9.1f} {unit}"
+                + ("  <- selected" if p is point else ""),
+                logs,
+            )
+        if not fits:
+            _status(f"Warning: no {engine} configuration meets the budget; selected the fastest one", logs)
+
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "sources": [path.name for path in sources],
+        "train_samples": len(train_idx),
+        "validation_samples": len(val_idx),
+        "grid": {key: list(values) for key, values in grid.items()},
+        "budgets": {"python_p50_us": budget_us, "c_ns_per_record": budget_ns},
+        "accuracy_tolerance": accuracy_tolerance,
+        "training": training,
+        "points": points,
+        "pareto": fronts,
+        "selected": selected,
+    }
+    out_file = Path(PATHS["rfc_benchmarks_folder"]) / f"sweep_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    out_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    report["report_file"] = str(out_file)
+    _status(f"Sweep report written to {out_file}", logs)
+
+    if save_defaults and selected:
+        path = save_training_defaults(selected, {"report": out_file.name})
+        report["defaults_file"] = str(path)
+        _status(f"Saved the selected configurations as training defaults in {path}", logs)
+    return report
+
+
+def _values(text: str | None, cast: Any) -> List[Any] | None:
+    if not text:
+        return None
+    return [None if v.strip().lower() == "none" else cast(v) for v in text.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep RFC hyperparameters for accuracy and latency")
+    parser.add_argument("--n-estimators", help="Comma-separated tree counts")
+    parser.add_argument("--max-depth", help="Comma-separated depth limits; 'none' for unlimited")
+    parser.add_argument("--max-features", help="Comma-separated vocabulary sizes")
+    parser.add_argument("--vectorizers", help="Comma-separated subset of " + ",".join(VECTORIZERS))
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated subset of " + ",".join(ENGINES))
+    parser.add_argument("--n-jobs", type=int, default=1, help="Threads for fitting; -1 for all cores")
+    parser.add_argument("--latency-samples", type=int, default=100, help="Records timed one by one per point")
+    parser.add_argument("--budget-us", type=float, help="Python single-request p50 budget in microseconds")
+    parser.add_argument("--budget-ns", type=float, help="C budget in ns/record")
+    parser.add_argument("--tolerance", type=float, default=ACCURACY_TOLERANCE, help="Accuracy to trade for speed")
+    parser.add_argument("--max-c-builds", type=int, default=MAX_C_BUILDS, help="Most C classifiers to compile")
+    parser.add_argument("--no-save-defaults", action="store_true", help="Report only; keep the training defaults")
+    args = parser.parse_args()
+    report = run_sweep(
+        grid={
+            "n_estimators": _values(args.n_estimators, int),
+            "max_depth": _values(args.max_depth, int),
+            "max_features": _values(args.max_features, int),
+            "vectorizer": _values(args.vectorizers, str),
+        },
+        engines=[e.strip() for e in args.engines.split(",") if e.strip()],
+        n_jobs=args.n_jobs,
+        latency_samples=args.latency_samples,
+        budget_us=args.budget_us,
+        budget_ns=args.budget_ns,
+        accuracy_tolerance=args.tolerance,
+        max_c_builds=args.max_c_builds,
+        save_defaults=not args.no_save_defaults,
+    )
+    print(json.dumps({"selected": report["selected"], "report_file": report["report_file"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Incremental (warm-start) retraining of the RFC Python models.
+
+The trainer keeps a manifest next to the model artifact listing every input
+CSV it has consumed (SHA-256, row count). When new files arrive, the saved
+models are updated instead of retrained:
+
+* the fitted vectorizer is reused as is, so new terms are out of vocabulary;
+* every forest grows by ``warm_start`` trees fitted on the new rows plus a
+  replay sample of consumed rows. The replay keeps the new trees on the
+  same class set as the old ones (a forest's trees must agree on
+  ``classes_``) and stops them from fitting only the newest traffic.
+
+A full retrain on all consumed files is done instead when
+
+* a consumed file changed,
+* the share of new-row tokens missing from the vocabulary exceeds
+  ``max_vocabulary_drift``,
+* the share of new rows with a label the models do not know exceeds
+  ``max_label_drift`` (below it those rows are skipped),
+* a known class has no replay row left, or
+* the forests would grow beyond ``max_trees``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "rfc_manifest.json"
+MANIFEST_FORMAT = 1
+MAX_VOCABULARY_DRIFT = 0.05
+MAX_LABEL_DRIFT = 0.01
+MAX_TREES = 400
+# Trees added per update are proportional to the new rows' share of all rows
+MIN_NEW_TREES = 10
+# History entries kept in the manifest
+HISTORY_LENGTH = 50
+
+
+def fingerprint(path: Path) -> Dict[str, Any]:
+    """SHA-256, size and data row count of a CSV file."""
+    digest = hashlib.sha256()
+    lines = 0
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+            lines += block.count(b"\n")
+    return {"sha256": digest.hexdigest(), "bytes": path.stat().st_size, "rows": max(0, lines - 1)}
+
+
+def load_manifest(path: Path) -> Dict[str, Any] | None:
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return manifest if manifest.get("format") == MANIFEST_FORMAT else None
+
+
+def save_manifest(
+    path: Path,
+    manifest: Dict[str, Any] | None,
+    consumed: Dict[str, Dict[str, Any]],
+    entry: Dict[str, Any],
+    replace: bool = False,
+) -> Dict[str, Any]:
+    """Record ``consumed`` files and a history ``entry``; ``replace`` forgets earlier files."""
+    now = datetime.now().isoformat(timespec="seconds")
+    files = {} if replace or manifest is None else dict(manifest["files"])
+    files.update({name: {**info, "consumed_at": now} for name, info in consumed.items()})
+    history = ([] if manifest is None else manifest.get("history", [])) + [{"at": now, **entry}]
+    updated = {"format": MANIFEST_FORMAT, "files": files, "history": history[-HISTORY_LENGTH:]}
+    path.write_text(json.dumps(updated, indent=2), encoding="utf-8")
+    return updated
+
+
+def vocabulary_drift(vectorizer: Any, texts: Iterable[str]) -> float:
+    """Share of token occurrences in ``texts`` that are not in the vectorizer's vocabulary."""
+    analyze = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    total = missing = 0
+    for text in texts:
+        for token in analyze(text):
+            total += 1
+            missing += token not in vocabulary
+    return missing / total if total else 0.0
+
+
+def known_label_mask(labels: Dict[str, pd.Series], known: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, List[str]]]:
+    """Rows whose labels are all in ``known``, and the unseen labels per head."""
+    mask = np.ones(len(next(iter(labels.values()))), dtype=bool)
+    unseen: Dict[str, List[str]] = {}
+    for head, values in labels.items():
+        head_known = values.isin(set(known[head])).to_numpy()
+        mask &= head_known
+        unseen[head] = sorted(set(values[~head_known]))
+    return mask, unseen
+
+
+def replay_sample(
+    frame: pd.DataFrame, label_columns: List[str], n_rows: int, random_state: int = 42
+) -> pd.DataFrame:
+    """``n_rows`` random rows of ``frame`` plus one row of every class they miss."""
+    sample = frame.sample(n=min(n_rows, len(frame)), random_state=random_state)
+    extra = []
+    for column in label_columns:
+        missing = set(frame[column]) - set(sample[column])
+        for value in sorted(missing):
+            extra.append(frame[frame[column] == value].head(1))
+    return pd.concat([sample, *extra]) if extra else sample
+
+
+def new_tree_count(base_trees: int, new_rows: int, total_rows: int) -> int:
+    """Trees to add for ``new_rows`` out of ``total_rows``, at least ``MIN_NEW_TREES``."""
+    return max(MIN_NEW_TREES, int(round(base_trees * new_rows / max(1, total_rows))))
+
+
+def grow(forest: Any, n_new: int) -> Any:
+    """Prepare ``forest`` so that its next ``fit`` adds ``n_new`` trees."""
+    return forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_new)
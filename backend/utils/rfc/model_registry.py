@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import joblib
+
+from ..path_config import PATHS
+from ..log_sink import emit as _status
+
+
+# Current format: one joblib holding a shared vectorizer, both forests and
+# both label encoders.
+MODEL_ARTIFACT = "rfc_models.joblib"
+MODEL_ARTIFACT_FORMAT = 2
+
+# Previous format: one vectorizer+forest pipeline per head and separate encoders.
+LEGACY_MODEL_FILES = {
+    "service_model": "service_classifier.joblib",
+    "activity_model": "activity_classifier.joblib",
+    "service_encoder": "service_encoder.joblib",
+    "activity_encoder": "activity_encoder.joblib",
+}
+
+# Representative request used to warm up freshly loaded models so that the
+# first real request does not pay for lazy initialisation inside sklearn.
+WARMUP_TEXT = (
+    "www.example.com https://www.example.com/api/v1/items GET none "
+    "application/json application/json none */*"
+)
+
+
+
+class JointHead:
+    """One output of a multi-output forest, usable where a single-head forest is expected.
+
+    ``predict_proba`` here still walks every tree; ``RfcModels.predict_proba``
+    is the single-traversal path for both heads.
+    """
+
+    def __init__(self, forest: Any, output: int) -> None:
+        self.forest = forest
+        self.output = output
+
+    @property
+    def classes_(self) -> Any:
+        return self.forest.classes_[self.output]
+
+    @property
+    def estimators_(self) -> List[Any]:
+        return self.forest.estimators_
+
+    def predict_proba(self, features: Any) -> Any:
+        return self.forest.predict_proba(features)[self.output]
+
+    def predict(self, features: Any) -> Any:
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
+
+
+@dataclass
+class RfcModels:
+    """Snapshot of the loaded RFC models and encoders.
+
+    ``service_model``/``activity_model`` are the bare forests. With the shared
+    artifact both heads use the same vectorizer, so ``transform`` computes the
+    feature matrix only once. Artifacts trained with ``joint=True`` hold one
+    multi-output forest (``joint_model``); the two heads are then
+    ``JointHead`` views of it.
+    """
+
+    service_vectorizer: Any
+    activity_vectorizer: Any
+    service_model: Any
+    activity_model: Any
+    service_encoder: Any
+    activity_encoder: Any
+    version: str
+    loaded_at: float = field(default_factory=time.time)
+    load_ms: float = 0.0
+    warmup_ms: float = 0.0
+    joint_model: Any = None
+    # Label of every predict_proba column, resolved once per snapshot
+    service_labels: Any = field(init=False, repr=False)
+    activity_labels: Any = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # forest.classes_ holds the encoded ids; map them to labels in one lookup table
+        self.service_labels = self.service_encoder.classes_[self.service_model.classes_.astype(int)].astype(str)
+        self.activity_labels = self.activity_encoder.classes_[self.activity_model.classes_.astype(int)].astype(str)
+
+    @property
+    def shared_vectorizer(self) -> bool:
+        return self.service_vectorizer is self.activity_vectorizer
+
+    def transform(self, texts: List[str]) -> Tuple[Any, Any]:
+        """Return the (service, activity) feature matrices for ``texts``."""
+        service_features = self.service_vectorizer.transform(texts)
+        if self.shared_vectorizer:
+            return service_features, service_features
+        return service_features, self.activity_vectorizer.transform(texts)
+
+    def predict_proba(self, service_features: Any, activity_features: Any) -> Tuple[Any, Any]:
+        """Return the (service, activity) class probabilities; one forest pass when joint."""
+        if self.joint_model is not None:
+            service_proba, activity_proba = self.joint_model.predict_proba(service_features)
+            return service_proba, activity_proba
+        return (
+            self.service_model.predict_proba(service_features),
+            self.activity_model.predict_proba(activity_features),
+        )
+
+
+class ModelRegistry:
+    """Process-wide holder for the RFC Python models.
+
+    Models are loaded once, warmed up and kept in memory. Every ``get`` call
+    checks (at most every ``check_interval`` seconds) whether the files under
+    ``models_dir`` changed and, if so, loads the new files and swaps the
+    snapshot atomically. Requests already holding the old snapshot finish with
+    it untouched.
+    """
+
+    def __init__(self, models_dir: str | Path | None = None, check_interval: float = 2.0) -> None:
+        self.models_dir = Path(models_dir or PATHS["rfc_python_inference_models"])
+        self.check_interval = check_interval
+        self._models: RfcModels | None = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._last_error: str | None = None
+
+    # ------------------------------------------------------------------ files
+    def _paths(self) -> Dict[str, Path]:
+        artifact = self.models_dir / MODEL_ARTIFACT
+        if artifact.exists():
+            return {"artifact": artifact}
+        return {key: self.models_dir / name for key, name in LEGACY_MODEL_FILES.items()}
+
+    def _signature(self) -> str | None:
+        """Return a version string derived from file names, sizes and mtimes."""
+        digest = hashlib.sha1()
+        for key, path in sorted(self._paths().items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                return None
+            digest.update(f"{key}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+
+    # ---------------------------------------------------------------- loading
+    def _load(self, version: str, logs: List[str] | None = None) -> RfcModels:
+        paths = self._paths()
+        missing = [str(p) for p in paths.values() if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"Missing model files: {missing}")
+
+        start = time.perf_counter()
+        if "artifact" in paths:
+            artifact = joblib.load(paths["artifact"])
+            if artifact.get("format") != MODEL_ARTIFACT_FORMAT:
+                raise ValueError(f"Unsupported RFC model artifact format: {artifact.get('format')}")
+            loaded = {
+                "service_vectorizer": artifact["vectorizer"],
+                "activity_vectorizer": artifact["vectorizer"],
+                "service_encoder": artifact["service_encoder"],
+                "activity_encoder": artifact["activity_encoder"],
+            }
+            joint = artifact.get("joint_model")
+            if joint is not None:
+                loaded.update(
+                    joint_model=joint, service_model=JointHead(joint, 0), activity_model=JointHead(joint, 1)
+                )
+            else:
+                loaded.update(service_model=artifact["service_model"], activity_model=artifact["activity_model"])
+        else:
+            legacy = {key: joblib.load(path) for key, path in paths.items()}
+            loaded = {
+                "service_vectorizer": legacy["service_model"][:-1],
+                "activity_vectorizer": legacy["activity_model"][:-1],
+                "service_model": legacy["service_model"][-1],
+                "activity_model": legacy["activity_model"][-1],
+                "service_encoder": legacy["service_encoder"],
+                "activity_encoder": legacy["activity_encoder"],
+            }
+        load_ms = (time.perf_counter() - start) * 1000.0
+
+        models = RfcModels(version=version, load_ms=load_ms, **loaded)
+        start = time.perf_counter()
+        models.predict_proba(*models.transform([WARMUP_TEXT]))
+        models.warmup_ms = (time.perf_counter() - start) * 1000.0
+
+        _status(
+            f"Loaded RFC models version {version} in {load_ms:.1f} ms (warm-up {models.warmup_ms:.1f} ms)",
+            logs,
+        )
+        return models
+
+    def load(self, force: bool = False, logs: List[str] | None = None) -> RfcModels:
+        """Load the models if they changed on disk (or unconditionally with ``force``)."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            version = self._signature()
+            if version is None:
+                self._last_error = "Model files not found"
+                if self._models is not None and not force:
+                    # Keep serving the last good snapshot while files are being replaced.
+                    return self._models
+                missing = [str(p) for p in self._paths().values() if not p.exists()]
+                raise FileNotFoundError(f"Missing model files: {missing}")
+            if not force and self._models is not None and self._models.version == version:
+                return self._models
+            try:
+                models = self._load(version, logs)
+            except Exception as exc:
+                self._last_error = str(exc)
+                if self._models is not None and not force:
+                    return self._models
+                raise
+            self._models = models
+            self._last_error = None
+            return models
+
+    def get(self, logs: List[str] | None = None) -> RfcModels:
+        """Return the current snapshot, reloading it when the files changed."""
+        models = self._models
+        if models is None or time.monotonic() - self._last_check >= self.check_interval:
+            return self.load(logs=logs)
+        return models
+
+    def reload(self, logs: List[str] | None = None) -> RfcModels:
+        """Force a reload from disk regardless of the file signature."""
+        return self.load(force=True, logs=logs)
+
+    # ----------------------------------------------------------------- status
+    @property
+    def ready(self) -> bool:
+        return self._models is not None
+
+    def status(self) -> Dict[str, Any]:
+        models = self._models
+        info: Dict[str, Any] = {
+            "ready": models is not None,
+            "models_dir": str(self.models_dir),
+            "error": self._last_error,
+        }
+        if models is not None:
+            info.update(
+                {
+                    "version": models.version,
+                    "loaded_at": models.loaded_at,
+                    "load_ms": round(models.load_ms, 2),
+                    "warmup_ms": round(models.warmup_ms, 2),
+                    "shared_vectorizer": models.shared_vectorizer,
+                    "joint": models.joint_model is not None,
+                }
+            )
+        return info
+
+
+registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    return registry
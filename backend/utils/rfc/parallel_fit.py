@@ -0,0 +1,154 @@
+"""Parallel fitting of the RFC forests.
+
+Both trainers fit one forest per head (or a single joint forest).
+``fit_forests`` fits them within a total core budget ``n_jobs``:
+
+* Without concurrency every forest builds its trees on all ``n_jobs``
+  threads, one forest after the other. With concurrent heads the forests are
+  fitted at the same time and the budget is split between them by tree count.
+* The feature matrix is converted once to the float32 CSC layout the tree
+  builder works on, so the forests share it instead of each validating its
+  own converted copy, and joblib is pinned to threads so no worker process
+  receives a pickled copy of it.
+
+Random forests draw their tree seeds up front, so the fitted models do not
+depend on ``n_jobs`` or on concurrency. ``n_jobs`` is reset to None once a
+forest is fitted.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from joblib import parallel_config
+
+from ..log_sink import emit as _status
+
+
+def available_cores() -> int:
+    """Cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def resolve_jobs(n_jobs: int | None) -> int:
+    """Number of threads for ``n_jobs`` with joblib semantics (-1 = all cores), capped at the cores."""
+    cores = available_cores()
+    if not n_jobs:
+        return 1
+    if n_jobs < 0:
+        return max(1, cores + 1 + n_jobs)
+    return min(n_jobs, cores)
+
+
+def partition_jobs(n_jobs: int, weights: Sequence[int]) -> List[int]:
+    """Split ``n_jobs`` threads between forests in proportion to ``weights``; each gets at least one."""
+    total = sum(weights)
+    shares = [max(1, int(n_jobs * w / total)) for w in weights]
+    # Hand out what rounding left over, largest forest first
+    for i in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        if sum(shares) >= n_jobs:
+            break
+        shares[i] += 1
+    return shares
+
+
+def shared_features(X: Any) -> Any:
+    """``X`` in the layout the tree builder uses (float32, CSC if sparse), converted once."""
+    if sp.issparse(X):
+        X = X.astype(np.float32, copy=False).tocsc()
+        X.sort_indices()
+        return X
+    return np.asarray(X, dtype=np.float32)
+
+
+def _nbytes(X: Any) -> int:
+    if sp.issparse(X):
+        return int(X.data.nbytes + X.indices.nbytes + X.indptr.nbytes)
+    return int(X.nbytes)
+
+
+def fit_forests(
+    forests: Dict[str, Tuple[Any, Any]],
+    X: Any,
+    n_jobs: int | None = 1,
+    concurrent: bool = True,
+    log: List[str] | None = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Fit every ``name: (forest, y)`` on ``X`` and measure wall-clock and CPU time.
+
+    Args:
+        forests: Unfitted forests and their targets by name
+        X: Training features shared by all forests
+        n_jobs: Total threads for the whole fit; -1 for all cores
+        concurrent: Fit the forests at the same time, splitting the threads
+        log: Optional list to collect log messages
+
+    Returns:
+        The fitted forests by name and the training metrics
+    """
+    jobs = resolve_jobs(n_jobs)
+    names = list(forests)
+    concurrent = concurrent and len(names) > 1 and jobs > 1
+    if concurrent:
+        shares = partition_jobs(jobs, [forests[name][0].n_estimators for name in names])
+    else:
+        shares = [jobs] * len(names)
+
+    X = shared_features(X)
+    fit_seconds: Dict[str, float] = {}
+    lock = threading.Lock()
+
+    def fit(name: str, share: int) -> Any:
+        forest, y = forests[name]
+        forest.set_params(n_jobs=share)
+        start = time.perf_counter()
+        # parallel_config is per thread, so every head sets it itself
+        with parallel_config(backend="threading"):
+            forest.fit(X, y)
+        # The share is a fit setting; saved models predict single requests
+        # and must not spread every predict_proba over that many threads
+        forest.set_params(n_jobs=None)
+        with lock:
+            fit_seconds[name] = round(time.perf_counter() - start, 3)
+        return forest
+
+    _status(
+        f"Fitting {', '.join(names)} on {jobs} of {available_cores()} cores"
+        + (f" concurrently ({'/'.join(map(str, shares))} threads)" if concurrent else ""),
+        log,
+    )
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            fitted = dict(zip(names, pool.map(fit, names, shares)))
+    else:
+        fitted = {name: fit(name, share) for name, share in zip(names, shares)}
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    metrics = {
+        "n_jobs": jobs,
+        "cores": available_cores(),
+        "concurrent_heads": concurrent,
+        "jobs_per_forest": dict(zip(names, shares)),
+        "fit_seconds": fit_seconds,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        # Average busy cores, and that as a share of the thread budget
+        "effective_cores": round(cpu / wall, 2) if wall > 0 else None,
+        "cpu_utilisation": round(cpu / (wall * jobs), 3) if wall > 0 else None,
+        "feature_matrix_bytes": _nbytes(X),
+    }
+    _status(
+        f"Fitted in {metrics['wall_seconds']:.2f} s wall, {metrics['cpu_seconds']:.2f} s CPU "
+        f"({metrics['effective_cores']} cores busy on average)",
+        log,
+    )
+    return fitted, metrics
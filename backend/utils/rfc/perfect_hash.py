@@ -0,0 +1,137 @@
+"""Minimal perfect hash (CHD, hash-and-displace) over a vectorizer vocabulary.
+
+Every term is hashed once with 64-bit FNV-1a. The high half picks a bucket,
+and each bucket stores one displacement ``d`` chosen at build time so that
+
+    slot = (f1 + (d / size) * f2 + d % size) % size
+
+sends every key of the bucket to a distinct, still free slot. ``f1`` and
+``f2`` are derived from the same hash. A lookup is therefore one hash, one
+displacement read and a single key comparison. The functions here mirror the
+C emitted by ``codegen_manual`` exactly.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+FNV64_OFFSET = 0xCBF29CE484222325
+FNV64_PRIME = 0x100000001B3
+GOLDEN64 = 0x9E3779B97F4A7C15
+MASK64 = 0xFFFFFFFFFFFFFFFF
+MASK32 = 0xFFFFFFFF
+
+# Average keys per bucket; higher means a smaller displacement table but a
+# longer search at build time.
+DEFAULT_BUCKET_LOAD = 4
+
+
+def fnv1a64(term: str) -> int:
+    h = FNV64_OFFSET
+    for c in term.encode("utf-8"):
+        h ^= c
+        h = (h * FNV64_PRIME) & MASK64
+    return h
+
+
+def _parts(h: int, size: int, n_buckets: int) -> tuple[int, int, int]:
+    bucket = ((h >> 32) & MASK32) % n_buckets
+    f1 = (h & MASK32) % size
+    f2 = ((((h * GOLDEN64) & MASK64) >> 32) & MASK32) % size
+    return bucket, f1, f2
+
+
+@dataclass
+class PerfectHash:
+    size: int
+    displacements: List[int]
+    slots: List[str]  # term stored in each slot, in slot order
+
+    @property
+    def n_buckets(self) -> int:
+        return len(self.displacements)
+
+    def slot(self, term: str) -> int:
+        bucket, f1, f2 = _parts(fnv1a64(term), self.size, self.n_buckets)
+        d = self.displacements[bucket]
+        return (f1 + (d // self.size) * f2 + d % self.size) % self.size
+
+    def lookup(self, term: str) -> int:
+        """Return the slot holding ``term`` or -1, exactly like the generated C."""
+        slot = self.slot(term)
+        return slot if self.slots[slot] == term else -1
+
+
+def _place(terms: List[str], size: int, bucket_load: int) -> PerfectHash | None:
+    """Try to place every term into a table of ``size`` slots."""
+    n_buckets = max(1, -(-len(terms) // bucket_load))
+    buckets: Dict[int, List[tuple[int, int, int]]] = {}
+    for key, term in enumerate(terms):
+        bucket, f1, f2 = _parts(fnv1a64(term), size, n_buckets)
+        buckets.setdefault(bucket, []).append((key, f1, f2))
+
+    occupied = np.zeros(size, dtype=bool)
+    slots: List[str] = [""] * size
+    displacements = [0] * n_buckets
+    offsets = np.arange(size)
+
+    # Largest buckets first, while the table is still mostly empty
+    for bucket, keys in sorted(buckets.items(), key=lambda item: len(item[1]), reverse=True):
+        f1 = np.array([k[1] for k in keys], dtype=np.int64)
+        f2 = np.array([k[2] for k in keys], dtype=np.int64)
+        placed = False
+        for d0 in range(size):
+            base = (f1 + d0 * f2) % size
+            if len(np.unique(base)) != len(base):
+                continue
+            # d1 is valid when every shifted position is free
+            valid = np.ones(size, dtype=bool)
+            for b in base:
+                valid &= ~occupied[(b + offsets) % size]
+            candidates = np.flatnonzero(valid)
+            if candidates.size == 0:
+                continue
+            d1 = int(candidates[0])
+            for (key, _, _), b in zip(keys, base):
+                slot = int((b + d1) % size)
+                occupied[slot] = True
+                slots[slot] = terms[key]
+            displacements[bucket] = d0 * size + d1
+            placed = True
+            break
+        if not placed:
+            return None
+    return PerfectHash(size=size, displacements=displacements, slots=slots)
+
+
+def build_perfect_hash(terms: List[str], bucket_load: int = DEFAULT_BUCKET_LOAD) -> PerfectHash:
+    """Build a (near-)minimal perfect hash for ``terms`` and verify every term resolves.
+
+    The table starts with exactly one slot per term. Only if two keys of a
+    bucket cannot be separated at that size is it grown by about 1%.
+
+    Raises
+    ------
+    ValueError
+        If the terms are not unique or no table could be built.
+    """
+    if not terms:
+        return PerfectHash(size=1, displacements=[0], slots=[""])
+    if len(set(terms)) != len(terms):
+        raise ValueError("Vocabulary terms must be unique")
+
+    size = len(terms)
+    for _ in range(32):
+        ph = _place(terms, size, bucket_load)
+        if ph is not None:
+            break
+        size += max(1, size // 100)
+    else:
+        raise ValueError(f"Could not build a perfect hash for {len(terms)} terms")
+
+    unresolved = [t for t in terms if ph.lookup(t) < 0]
+    if unresolved:
+        raise ValueError(f"{len(unresolved)} vocabulary terms do not resolve, e.g. {unresolved[:5]}")
+    return ph
@@ -0,0 +1,179 @@
+"""LRU/TTL cache of single-request predictions.
+
+Proxy traffic repeats the same host, method, path and content types over
+and over, so ``predict_rfc_python`` and ``predict_rfc_c`` look the request
+up here first. Keys are the eight feature fields after normalisation that
+cannot change a prediction: None and NaN become "", surrounding whitespace is
+stripped, the field is canonicalised (``canonical.py``, which both engines
+apply anyway) and lower-cased (both vectorizers lower-case and split on
+non-word characters). Optionally the query string and fragment
+of ``url`` and ``requestHeaders_Referer`` are dropped as well; that *can*
+change predictions and is therefore off by default.
+
+Each cache remembers the model version its entries were computed with and
+empties itself as soon as a different version is seen.
+
+Configuration (environment):
+    RFC_CACHE_SIZE         entries per engine, 0 disables caching (default 10000)
+    RFC_CACHE_TTL          seconds an entry stays valid, 0 = no expiry (default 600)
+    RFC_CACHE_STRIP_QUERY  "1" to drop query strings from URL fields
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from .canonical import FEATURE_FIELDS, URL_FIELDS, canonicalize_field
+
+
+def _field(value: Any, name: str) -> str:
+    # Both engines treat NaN like a missing field
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return canonicalize_field(str(value), name).strip().lower()
+
+
+def _strip_query(url: str) -> str:
+    for sep in ("?", "#"):
+        cut = url.find(sep)
+        if cut >= 0:
+            url = url[:cut]
+    return url
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry TTL and version-based invalidation."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 600.0, strip_query: bool = False) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.strip_query = strip_query
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._version: str | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, request: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Normalised 8-field signature of ``request``."""
+        fields = []
+        for name in FEATURE_FIELDS:
+            value = _field(request.get(name), name)
+            if self.strip_query and name in URL_FIELDS:
+                value = _strip_query(value)
+            fields.append(value)
+        return tuple(fields)
+
+    def _check_version(self, version: str) -> None:
+        # Caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(
+        self, request: Dict[str, Any], version: str, variant: Tuple = (), key: Tuple[Any, ...] | None = None
+    ) -> Dict[str, Any] | None:
+        """Return a copy of the cached prediction for ``request`` or None.
+
+        ``variant`` distinguishes output options (e.g. top-k) of the same request.
+        ``key`` is ``self.key(request)`` if the caller already computed it.
+        """
+        if not self.enabled:
+            return None
+        key = (self.key(request) if key is None else key) + variant
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(
+        self,
+        request: Dict[str, Any],
+        version: str,
+        value: Dict[str, Any],
+        variant: Tuple = (),
+        key: Tuple[Any, ...] | None = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        key = (self.key(request) if key is None else key) + variant
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "version": self._version,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "strip_query": self.strip_query,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def _from_env() -> PredictionCache:
+    return PredictionCache(
+        max_entries=int(os.getenv("RFC_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("RFC_CACHE_TTL", "600")),
+        strip_query=os.getenv("RFC_CACHE_STRIP_QUERY", "0").lower() in ("1", "true", "yes"),
+    )
+
+
+# One cache per engine; their model versions are unrelated
+_caches: Dict[str, PredictionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_prediction_cache(engine: str) -> PredictionCache:
+    """Return the process-wide cache for ``engine`` ("python" or "c")."""
+    with _caches_lock:
+        if engine not in _caches:
+            _caches[engine] = _from_env()
+        return _caches[engine]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _caches_lock:
+        caches = dict(_caches)
+    return {engine: cache.stats() for engine, cache in caches.items()}
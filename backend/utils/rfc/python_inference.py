@@ -1,224 +1,240 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
-import joblib
+import logging
 import time
+import numpy as np
 import pandas as pd
-from sklearn.pipeline import Pipeline
 
 from ..path_config import PATHS
+from ..log_sink import count, emit as _status
+from .canonical import FEATURE_FIELDS
+from .constants import DEFAULT_TOP_K
+from .feature_text import combined_record, combined_text, distinct_combined_text
+from .model_registry import get_registry
+from .prediction_cache import get_prediction_cache
+from .streaming import DEFAULT_CHUNK_SIZE, stream_file_predictions
 
-
-def _status(msg: str, sink: List[str] | None = None) -> None:
-    """Log status message to console and optional sink."""
-    if sink is not None:
-        sink.append(msg)
-    print(msg, flush=True)
+FEATURE_COLUMNS = list(FEATURE_FIELDS)
 
 
 def load_rfc_models() -> Dict[str, Any]:
-    """Load trained RFC models and encoders.
-    
+    """Return the trained RFC models and encoders from the model registry.
+
+    The registry keeps the models in memory and only re-reads the joblib
+    files when they change on disk.
+
     Returns:
         Dictionary containing loaded models and encoders
-        
+
     Raises:
         FileNotFoundError: If model files don't exist
     """
-    models_dir = Path(PATHS["rfc_python_inference_models"]) 
-    
-    model_files = {
-        "service_model": models_dir / "service_classifier.joblib",
-        "activity_model": models_dir / "activity_classifier.joblib", 
-        "service_encoder": models_dir / "service_encoder.joblib",
-        "activity_encoder": models_dir / "activity_encoder.joblib"
+    models = get_registry().get()
+    return {
+        "service_vectorizer": models.service_vectorizer,
+        "activity_vectorizer": models.activity_vectorizer,
+        "service_model": models.service_model,
+        "activity_model": models.activity_model,
+        "service_encoder": models.service_encoder,
+        "activity_encoder": models.activity_encoder,
     }
-    
-    # Check if all model files exist
-    missing_files = [str(path) for path in model_files.values() if not path.exists()]
-    if missing_files:
-        raise FileNotFoundError(f"Missing model files: {missing_files}")
-    
-    # Load all models
-    loaded_models = {}
-    for key, path in model_files.items():
-        loaded_models[key] = joblib.load(path)
-    
-    return loaded_models
+
+
+def top_k_classes(proba: np.ndarray, labels: np.ndarray, k: int) -> List[Dict[str, Any]]:
+    """The ``k`` most probable classes of one probability row, most probable first.
+
+    Ties go to the lower class index, as in the generated C classifier.
+    """
+    k = min(k, len(proba))
+    if k <= 0:
+        return []
+    # O(n) selection of the k-th largest; only the classes reaching it are sorted
+    threshold = np.partition(proba, len(proba) - k)[len(proba) - k]
+    best = np.flatnonzero(proba >= threshold)
+    best = best[np.argsort(-proba[best], kind="stable")][:k]
+    return [{"label": str(labels[i]), "probability": float(proba[i])} for i in best]
 
 
 def predict_rfc_python(
     request_data: Dict[str, Any], 
-    logs: List[str] | None = None
+    logs: List[str] | None = None,
+    top_k: int = DEFAULT_TOP_K,
+    probabilities: bool = False,
 ) -> Dict[str, Any]:
     """Perform inference using trained RFC models.
     
     Args:
         request_data: Dictionary containing request features
         logs: Optional list to collect log messages
+        top_k: Number of most probable classes to return per head (0 for none)
+        probabilities: Also return the full probability distribution of each head
         
     Returns:
         Dictionary containing predictions and confidence scores
     """
     try:
-        _status("Loading trained models...", logs)
-        models = load_rfc_models()
+        models = get_registry().get(logs)
         
-        service_model: Pipeline = models["service_model"]
-        activity_model: Pipeline = models["activity_model"]
-        service_encoder = models["service_encoder"]
-        activity_encoder = models["activity_encoder"]
+        _status(f"Using models version {models.version}", logs)
         
-        _status("Models loaded successfully", logs)
-        
-        # Extract and combine features from request data
-        features = [
-            request_data.get("headers_Host", ""),
-            request_data.get("url", ""),
-            request_data.get("method", ""),
-            request_data.get("requestHeaders_Origin", ""),
-            request_data.get("requestHeaders_Content_Type", ""),
-            request_data.get("responseHeaders_Content_Type", ""),
-            request_data.get("requestHeaders_Referer", ""),
-            request_data.get("requestHeaders_Accept", "")
-        ]
-        
-        # Combine features into a single string
-        combined_features = " ".join(str(f) if f else "" for f in features)
+        feature_count = sum(1 for field in FEATURE_FIELDS if request_data.get(field))
+        cache = get_prediction_cache("python")
+        variant = (top_k, probabilities)
+        # The key is computed once and serves both the lookup and the store
+        key = cache.key(request_data) if cache.enabled else None
+        cached = cache.get(request_data, models.version, variant, key=key)
+        if cached is not None:
+            _status("Prediction cache hit", logs)
+            cached["feature_count"] = feature_count
+            return cached
+
+        # Canonicalise the features as in training and combine them into a single string
+        combined_features = combined_record(request_data)
         _status(f"Combined features: {combined_features[:100]}...", logs)
         
-        # Make predictions
+        # Make predictions: one predict_proba per forest, the prediction is its argmax
         _status("Making predictions...", logs)
+        service_proba, activity_proba = models.predict_proba(*models.transform([combined_features]))
+        result: Dict[str, Any] = {}
+        for head, labels, proba in (
+            ("service", models.service_labels, service_proba[0]),
+            ("activity", models.activity_labels, activity_proba[0]),
+        ):
+            best = int(proba.argmax())
+            result[f"{head}_prediction"] = str(labels[best])
+            result[f"{head}_confidence"] = float(proba[best])
+            # Lead of the prediction over the runner-up
+            runner_up = float(np.partition(proba, -2)[-2]) if len(proba) > 1 else 0.0
+            result[f"{head}_margin"] = float(proba[best]) - runner_up
+            if top_k > 0:
+                result[f"{head}_top_k"] = top_k_classes(proba, labels, top_k)
+            if probabilities:
+                result[f"{head}_probabilities"] = {str(label): float(p) for label, p in zip(labels, proba)}
+            _status(
+                f"{head.capitalize()} prediction: {result[f'{head}_prediction']} "
+                f"(confidence: {result[f'{head}_confidence']:.4f})",
+                logs,
+            )
         
-        # Service prediction
-        service_pred_encoded = service_model.predict([combined_features])[0]
-        service_pred_proba = service_model.predict_proba([combined_features])[0]
-        service_prediction = service_encoder.inverse_transform([service_pred_encoded])[0]
-        service_confidence = float(max(service_pred_proba))
-        
-        # Activity prediction  
-        activity_pred_encoded = activity_model.predict([combined_features])[0]
-        activity_pred_proba = activity_model.predict_proba([combined_features])[0]
-        activity_prediction = activity_encoder.inverse_transform([activity_pred_encoded])[0]
-        activity_confidence = float(max(activity_pred_proba))
-        
-        _status(f"Service prediction: {service_prediction} (confidence: {service_confidence:.4f})", logs)
-        _status(f"Activity prediction: {activity_prediction} (confidence: {activity_confidence:.4f})", logs)
-        
-        # Get all class probabilities for detailed analysis
-        service_classes = service_encoder.classes_
-        activity_classes = activity_encoder.classes_
-        
-        service_probabilities = {
-            str(cls): float(prob) 
-            for cls, prob in zip(service_classes, service_pred_proba)
-        }
-        
-        activity_probabilities = {
-            str(cls): float(prob) 
-            for cls, prob in zip(activity_classes, activity_pred_proba)
-        }
-        
-        return {
-            "service_prediction": str(service_prediction),
-            "service_confidence": service_confidence,
-            "service_probabilities": service_probabilities,
-            "activity_prediction": str(activity_prediction), 
-            "activity_confidence": activity_confidence,
-            "activity_probabilities": activity_probabilities,
-            "combined_features": combined_features,
-            "feature_count": len([f for f in features if f])
-        }
+        result["combined_features"] = combined_features
+        result["feature_count"] = feature_count
+        cache.put(request_data, models.version, result, variant, key=key)
+        return result
         
     except FileNotFoundError as e:
         error_msg = f"Model files not found. Please train the models first. Error: {e}"
-        _status(error_msg, logs)
+        _status(error_msg, logs, logging.ERROR)
         raise
     except Exception as e:
         error_msg = f"Inference error: {e}"
-        _status(error_msg, logs)
+        _status(error_msg, logs, logging.ERROR)
         raise
 
 
+def _predict_head(proba: np.ndarray, labels: np.ndarray) -> Tuple[Any, Any]:
+    """Return decoded labels and confidences for the rows of a probability matrix."""
+    best = proba.argmax(axis=1)
+    return labels[best], proba[np.arange(len(best)), best]
+
+
+def _classify_frame(models: Any, frame: pd.DataFrame, logs: List[str] | None = None) -> pd.DataFrame:
+    """Return the prediction columns for every row of ``frame`` (index-aligned).
+
+    Identical requests are classified once and broadcast back.
+    """
+    codes, uniques = distinct_combined_text(frame, FEATURE_COLUMNS)
+    _status(f"Classifying {len(uniques)} unique requests", logs)
+    count(logs, "requests", len(frame))
+    count(logs, "unique_requests", len(uniques))
+
+    service_proba, activity_proba = models.predict_proba(*models.transform(list(uniques)))
+    svc_labels, svc_conf = _predict_head(service_proba, models.service_labels)
+    act_labels, act_conf = _predict_head(activity_proba, models.activity_labels)
+    return pd.DataFrame(
+        {
+            "service_prediction": svc_labels[codes].astype(str),
+            "service_confidence": np.round(svc_conf[codes], 2),
+            "activity_prediction": act_labels[codes].astype(str),
+            "activity_confidence": np.round(act_conf[codes], 2),
+        },
+        index=frame.index,
+    )
+
+
 def batch_predict_rfc_python(
     requests_data: List[Dict[str, Any]], 
-    logs: List[str] | None = None
+    logs: List[str] | None = None,
+    timing_sample: int = 0,
 ) -> Tuple[List[Dict[str, Any]], float]:
     """Perform batch inference using trained RFC models.
+
+    The combined text is built for all requests at once, identical strings are
+    classified only once and each model runs a single ``predict_proba`` over
+    the unique strings. Results are then broadcast back to every request.
     
     Args:
         requests_data: List of dictionaries containing request features
         logs: Optional list to collect log messages
+        timing_sample: Number of evenly spaced requests to additionally time
+            one by one and log (0 disables per-request timing)
         
     Returns:
         List of dictionaries containing predictions for each request
     """
     try:
         _status(f"Starting batch inference for {len(requests_data)} requests...", logs)
-        models = load_rfc_models()
-        
-        service_model: Pipeline = models["service_model"]
-        activity_model: Pipeline = models["activity_model"]
-        service_encoder = models["service_encoder"]
-        activity_encoder = models["activity_encoder"]
+        models = get_registry().get(logs)
         start_time = time.perf_counter()
-        
-        results = []
-        
-        for i, request_data in enumerate(requests_data):
-            # _status(f"Processing request {i+1}/{len(requests_data)}", logs)
-            
-            # Extract and combine features
-            features = [
-                request_data.get("headers_Host", ""),
-                request_data.get("url", ""),
-                request_data.get("method", ""),
-                request_data.get("requestHeaders_Origin", ""),
-                request_data.get("requestHeaders_Content_Type", ""),
-                request_data.get("responseHeaders_Content_Type", ""),
-                request_data.get("requestHeaders_Referer", ""),
-                request_data.get("requestHeaders_Accept", "")
-            ]
-            
-            combined_features = " ".join(str(f) if f else "" for f in features)
-            
-            # Measure inference time
-            iter_start = time.perf_counter()
-            # Make predictions
-            service_pred_encoded = service_model.predict([combined_features])[0]
-            service_pred_proba = service_model.predict_proba([combined_features])[0]
-            service_prediction = service_encoder.inverse_transform([service_pred_encoded])[0]
-            service_confidence = round(float(max(service_pred_proba)), 2)
-            
-            activity_pred_encoded = activity_model.predict([combined_features])[0]
-            activity_pred_proba = activity_model.predict_proba([combined_features])[0]
-            activity_prediction = activity_encoder.inverse_transform([activity_pred_encoded])[0]
-            activity_confidence = round(float(max(activity_pred_proba)), 2)
-            iter_end_time = time.perf_counter()
-            elapsed_ms = (iter_end_time - iter_start) * 1000.0
-            
-            _status(f"Processing request {i+1}/{len(requests_data)} [{elapsed_ms:.2f} ms] Service: {service_prediction} ({service_confidence:.2f}), "
-                f"Activity: {activity_prediction} ({activity_confidence:.2f})",
-                logs,
-            )
 
-            enriched = {
+        if not requests_data:
+            return [], 0.0
+
+        frame = pd.DataFrame.from_records(requests_data)
+        predictions = _classify_frame(models, frame, logs)
+
+        results = [
+            {
                 **request_data,
-                "service_prediction": str(service_prediction),
-                "service_confidence": service_confidence,
-                "activity_prediction": str(activity_prediction),
-                "activity_confidence": activity_confidence,
+                "service_prediction": svc,
+                "service_confidence": svc_c,
+                "activity_prediction": act,
+                "activity_confidence": act_c,
             }
-            results.append(enriched)
+            for request_data, svc, svc_c, act, act_c in zip(
+                requests_data,
+                predictions["service_prediction"].tolist(),
+                predictions["service_confidence"].tolist(),
+                predictions["activity_prediction"].tolist(),
+                predictions["activity_confidence"].tolist(),
+            )
+        ]
+        total_time = time.perf_counter() - start_time
+
+        if timing_sample > 0:
+            sample = np.unique(np.linspace(0, len(results) - 1, num=min(timing_sample, len(results)), dtype=int))
+            for i in sample:
+                text = combined_text(frame.iloc[[i]], FEATURE_COLUMNS).tolist()
+                iter_start = time.perf_counter()
+                service_proba, activity_proba = models.predict_proba(*models.transform(text))
+                _predict_head(service_proba, models.service_labels)
+                _predict_head(activity_proba, models.activity_labels)
+                elapsed_ms = (time.perf_counter() - iter_start) * 1000.0
+                res = results[i]
+                _status(
+                    f"Sampled request {i+1}/{len(results)} [{elapsed_ms:.2f} ms] "
+                    f"Service: {res['service_prediction']} ({res['service_confidence']:.2f}), "
+                    f"Activity: {res['activity_prediction']} ({res['activity_confidence']:.2f})",
+                    logs,
+                )
 
-        total_time = time.perf_counter() - start_time 
         _status(f"Processed {len(results)} requests in {total_time:.2f} seconds", logs)
         return results, round(total_time, 2)
     except Exception as e:
         error_msg = f"Batch inference error: {e}"
-        _status(error_msg, logs)
+        _status(error_msg, logs, logging.ERROR)
         raise
 
 
@@ -226,6 +242,7 @@ def batch_predict_rfc_python(
 def batch_predict_rfc_python_file(
     filename: str,
     logs: List[str] | None = None,
+    timing_sample: int = 0,
 ) -> Tuple[List[Dict[str, Any]], float]:
     """Load a CSV file located in the RFC test directory and run batch inference.
 
@@ -235,10 +252,9 @@ def batch_predict_rfc_python_file(
         Filename relative to PATHS["rfc_python_train_test"].
     logs: list[str] | None
         Optional sink for status messages.
+    timing_sample: int
+        Number of requests to time individually, see ``batch_predict_rfc_python``.
     """
-    from pathlib import Path
-    import pandas as pd
-
     test_dir = Path(PATHS["rfc_python_train_test"])
     csv_path = (test_dir / filename).resolve()
 
@@ -248,4 +264,28 @@ def batch_predict_rfc_python_file(
     _status(f"Reading CSV file {csv_path}", logs)
     df = pd.read_csv(csv_path)
     requests = df.to_dict(orient="records")
-    return batch_predict_rfc_python(requests, logs)
+    return batch_predict_rfc_python(requests, logs, timing_sample=timing_sample)
+
+
+def stream_predict_rfc_python_file(
+    filename: str,
+    fmt: str = "ndjson",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    logs: List[str] | None = None,
+) -> Tuple[Iterator[str], str]:
+    """Classify a test CSV chunk by chunk, yielding NDJSON lines or CSV text.
+
+    All chunks use the model snapshot current when the stream starts, even
+    if the registry reloads meanwhile.
+
+    Returns:
+        The output iterator and the version of the models used
+
+    Raises:
+        FileNotFoundError: If the file does not exist under the test directory
+    """
+    models = get_registry().get(logs)
+    stream = stream_file_predictions(
+        filename, lambda chunk: _classify_frame(models, chunk), fmt=fmt, chunk_size=chunk_size, logs=logs
+    )
+    return stream, models.version
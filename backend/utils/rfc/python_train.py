@@ -1,28 +1,196 @@
 from __future__ import annotations
 
+import os
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
 
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics import accuracy_score
 from sklearn.model_selection import train_test_split
-from sklearn.pipeline import make_pipeline
-from sklearn.preprocessing import LabelEncoder
 
 from ..path_config import PATHS
+from ..log_sink import emit as _status
+from .dataset_cache import COMBINED, encode_labels, load_dataset, load_frame
+from .incremental import (
+    MANIFEST_FILE,
+    MAX_LABEL_DRIFT,
+    MAX_TREES,
+    MAX_VOCABULARY_DRIFT,
+    fingerprint,
+    grow,
+    known_label_mask,
+    load_manifest,
+    new_tree_count,
+    replay_sample,
+    save_manifest,
+    vocabulary_drift,
+)
+from .model_registry import LEGACY_MODEL_FILES, MODEL_ARTIFACT, MODEL_ARTIFACT_FORMAT
+from .parallel_fit import fit_forests
+from .training_defaults import load_training_defaults, make_vectorizer
 
 
-def _status(msg: str, sink: List[str] | None = None) -> None:
-    if sink is not None:
-        sink.append(msg)
-    print(msg, flush=True)
+def _forest(hyper: Dict[str, Any]) -> RandomForestClassifier:
+    return RandomForestClassifier(n_estimators=hyper["n_estimators"], max_depth=hyper["max_depth"], random_state=42)
 
 
-def train_rfc_python(input_file: str, log: List[str] | None = None) -> Dict[str, Any]:
+def _save_artifact(artifact: Dict[str, Any], path: Path) -> None:
+    """Write the model artifact atomically; the model registry polls ``path`` for changes."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    joblib.dump(artifact, tmp)
+    os.replace(tmp, path)
+
+
+def _warm_start(
+    input_file: str,
+    source: Dict[str, Any],
+    manifest: Dict[str, Any],
+    paths: Dict[str, Path],
+    log: List[str] | None,
+    n_jobs: int,
+    concurrent_heads: bool,
+    max_vocabulary_drift: float,
+    max_label_drift: float,
+) -> Dict[str, Any] | str:
+    """Grow the saved forests with trees fitted on ``input_file``.
+
+    Returns the training metrics, or the reason a full retrain is needed.
+    """
+    artifact_path = Path(paths["models"]) / MODEL_ARTIFACT
+    artifact = joblib.load(artifact_path)
+    if artifact.get("format") != MODEL_ARTIFACT_FORMAT:
+        return f"model artifact format {artifact.get('format')} cannot be updated"
+    vectorizer = artifact["vectorizer"]
+    svc_le, act_le = artifact["service_encoder"], artifact["activity_encoder"]
+    joint = artifact.get("joint_model") is not None
+    if joint:
+        forests = {"joint_model": artifact["joint_model"]}
+        svc_classes, act_classes = artifact["joint_model"].classes_
+    else:
+        forests = {"service_model": artifact["service_model"], "activity_model": artifact["activity_model"]}
+        svc_classes, act_classes = forests["service_model"].classes_, forests["activity_model"].classes_
+    known = {
+        "service": svc_le.classes_[np.asarray(svc_classes).astype(int)],
+        "activityType": act_le.classes_[np.asarray(act_classes).astype(int)],
+    }
+
+    new_df = load_frame(paths["input"] / input_file, log)
+    drift = vocabulary_drift(vectorizer, new_df[COMBINED])
+    _status(f"Vocabulary drift: {drift:.2%} of the new tokens are out of vocabulary", log)
+    if drift > max_vocabulary_drift:
+        return f"vocabulary drift {drift:.2%} exceeds {max_vocabulary_drift:.2%}"
+
+    mask, unseen = known_label_mask({h: new_df[h].astype(str) for h in known}, known)
+    label_drift = float(1.0 - mask.mean()) if len(mask) else 0.0
+    if label_drift > max_label_drift:
+        return f"{label_drift:.2%} of the new rows have unseen labels {unseen} (limit {max_label_drift:.2%})"
+    if not mask.all():
+        _status(f"Skipping {int((~mask).sum())} rows with unseen labels {unseen}", log)
+    new_df = new_df[mask]
+    if new_df.empty:
+        return "no usable rows in the new file"
+
+    consumed = [name for name in manifest["files"] if (paths["input"] / name).exists()]
+    if not consumed:
+        return "none of the consumed files are available for replay"
+    old_df = load_dataset([paths["input"] / name for name in consumed], log)
+    old_mask, _ = known_label_mask({h: old_df[h].astype(str) for h in known}, known)
+    old_df = old_df[old_mask]
+
+    if len(new_df) >= 5:
+        new_train, new_val = train_test_split(new_df, test_size=0.2, random_state=42)
+    else:
+        new_train, new_val = new_df, new_df.iloc[:0]
+    replay = replay_sample(old_df, list(known), len(new_train))
+    for head, classes in known.items():
+        missing = set(classes) - set(replay[head].astype(str)) - set(new_train[head].astype(str))
+        if missing:
+            return f"no rows left to replay for {head} classes {sorted(missing)}"
+    train = pd.concat([new_train, replay], ignore_index=True)
+
+    current = max(len(f.estimators_) for f in forests.values())
+    total_rows = sum(info["rows"] for info in manifest["files"].values()) + len(new_df)
+    n_new = new_tree_count(load_training_defaults("python", log)["n_estimators"], len(new_df), total_rows)
+    if current + n_new > MAX_TREES:
+        return f"forests would grow to {current + n_new} trees (limit {MAX_TREES})"
+
+    _status(
+        f"Warm start: {n_new} new trees per forest on {len(new_train)} new and {len(replay)} replayed rows",
+        log,
+    )
+    X_train = vectorizer.transform(train[COMBINED])
+    y_svc = svc_le.transform(train["service"].astype(str))
+    y_act = act_le.transform(train["activityType"].astype(str))
+    targets = {"joint_model": np.column_stack([y_svc, y_act])} if joint else {
+        "service_model": y_svc, "activity_model": y_act
+    }
+    forests, training = fit_forests(
+        {name: (grow(forest, n_new), targets[name]) for name, forest in forests.items()},
+        X_train, n_jobs=n_jobs, concurrent=concurrent_heads, log=log,
+    )
+    for forest in forests.values():
+        forest.set_params(warm_start=False)
+
+    svc_acc = act_acc = None
+    if len(new_val):
+        X_val = vectorizer.transform(new_val[COMBINED])
+        y_val_svc = svc_le.transform(new_val["service"].astype(str))
+        y_val_act = act_le.transform(new_val["activityType"].astype(str))
+        if joint:
+            svc_pred, act_pred = forests["joint_model"].predict(X_val).T
+        else:
+            svc_pred, act_pred = forests["service_model"].predict(X_val), forests["activity_model"].predict(X_val)
+        svc_acc, act_acc = float(accuracy_score(y_val_svc, svc_pred)), float(accuracy_score(y_val_act, act_pred))
+        _status(f"Service Classification Accuracy (new rows): {svc_acc:.4f}", log)
+        _status(f"Activity Classification Accuracy (new rows): {act_acc:.4f}", log)
+
+    artifact.update(forests)
+    _save_artifact(artifact, artifact_path)
+    _status(f"Updated models saved to {artifact_path}", log)
+
+    metrics = {
+        "service_accuracy": svc_acc,
+        "activity_accuracy": act_acc,
+        "unique_services": int(len(known["service"])),
+        "unique_activities": int(len(known["activityType"])),
+        "vocabulary_size": int(len(vectorizer.vocabulary_)),
+        "model_size_bytes": int(artifact_path.stat().st_size),
+        "joint": joint,
+        "training": training,
+    }
+    update = {
+        "mode": "warm_start",
+        "files": [input_file],
+        "new_rows": int(len(new_df)),
+        "replay_rows": int(len(replay)),
+        "skipped_rows": int((~mask).sum()),
+        "unseen_labels": unseen,
+        "vocabulary_drift": round(drift, 4),
+        "label_drift": round(label_drift, 4),
+        "trees_added": n_new,
+        "trees": current + n_new,
+    }
+    save_manifest(
+        Path(paths["models"]) / MANIFEST_FILE, manifest, {input_file: source},
+        {**update, "service_accuracy": svc_acc, "activity_accuracy": act_acc},
+    )
+    return {**metrics, "incremental": update}
+
+
+def train_rfc_python(
+    input_file: str,
+    log: List[str] | None = None,
+    joint: bool = False,
+    n_jobs: int = 1,
+    concurrent_heads: bool = True,
+    incremental: bool = False,
+    max_vocabulary_drift: float = MAX_VOCABULARY_DRIFT,
+    max_label_drift: float = MAX_LABEL_DRIFT,
+) -> Dict[str, Any]:
     """Train service & activity RFC models and persist them.
 
     Parameters
@@ -31,6 +199,21 @@ def train_rfc_python(input_file: str, log: List[str] | None = None) -> Dict[str,
         CSV file name expected under data/output/codebert/predictions.
     log: list[str] | None
         Collects stdout-style messages.
+    joint: bool
+        Train one multi-output forest on (service, activity) instead of one
+        forest per head; inference then walks the trees once per request.
+    n_jobs: int
+        Threads for fitting, -1 for all cores (see parallel_fit.py).
+    concurrent_heads: bool
+        With two heads and more than one thread, fit both at the same time
+        on a share of the threads each.
+    incremental: bool
+        Update the saved models with warm-start trees fitted on
+        ``input_file`` if it has not been consumed yet, falling back to a
+        full retrain on every consumed file on drift (see incremental.py).
+        A warm start keeps the saved models' setup regardless of ``joint``.
+    max_vocabulary_drift, max_label_drift: float
+        Drift thresholds of the incremental mode.
     Returns
     -------
     dict with training metrics for frontend consumption.
@@ -47,11 +230,41 @@ def train_rfc_python(input_file: str, log: List[str] | None = None) -> Dict[str,
     if not csv_path.exists():
         raise FileNotFoundError(csv_path)
 
-    _status(f"Loading data from {csv_path}", log)
+    models_dir = Path(paths["models"])
+    manifest_path = models_dir / MANIFEST_FILE
+    manifest = load_manifest(manifest_path)
+    sources = {input_file: fingerprint(csv_path)}
+    reason = None
+    if incremental:
+        previous = manifest["files"] if manifest and (models_dir / MODEL_ARTIFACT).exists() else None
+        if previous is None:
+            reason = "no models with a manifest to update"
+        elif input_file in previous and previous[input_file]["sha256"] == sources[input_file]["sha256"]:
+            _status(f"{input_file} was already consumed; the models are up to date", log)
+            return {"incremental": {"mode": "unchanged", "files": sorted(previous)}}
+        elif input_file in previous:
+            reason = f"{input_file} changed since it was consumed"
+        else:
+            result = _warm_start(
+                input_file, sources[input_file], manifest, paths, log,
+                n_jobs, concurrent_heads, max_vocabulary_drift, max_label_drift,
+            )
+            if isinstance(result, dict):
+                return result
+            reason = result
+        # Full retrain on everything consumed so far plus the new file
+        for name in previous or {}:
+            if name not in sources and (paths["input"] / name).exists():
+                sources[name] = fingerprint(paths["input"] / name)
+        _status(f"Full retrain on {len(sources)} file(s): {reason}", log)
 
-    df = pd.read_csv(csv_path)
-    services = df["service"].astype(str).unique()
-    activities = df["activityType"].astype(str).unique()
+    _status(f"Loading data from {', '.join(str(paths['input'] / name) for name in sources)}", log)
+
+    df = load_dataset([paths["input"] / name for name in sources], log)
+    svc_le, service_codes = encode_labels(df["service"])
+    act_le, activity_codes = encode_labels(df["activityType"])
+    df["service_encoded"], df["activity_encoded"] = service_codes, activity_codes
+    services, activities = svc_le.classes_, act_le.classes_
 
     _status(f"Found {len(services)} unique services and {len(activities)} unique activities", log)
 
@@ -59,63 +272,88 @@ def train_rfc_python(input_file: str, log: List[str] | None = None) -> Dict[str,
     ts = datetime.now().strftime("%Y%m%d")
     test_file = paths["test"] / f"test_set_{ts}.csv"
     test_file.parent.mkdir(parents=True, exist_ok=True)
-    test_df.to_csv(test_file, index=False)
+    test_df.drop(columns=[COMBINED, "service_encoded", "activity_encoded"]).to_csv(test_file, index=False)
     _status(f"Test set saved to {test_file}", log)
 
-    train_df["combined"] = (
-        train_df[[
-            "headers_Host",
-            "url",
-            "method",
-            "requestHeaders_Origin",
-            "requestHeaders_Content_Type",
-            "responseHeaders_Content_Type",
-            "requestHeaders_Referer",
-            "requestHeaders_Accept",
-        ]]
-        .fillna("")
-        .agg(" ".join, axis=1)
-    )
-
-    svc_le = LabelEncoder().fit(services)
-    act_le = LabelEncoder().fit(activities)
-    train_df["service_encoded"] = svc_le.transform(train_df["service"].astype(str))
-    train_df["activity_encoded"] = act_le.transform(train_df["activityType"].astype(str))
 
     X_train, X_val, y_train_svc, y_val_svc = train_test_split(
-        train_df["combined"], train_df["service_encoded"], test_size=0.2, random_state=42
+        train_df[COMBINED], train_df["service_encoded"], test_size=0.2, random_state=42
     )
     _, _, y_train_act, y_val_act = train_test_split(
-        train_df["combined"], train_df["activity_encoded"], test_size=0.2, random_state=42
+        train_df[COMBINED], train_df["activity_encoded"], test_size=0.2, random_state=42
     )
 
-    _status("Training service classifier...", log)
-    svc_model = make_pipeline(
-        TfidfVectorizer(max_features=5000),
-        RandomForestClassifier(n_estimators=100, random_state=42),
-    ).fit(X_train, y_train_svc)
-    svc_acc = accuracy_score(y_val_svc, svc_model.predict(X_val))
+    hyper = load_training_defaults("python", log)
+    _status(
+        f"Hyperparameters: {hyper['n_estimators']} trees, max depth {hyper['max_depth'] or 'unlimited'}, "
+        f"{hyper['vectorizer']} vectorizer with up to {hyper['max_features']} features",
+        log,
+    )
+    _status(f"Fitting shared {'TF-IDF' if hyper['vectorizer'] == 'tfidf' else 'binary'} vectorizer...", log)
+    vectorizer = make_vectorizer(hyper).fit(X_train)
+    X_train_vec = vectorizer.transform(X_train)
+    X_val_vec = vectorizer.transform(X_val)
 
-    _status("Training activity classifier...", log)
-    act_model = make_pipeline(
-        TfidfVectorizer(max_features=5000),
-        RandomForestClassifier(n_estimators=100, random_state=42),
-    ).fit(X_train, y_train_act)
-    act_acc = accuracy_score(y_val_act, act_model.predict(X_val))
+    if joint:
+        _status("Training joint service/activity classifier...", log)
+        forests, training = fit_forests(
+            {"joint_model": (_forest(hyper), np.column_stack([y_train_svc, y_train_act]))},
+            X_train_vec, n_jobs=n_jobs, log=log,
+        )
+        svc_pred, act_pred = forests["joint_model"].predict(X_val_vec).T
+        svc_acc = accuracy_score(y_val_svc, svc_pred)
+        act_acc = accuracy_score(y_val_act, act_pred)
+    else:
+        _status("Training service and activity classifiers...", log)
+        forests, training = fit_forests(
+            {
+                "service_model": (_forest(hyper), y_train_svc),
+                "activity_model": (_forest(hyper), y_train_act),
+            },
+            X_train_vec, n_jobs=n_jobs, concurrent=concurrent_heads, log=log,
+        )
+        svc_acc = accuracy_score(y_val_svc, forests["service_model"].predict(X_val_vec))
+        act_acc = accuracy_score(y_val_act, forests["activity_model"].predict(X_val_vec))
 
     _status(f"Service Classification Accuracy: {svc_acc:.4f}", log)
     _status(f"Activity Classification Accuracy: {act_acc:.4f}", log)
 
-    # Save artefacts
-    joblib.dump(svc_model, Path(paths["models"]) / "service_classifier.joblib")
-    joblib.dump(act_model, Path(paths["models"]) / "activity_classifier.joblib")
-    joblib.dump(svc_le, Path(paths["models"]) / "service_encoder.joblib")
-    joblib.dump(act_le, Path(paths["models"]) / "activity_encoder.joblib")
-    _status("Models and encoders saved successfully", log)
+    # Save artefacts: one vectorizer shared by both heads
+    artifact_path = models_dir / MODEL_ARTIFACT
+    _save_artifact(
+        {
+            "format": MODEL_ARTIFACT_FORMAT,
+            "vectorizer": vectorizer,
+            **forests,
+            "service_encoder": svc_le,
+            "activity_encoder": act_le,
+        },
+        artifact_path,
+    )
+    # Remove the per-model pipelines of the previous format so they cannot go stale
+    for name in LEGACY_MODEL_FILES.values():
+        (models_dir / name).unlink(missing_ok=True)
+    _status(f"Models and encoders saved to {artifact_path}", log)
+
+    # The models now reflect exactly these files
+    save_manifest(
+        manifest_path, manifest, sources,
+        {"mode": "full", "files": sorted(sources), "reason": reason,
+         "service_accuracy": float(svc_acc), "activity_accuracy": float(act_acc)},
+        replace=True,
+    )
 
-    return {
+    metrics = {
         "service_accuracy": float(svc_acc),
         "activity_accuracy": float(act_acc),
         "unique_services": int(len(services)),
         "unique_activities": int(len(activities)),
+        "vocabulary_size": int(len(vectorizer.vocabulary_)),
+        "model_size_bytes": int(artifact_path.stat().st_size),
+        "joint": joint,
+        "hyperparameters": hyper,
+        "training": training,
     }
+    if incremental:
+        metrics["incremental"] = {"mode": "full", "files": sorted(sources), "reason": reason}
+    return metrics
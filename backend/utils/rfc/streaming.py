@@ -0,0 +1,86 @@
+"""Chunked file inference that yields NDJSON or CSV text.
+
+The input CSV is read ``chunk_size`` rows at a time, each chunk is
+classified and serialised, and only then is the next chunk read, so memory
+stays bounded by the chunk size regardless of the file size.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Iterator, List
+
+import pandas as pd
+
+from ..path_config import PATHS
+from ..log_sink import count, emit as _status, event
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+DEFAULT_CHUNK_SIZE = 5000
+
+# Classifies one chunk; returns the prediction columns, index-aligned with the chunk
+ChunkClassifier = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+
+def resolve_test_file(filename: str) -> Path:
+    """Return ``filename`` under the RFC test directory or raise FileNotFoundError."""
+    csv_path = (Path(PATHS["rfc_python_train_test"]) / filename).resolve()
+    if not csv_path.is_file():
+        raise FileNotFoundError(filename)
+    return csv_path
+
+
+def stream_file_predictions(
+    filename: str,
+    classify_chunk: ChunkClassifier,
+    fmt: str = "ndjson",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    logs: List[str] | None = None,
+) -> Iterator[str]:
+    """Return an iterator of NDJSON lines (or CSV text) for every row of ``filename``.
+
+    Each output row holds the input columns followed by the prediction columns,
+    the same as a row of the batch ``results`` list. The file is checked before
+    the iterator is returned, so a missing file raises here rather than after
+    the response has started.
+
+    Raises:
+        FileNotFoundError: If the file does not exist under the test directory
+        ValueError: If ``fmt`` is not one of STREAM_FORMATS
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format {fmt!r}; choose one of {tuple(STREAM_FORMATS)}")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    csv_path = resolve_test_file(filename)
+
+    def generate() -> Iterator[str]:
+        rows = 0
+        try:
+            for index, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_size)):
+                predictions = classify_chunk(chunk)
+                # Predictions replace same-named input columns, as in the batch results
+                out = pd.concat([chunk.drop(columns=predictions.columns, errors="ignore"), predictions], axis=1)
+                if fmt == "ndjson":
+                    text = out.to_json(orient="records", lines=True, force_ascii=False)
+                    # Older pandas omit the newline after the last record
+                    yield text if text.endswith("\n") else text + "\n"
+                else:
+                    yield out.to_csv(index=False, header=index == 0)
+                rows += len(chunk)
+                count(logs, "rows", len(chunk))
+                event(logs, "chunk", f"Streamed {rows} rows")
+        except Exception as exc:
+            _status(f"Streaming inference error after {rows} rows: {exc}", logs, logging.ERROR)
+            if fmt == "ndjson":
+                # The status line is already sent; report the failure in-band
+                yield json.dumps({"error": str(exc), "rows": rows}) + "\n"
+            else:
+                raise
+
+    return generate()
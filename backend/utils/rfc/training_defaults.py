@@ -0,0 +1,77 @@
+"""Hyperparameters the RFC trainers use unless told otherwise.
+
+``python_train`` and ``codegen_manual`` read their forest size, depth limit
+and vectorizer from here. ``hyperparameter_sweep.py`` saves the
+configuration it selects per engine to ``PATHS["rfc_training_defaults_file"]``;
+without that file the built-in settings below apply. The generated C code
+tests feature presence, so the ``c`` engine always uses the binary
+vectorizer.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from ..path_config import PATHS
+from ..log_sink import emit as _status
+
+ENGINES = ("python", "c")
+VECTORIZERS = ("tfidf", "binary")
+HYPERPARAMETERS = ("n_estimators", "max_depth", "max_features", "vectorizer")
+BUILTIN_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "python": {"n_estimators": 100, "max_depth": None, "max_features": 5000, "vectorizer": "tfidf"},
+    "c": {"n_estimators": 5, "max_depth": None, "max_features": 5000, "vectorizer": "binary"},
+}
+
+
+def _read(path: Path, log: List[str] | None = None) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        _status(f"Ignoring unreadable training defaults {path}: {exc}", log)
+        return {}
+
+
+def load_training_defaults(engine: str, log: List[str] | None = None) -> Dict[str, Any]:
+    """Hyperparameters for ``engine``: the saved selection over the built-in defaults."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; choose from {ENGINES}")
+    config = dict(BUILTIN_DEFAULTS[engine])
+    saved = _read(Path(PATHS["rfc_training_defaults_file"]), log).get("engines", {}).get(engine) or {}
+    config.update({key: saved[key] for key in HYPERPARAMETERS if key in saved})
+    if config["vectorizer"] not in VECTORIZERS:
+        _status(f"Unknown vectorizer {config['vectorizer']!r} in the training defaults; using the built-in one", log)
+        config["vectorizer"] = BUILTIN_DEFAULTS[engine]["vectorizer"]
+    if engine == "c":
+        config["vectorizer"] = "binary"
+    return config
+
+
+def save_training_defaults(configs: Dict[str, Dict[str, Any]], source: Dict[str, Any] | None = None) -> Path:
+    """Make ``configs`` (by engine) the training defaults; other engines keep theirs."""
+    path = Path(PATHS["rfc_training_defaults_file"])
+    data = _read(path)
+    engines = data.get("engines", {})
+    now = datetime.now().isoformat(timespec="seconds")
+    for engine, config in configs.items():
+        engines[engine] = {
+            **{key: config[key] for key in HYPERPARAMETERS},
+            "selected_at": now,
+            **({"source": source} if source else {}),
+        }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"engines": engines}, indent=2), encoding="utf-8")
+    return path
+
+
+def make_vectorizer(config: Dict[str, Any]) -> Any:
+    """Unfitted vectorizer for a configuration: TF-IDF or binary term presence."""
+    if config["vectorizer"] == "binary":
+        return CountVectorizer(max_features=config["max_features"], binary=True)
+    return TfidfVectorizer(max_features=config["max_features"])
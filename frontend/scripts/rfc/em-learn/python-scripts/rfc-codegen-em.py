@@ -262,28 +262,10 @@ def main():
     # Transform evaluation data using the fitted vectorizer
     X_eval = vectorizer.transform(eval_df['combined_headers_for_py'])
 
-    # Fit LabelEncoders on all unique labels in the original dataset to avoid missing labels in splits
+    # Fit LabelEncoders on all unique labels in the loaded dataset to avoid missing labels in splits.
+    # train_df and eval_df together are every loaded row, so the CSVs need not be read again.
     print_status("Fitting LabelEncoders on full original dataset for robustness...")
-    all_original_dfs = []
-    prediction_files_for_le = [f for f in os.listdir(INPUT_DATA_BASE_DIR) if f.endswith('_predictions.csv')]
-    if not prediction_files_for_le:
-        print_status(f"ERROR: No '_predictions.csv' files found in {INPUT_DATA_BASE_DIR} for fitting label encoders. Exiting.")
-        sys.exit(1) 
-
-    for file_name_le in prediction_files_for_le:
-        try:
-            df_temp_le = pd.read_csv(os.path.join(INPUT_DATA_BASE_DIR, file_name_le))
-            all_original_dfs.append(df_temp_le)
-        except Exception as e:
-            print_status(f"Warning: Could not load or process {file_name_le} for label encoding. Error: {e}")
-
-            pass 
-    
-    if not all_original_dfs:
-        print_status("ERROR: No data could be loaded from any CSV files for label encoding. Exiting.")
-        sys.exit(1)
-
-    full_original_df = pd.concat(all_original_dfs, ignore_index=True)
+    full_original_df = pd.concat([train_df, eval_df], ignore_index=True)
 
     le_service = LabelEncoder()
     le_service.fit(full_original_df['service'].astype(str))
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import torch
 from transformers import pipeline
@@ -57,6 +58,33 @@ def prepare_activity_text(row):
         print(f"Error in prepare_activity_text: {e}")
         return ""
 
+def _map_distinct(column, func):
+    """Apply ``func`` once per distinct value of a string column."""
+    codes, uniques = pd.factorize(column.fillna('').astype(str))
+    mapped = np.array([func(value) for value in uniques], dtype=object)
+    return pd.Series(mapped[codes], index=column.index, dtype=object)
+
+def _text_column(df, name):
+    if name not in df:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[name].fillna('').astype(str)
+
+def prepare_service_texts(df):
+    """Column-wise prepare_service_text for every row of ``df``."""
+    host = _text_column(df, 'headers_Host').str.lower()
+    base_url = _map_distinct(_text_column(df, 'url'), lambda url: unquote(url.split('?')[0]))
+    return host.str.cat(base_url, sep=' ').str.strip()
+
+def prepare_activity_texts(df):
+    """Column-wise prepare_activity_text for every row of ``df``."""
+    decoded_url = _map_distinct(_text_column(df, 'url'), lambda url: unquote(url.lower()))
+    return decoded_url.str.cat([
+        _text_column(df, 'method').str.upper(),
+        _text_column(df, 'requestHeaders_Content_Type').str.lower(),
+        _text_column(df, 'responseHeaders_Content_Type').str.lower(),
+        _text_column(df, 'requestHeaders_Referer').str.lower()
+    ], sep=' ').str.strip()
+
 def clean_dataset(df):
     """Clean and preprocess the dataset."""
     # Drop rows with critical missing values
@@ -126,8 +154,8 @@ def process_service_file(file_path, service_model_name, activity_model_name, sas
     df_train = clean_dataset(df_train)
     
     # Prepare text features
-    df_train['service_text'] = df_train.apply(prepare_service_text, axis=1)
-    df_train['activity_text'] = df_train.apply(prepare_activity_text, axis=1)
+    df_train['service_text'] = prepare_service_texts(df_train)
+    df_train['activity_text'] = prepare_activity_texts(df_train)
     
     predictions = []
     # Wrap row iteration with tqdm